@@ -1,14 +1,31 @@
 """EPUB to Audiobook converter package."""
 
+import importlib
+from typing import TYPE_CHECKING, Any
+
 from ._version import __version__, version
-from .audio_converter import AudioConverter
-from .audio_handler import AudioHandler
 from .config import ErrorCodes, WarningTypes
-from .epub2audio import main, process_epub
-from .epub_processor import BookMetadata, Chapter, EpubProcessor
 from .helpers import ConversionError, ConversionWarning
 from .voices import Voice, VoiceInfo, available_voices
 
+if TYPE_CHECKING:
+    from .audio_converter import AudioConverter
+    from .audio_handler import AudioHandler
+    from .epub2audio import main, process_epub
+    from .epub_processor import BookMetadata, Chapter, EpubProcessor
+
+# Exports of modules that import numpy, torch or the EPUB parsers, imported on
+# first use so that importing the package, and running the CLI, stays quick
+_LAZY_EXPORTS = {
+    "AudioConverter": "audio_converter",
+    "AudioHandler": "audio_handler",
+    "main": "epub2audio",
+    "process_epub": "epub2audio",
+    "BookMetadata": "epub_processor",
+    "Chapter": "epub_processor",
+    "EpubProcessor": "epub_processor",
+}
+
 __author__ = "Clay Rosenthal"
 __email__ = "epub2audio@mail.clayrosenthal.me"
 
@@ -30,3 +47,22 @@ __all__ = [
     "Voice",
     "VoiceInfo",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """Import an export of a heavy module on first use.
+
+    Args:
+        name: Name of the export
+
+    Returns:
+        Any: The export
+
+    Raises:
+        AttributeError: If the package exports no such name
+    """
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_LAZY_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
@@ -1,31 +1,130 @@
-"""Text-to-speech conversion using Kokoro."""
+"""Text-to-speech conversion into cached audio segments."""
 
+import multiprocessing
 import os
-from collections.abc import Generator
-from pathlib import Path
-from typing import Union
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Union
 
 import numpy as np
-from kokoro import KModel, KPipeline  # Maybe I'll implement TextToSpeech, Voice
 from loguru import logger
 from soundfile import SoundFile
 
+from .backends import TTSBackend, load_backend
+from .cache import (
+    CacheStats,
+    PhonemeCache,
+    open_segment_store,
+    segment_key,
+    writer_id,
+)
 from .config import (
-    KOKORO_PATHS,
+    AUDIO_BLOCK_FRAMES,
+    INFERENCE_LOOKAHEAD,
+    PHONEME_CACHE_PATH,
     SAMPLE_RATE,
+    SEGMENT_EXTENSION,
     SUPPORTED_AUDIO_FORMATS,
     ErrorCodes,
 )
+from .epub_processor import split_text_chunks
 from .helpers import (
     CacheDirManager,
     ConversionError,
     StrPath,
 )
+from .multiplexer import InferenceMultiplexer
 from .voices import Voice
 
+# Converter of a chunk worker process, see `AudioConverter.chunk_workers`
+_chunk_converter: Optional["AudioConverter"] = None
+
+
+def _init_chunk_worker(
+    epub_path: StrPath,
+    voice: str,
+    speech_rate: float,
+    backend: str,
+    quantize: Optional[str],
+    precision: str,
+    compiled: bool,
+) -> None:
+    """Initialize the converter of a chunk worker process.
+
+    Args:
+        epub_path: Path to the EPUB file, used to generate a cache directory
+        voice: Name of the voice to use
+        speech_rate: Speech rate multiplier
+        backend: Name of the text-to-speech backend
+        quantize: Quantization of the model, or None for full precision
+        precision: Precision the model runs at
+        compiled: Whether to run the model traced with TorchScript
+    """
+    global _chunk_converter
+    _chunk_converter = AudioConverter(
+        epub_path,
+        voice=voice,
+        speech_rate=speech_rate,
+        backend=backend,
+        quantize=quantize,
+        precision=precision,
+        compiled=compiled,
+    )
+
+
+def _synthesize_chunk(chunk: str) -> np.ndarray:
+    """Synthesize a chunk of text in a chunk worker.
+
+    Args:
+        chunk: Chunk of text to synthesize
+
+    Returns:
+        np.ndarray: 16-bit PCM audio of the chunk
+    """
+    assert _chunk_converter is not None, "chunk worker was not initialized"
+    return _chunk_converter._synthesize_chunk(chunk)
+
+
+def _to_pcm16(audio: np.ndarray) -> np.ndarray:
+    """Convert floating point audio to 16-bit PCM.
+
+    Args:
+        audio: Audio samples between -1 and 1
+
+    Returns:
+        np.ndarray: 16-bit PCM samples
+    """
+    int_size = np.int16
+    max_int_size = np.iinfo(int_size).max
+    return (audio * max_int_size).astype(int_size)
+
+
+def _join_pcm16(passages: Iterable[np.ndarray]) -> np.ndarray:
+    """Join the passes of the model over a chunk into 16-bit PCM.
+
+    Args:
+        passages: Audio of every pass, between -1 and 1
+
+    Returns:
+        np.ndarray: 16-bit PCM samples of the chunk
+    """
+    audio = [_to_pcm16(passage) for passage in passages]
+    return np.concatenate(audio) if audio else np.zeros(0, dtype=np.int16)
+
+
+@dataclass
+class Segment:
+    """An audio segment synthesized from a chunk of text."""
+
+    text: str  # Chunk of text spoken
+    name: str  # Name of the segment, to open with `AudioConverter.open_segment`
+    frames: int  # Number of frames of the segment
+
 
 class AudioConverter:
-    """Class for converting text to speech using Kokoro."""
+    """Class for converting text to speech with a `TTSBackend`."""
 
     def __init__(
         self,
@@ -33,42 +132,78 @@ class AudioConverter:
         voice: Union[str, Voice] = Voice.AF_HEART,
         speech_rate: float = 1.0,
         cache: bool = True,
-        extension: str = ".flac",
+        chunk_workers: int = 1,
+        cache_backend: str = "files",
+        backend: Union[str, TTSBackend] = "kokoro",
+        multiplexer: Optional[InferenceMultiplexer] = None,
+        quantize: Optional[str] = None,
+        precision: str = "fp32",
+        compiled: bool = False,
     ):
         """Initialize the audio converter.
 
+        Audio segments are always synthesized to lossless 16-bit PCM, whatever
+        the format of the audiobook, so one synthesis can feed any format. With
+        caching enabled, they are kept in the segment store shared by all books,
+        otherwise in a cache directory of the book that is removed afterwards.
+
         Args:
             epub_path: Path to the EPUB file, used to generate a cache directory
             voice: Voice to use
             speech_rate: Speech rate multiplier
-            cache: Whether to cache the generated audio
-            extension: Extension to use for the output file
+            cache: Whether to reuse and keep the generated audio
+            chunk_workers: Number of worker processes synthesizing the chunks of
+                a single text in parallel
+            cache_backend: How the segment store keeps segments, a file each
+                or in pack files, one of `CACHE_BACKENDS`
+            backend: Name of the text-to-speech backend to load, one of
+                `TTS_BACKENDS`, or a backend loaded with `load_backend` for the
+                language of the voice, to share its model and voices
+            multiplexer: Multiplexer running the model for this and other converters,
+                for the language of the voice, or None to run it in this
+                converter. Its backend is used unless one is given
+            quantize: Quantization of the model of the backend to load, one of
+                `QUANTIZATIONS`, or None for full precision. Ignored if the
+                backend is given loaded already
+            precision: Precision the model of the backend to load runs at, one
+                of `PRECISIONS`. Ignored if the backend is given loaded already
+            compiled: Whether to run the model of the backend to load traced
+                with TorchScript. Ignored if the backend is given loaded already
 
         Raises:
             ConversionError: If the voice is invalid or TTS initialization fails
         """
         try:
             self.voice = self._get_voice(voice)
-            model = True
-            if Path(KOKORO_PATHS["model_weight"]).exists():
-                logger.debug(f"model weight found: {KOKORO_PATHS['model_weight']}")
-                model = KModel(
-                    config=KOKORO_PATHS["config"],
-                    model=KOKORO_PATHS["model_weight"],
-                    repo_id="hexgrad/Kokoro-82M",
+            self.multiplexer = multiplexer
+            if isinstance(backend, str) and multiplexer is not None:
+                backend = multiplexer.backend
+            if isinstance(backend, str):
+                backend = load_backend(
+                    backend,
+                    self.voice,
+                    quantize=quantize,
+                    precision=precision,
+                    compiled=compiled,
                 )
-            self.tts = KPipeline(
-                lang_code=self.voice.lang_code,
-                repo_id="hexgrad/Kokoro-82M",
-                model=model,
-            )
+            self.backend = backend
+            self.quantize = getattr(backend, "quantize", None)
+            self.precision = getattr(backend, "precision", "fp32")
+            self.compiled = getattr(backend, "compiled", False)
             self.speech_rate = speech_rate
             self.cache_dir_manager = CacheDirManager(
-                epub_path, extension=extension, voice=self.voice.name
+                epub_path, extension=SEGMENT_EXTENSION, voice=self.voice.name
             )
             self.cache = cache
-            self.extension = extension
-            self.format, self.subtype, _ = SUPPORTED_AUDIO_FORMATS[extension]
+            self.model_version = self.backend.version
+            self.cache_backend = cache_backend
+            self.segment_store = open_segment_store(cache_backend)
+            self.cache_stats = CacheStats()
+            self.format, self.subtype, _ = SUPPORTED_AUDIO_FORMATS[SEGMENT_EXTENSION]
+            self.epub_path = epub_path
+            self.chunk_workers = chunk_workers
+            self.phoneme_cache = PhonemeCache(PHONEME_CACHE_PATH)
+            self._chunk_pool: Optional[ProcessPoolExecutor] = None
         except Exception as e:
             raise ConversionError(
                 f"Failed to initialize TextToSpeech: {str(e)}", ErrorCodes.INVALID_VOICE
@@ -97,74 +232,322 @@ class AudioConverter:
                 ErrorCodes.INVALID_VOICE,
             ) from e
 
-    def _audio_data_generator(
-        self, text: str
-    ) -> Generator[KPipeline.Result, None, None]:
+    def _audio_data_generator(self, text: str) -> Iterator[tuple[str, np.ndarray]]:
         """Generate audio data from text.
 
+        The text is fed to the backend one chunk at a time, each chunk being a
+        paragraph or a run of sentences that fits in a single pass of the model.
+        Phonemes of chunks seen before, in any voice or at any speech rate, are
+        taken from the phoneme cache instead of running G2P again.
+
         Args:
             text: Text to convert
 
-        Returns:
-            Generator[KPipeline.Result, None, None]: Audio data generator
+        Yields:
+            tuple[str, np.ndarray]: Phonemes and audio of every pass of the model
         """
         try:
-            voice = self.voice.local_path if self.voice.local_path else self.voice.name
-            yield from self.tts(
-                text, voice=voice, speed=self.speech_rate, split_pattern=r"\n+"
-            )
+            voice = self.voice.name
+            phoneme_set = self.backend.phoneme_set
+            for chunk in split_text_chunks(text):
+                logger.trace(f"Converting chunk: {chunk[:50]}")
+                cached = self.phoneme_cache.get(phoneme_set, chunk)
+                if cached is not None:
+                    for phonemes in cached:
+                        yield (
+                            phonemes,
+                            self.backend.synthesize(phonemes, voice, self.speech_rate),
+                        )
+                    continue
+                chunk_phonemes = []
+                for phonemes, audio in self.backend.generate(
+                    chunk, voice, self.speech_rate
+                ):
+                    chunk_phonemes.append(phonemes)
+                    yield phonemes, audio
+                self.phoneme_cache.put(phoneme_set, chunk, chunk_phonemes)
         except Exception as e:
             raise ConversionError(
                 f"Failed to generate audio data: {str(e)}", ErrorCodes.UNKNOWN_ERROR
             ) from e
 
-    def convert_text(self, text: str) -> SoundFile:
-        """Convert text to speech.
+    def _iter_audio(self, text: str) -> Iterator[np.ndarray]:
+        """Synthesize text in this process.
 
         Args:
             text: Text to convert
 
+        Yields:
+            np.ndarray: Audio of every pass of the model, in order
+        """
+        for phonemes, audio in self._audio_data_generator(text):
+            logger.trace(f"Phonemes: {phonemes}")
+            yield audio
+
+    def _synthesize_chunk(self, chunk: str) -> np.ndarray:
+        """Synthesize a chunk of text in this process.
+
+        Args:
+            chunk: Chunk of text to convert
+
         Returns:
-            SoundFile: Converted audio
+            np.ndarray: 16-bit PCM audio of the chunk
         """
-        try:
-            # Create a temporary file
-            temp_file = self.cache_dir_manager.get_file(text)
+        return _join_pcm16(self._iter_audio(chunk))
+
+    def _iter_audio_multiplexed(self, chunks: list[str]) -> Iterator[np.ndarray]:
+        """Synthesize chunks of text with the multiplexer.
+
+        Chunks are phonemized in this thread while the multiplexer runs the model
+        on the chunks queued before them.
+
+        Args:
+            chunks: Chunks of text to convert
+
+        Yields:
+            np.ndarray: 16-bit PCM audio of every chunk, in order
+        """
+        assert self.multiplexer is not None
+        voice = self.voice.name
+        phoneme_set = self.backend.phoneme_set
+        pending: deque[list[Future[np.ndarray]]] = deque()
+        for chunk in chunks:
+            phonemes = self.phoneme_cache.get(phoneme_set, chunk)
+            if phonemes is None:
+                phonemes = self.backend.phonemize(chunk)
+                self.phoneme_cache.put(phoneme_set, chunk, phonemes)
+            pending.append(
+                [
+                    self.multiplexer.submit(passage, voice, self.speech_rate)
+                    for passage in phonemes
+                ]
+            )
+            while len(pending) > INFERENCE_LOOKAHEAD:
+                yield _join_pcm16(f.result() for f in pending.popleft())
+        while pending:
+            yield _join_pcm16(f.result() for f in pending.popleft())
+
+    def _get_chunk_pool(self) -> ProcessPoolExecutor:
+        """Get the pool of chunk workers, starting it on first use.
+
+        Returns:
+            ProcessPoolExecutor: Pool of chunk workers
+        """
+        if self._chunk_pool is None:
+            # torch does not survive a fork once its thread pools are running
+            self._chunk_pool = ProcessPoolExecutor(
+                max_workers=self.chunk_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_chunk_worker,
+                initargs=(
+                    self.epub_path,
+                    self.voice.name,
+                    self.speech_rate,
+                    self.backend.name,
+                    self.quantize,
+                    self.precision,
+                    self.compiled,
+                ),
+            )
+            logger.debug(f"Started {self.chunk_workers} chunk workers")
+        return self._chunk_pool
+
+    def _iter_audio_in_workers(self, chunks: list[str]) -> Iterator[np.ndarray]:
+        """Synthesize chunks of text in the chunk workers.
+
+        At most two chunks per worker are in flight at once, so chunks finished
+        early never pile up far ahead of the writer.
+
+        Args:
+            chunks: Chunks of text to convert
 
-            # If the file exists and caching is enabled, return the cached file
-            if os.path.exists(temp_file) and self.cache:
-                logger.trace(f"returning cached file: {temp_file}")
-                return SoundFile(temp_file)
+        Yields:
+            np.ndarray: 16-bit PCM audio of every chunk, in order
+        """
+        pool = self._get_chunk_pool()
+        pending: deque[Future[np.ndarray]] = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_synthesize_chunk, chunk))
+            if len(pending) >= 2 * self.chunk_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def close(self) -> None:
+        """Shut down the chunk workers, if any were started."""
+        if self._chunk_pool is not None:
+            self._chunk_pool.shutdown(wait=True, cancel_futures=True)
+            self._chunk_pool = None
+        self.phoneme_cache.close()
+        self.segment_store.close()
 
-            if os.path.exists(f"{temp_file}.generating"):
-                logger.trace(f"removing generating file: {temp_file}.generating")
-                os.remove(f"{temp_file}.generating")
+    def synthesize(self, text: str) -> list[Segment]:
+        """Synthesize text into audio segments, unless they are cached.
 
-            audio_data = SoundFile(
-                f"{temp_file}.generating",
+        Args:
+            text: Text to convert
+
+        Returns:
+            list[Segment]: Segments of the chunks of the text, in order
+        """
+        return list(self.synthesize_chunks(list(split_text_chunks(text))))
+
+    def synthesize_chunks(self, chunks: list[str]) -> Iterator[Segment]:
+        """Synthesize chunks of text into a segment each, unless they are cached.
+
+        Segments are keyed by chunk in the segment store, so any chunk a book
+        shares with another, or with another chapter, is only synthesized once.
+        Chunks missing from the store are synthesized together, fanned out to
+        the chunk workers or the multiplexer, and every segment is stored as soon
+        as it is synthesized.
+
+        Args:
+            chunks: Chunks of text to convert, see `split_text_chunks`
+
+        Yields:
+            Segment: Segment of every chunk, in order
+        """
+        found = [self._find_chunk(chunk) for chunk in chunks]
+        missing = [chunk for chunk, segment in zip(chunks, found) if segment is None]
+        if self.multiplexer is not None:
+            audio = self._iter_audio_multiplexed(missing)
+        elif self.chunk_workers > 1 and len(missing) > 1:
+            audio = self._iter_audio_in_workers(missing)
+        else:
+            audio = map(self._synthesize_chunk, missing)
+        for chunk, segment in zip(chunks, found):
+            yield segment if segment is not None else self._store(chunk, next(audio))
+
+    def _find_chunk(self, chunk: str) -> Optional[Segment]:
+        """Find the segment of a chunk in the segment store.
+
+        Args:
+            chunk: Chunk of text
+
+        Returns:
+            Optional[Segment]: The segment, or None if it must be synthesized
+        """
+        if not self.cache:
+            return None
+        name = self.segment_store.find(self._segment_key(chunk))
+        self.cache_stats.record(name is not None)
+        if name is None:
+            return None
+        logger.trace(f"returning cached segment: {name}")
+        with self.segment_store.open(name) as audio:
+            return Segment(chunk, name, audio.frames)
+
+    def _store(self, chunk: str, audio: np.ndarray) -> Segment:
+        """Write the audio of a chunk to a new segment.
+
+        Args:
+            chunk: Chunk of text
+            audio: 16-bit PCM audio of the chunk
+
+        Returns:
+            Segment: The segment written
+        """
+        if not self.cache:
+            temp_file = self.cache_dir_manager.get_file(chunk)
+            # Other workers may be synthesizing the same text into the same file
+            generating_file = f"{temp_file}.{writer_id()}.generating"
+            self._write_segment(audio, generating_file)
+            os.replace(generating_file, temp_file)
+            return Segment(chunk, temp_file, len(audio))
+
+        key = self._segment_key(chunk)
+        generating_file = self.segment_store.scratch_path(key)
+        self._write_segment(audio, generating_file)
+        return Segment(chunk, self.segment_store.put(key, generating_file), len(audio))
+
+    def _segment_key(self, text: str) -> str:
+        """Get the key of the segment of a text in the segment store.
+
+        Args:
+            text: Text of the segment
+
+        Returns:
+            str: Key of the segment
+        """
+        return segment_key(self.model_version, self.voice.name, self.speech_rate, text)
+
+    def is_cached(self, text: str) -> bool:
+        """Tell whether every chunk of a text is in the segment store.
+
+        Args:
+            text: Text to look up
+
+        Returns:
+            bool: Whether the text can be converted without synthesizing
+        """
+        return self.cache and all(
+            self.segment_store.find(self._segment_key(chunk)) is not None
+            for chunk in split_text_chunks(text)
+        )
+
+    def open_segment(self, name: str) -> SoundFile:
+        """Open an audio segment synthesized by this or another converter.
+
+        Args:
+            name: Name of a `Segment`
+
+        Returns:
+            SoundFile: Audio of the segment
+        """
+        if self.cache:
+            return self.segment_store.open(name)
+        return SoundFile(name)
+
+    def _write_segment(self, audio: np.ndarray, path: str) -> None:
+        """Write audio to a new audio file.
+
+        Args:
+            audio: 16-bit PCM audio
+            path: Path of the file to write
+        """
+        if os.path.exists(path):
+            logger.trace(f"removing generating file: {path}")
+            os.remove(path)
+
+        audio_data = SoundFile(
+            path,
+            mode="w",
+            samplerate=SAMPLE_RATE,
+            channels=1,
+            format=self.format,
+            subtype=self.subtype,
+        )
+        audio_data.write(audio)
+        audio_data.close()
+
+    def convert_text(self, text: str) -> SoundFile:
+        """Convert text to speech.
+
+        Args:
+            text: Text to convert
+
+        Returns:
+            SoundFile: Converted audio of the whole text
+        """
+        try:
+            segments = self.synthesize(text)
+            if len(segments) == 1:
+                return self.open_segment(segments[0].name)
+            # Join the segments of the chunks into a file of the book
+            path = self.cache_dir_manager.get_file(text)
+            with SoundFile(
+                path,
                 mode="w",
                 samplerate=SAMPLE_RATE,
                 channels=1,
                 format=self.format,
                 subtype=self.subtype,
-            )
-            int_size = np.int16
-            max_int_size = np.iinfo(int_size).max
-            # Generate speech
-            for result in self._audio_data_generator(text):
-                phonemes = result.phonemes
-                audio = result.audio
-                logger.trace(f"Phonemes: {phonemes}")
-                if audio is None:
-                    continue
-                audio_bytes = (audio.numpy() * max_int_size).astype(int_size)
-                audio_data.write(audio_bytes)
-
-            # Close the audio data, and rename the file to the final file
-            audio_data.close()
-            os.rename(f"{temp_file}.generating", temp_file)
-            return SoundFile(temp_file)
-
+            ) as audio_data:
+                for segment in segments:
+                    with self.open_segment(segment.name) as audio:
+                        for block in audio.blocks(AUDIO_BLOCK_FRAMES, dtype="int16"):
+                            audio_data.write(block)
+            return SoundFile(path)
         except Exception as e:
             raise ConversionError(
                 f"Failed to convert text to speech: {str(e)}", ErrorCodes.UNKNOWN_ERROR
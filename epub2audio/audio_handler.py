@@ -5,6 +5,7 @@ import io
 from dataclasses import dataclass
 from pathlib import Path
 from shutil import move
+from typing import Optional
 
 import mutagen
 from loguru import logger
@@ -30,9 +31,14 @@ from PIL import Image
 from soundfile import SoundFile
 from tqdm import tqdm  # type: ignore
 
-from .config import SUPPORTED_AUDIO_FORMATS, ErrorCodes
+from .config import (
+    AUDIO_BLOCK_FRAMES,
+    SAMPLE_RATE,
+    SUPPORTED_AUDIO_FORMATS,
+    ErrorCodes,
+)
 from .epub_processor import BookMetadata
-from .helpers import AudioHandlerError, CacheDirManager, StrPath, format_time
+from .helpers import AudioHandlerError, StrPath, format_time
 
 
 @dataclass
@@ -81,9 +87,9 @@ class AudioHandler:
         self.output_path = Path(output_path)
         self.extension = self.output_path.suffix
         self.metadata = metadata
-        self.cache_dir_manager = CacheDirManager(epub_path, extension=self.extension)
         self.chapter_markers: list[ChapterMarker] = []
         self.quiet = quiet
+        self._audio_file: Optional[SoundFile] = None
 
     def add_chapter_marker(
         self, title: str, start_time: float, end_time: float
@@ -251,6 +257,69 @@ class AudioHandler:
         else:
             raise ValueError(f"Unsupported audio file type: {type(audio_file)}")
 
+    def start_audio_file(self, sample_rate: int = SAMPLE_RATE) -> None:
+        """Start writing the audio of the final file.
+
+        Segments are then added one at a time with `append_audio`, and the file
+        is completed with `finish_audio_file`. The audio is written next to the
+        output path, so completing it is a rename rather than another copy.
+
+        Args:
+            sample_rate: Sample rate of the audio segments
+        """
+        format_info = SUPPORTED_AUDIO_FORMATS[self.extension]
+        self._audio_file = SoundFile(
+            self.partial_path,
+            mode="w",
+            samplerate=sample_rate,
+            channels=1,
+            format=format_info.format,
+            subtype=format_info.subtype,
+        )
+
+    @property
+    def partial_path(self) -> Path:
+        """Path the final file is written to before it is complete."""
+        return self.output_path.with_suffix(f".partial{self.extension}")
+
+    def append_audio(self, segment: SoundFile) -> int:
+        """Append an audio segment to the final file.
+
+        The segment is copied in fixed-size blocks of 16-bit samples, so memory
+        use does not grow with the length of the segment.
+
+        Args:
+            segment: Audio segment to append
+
+        Returns:
+            int: Number of frames appended
+        """
+        if self._audio_file is None:
+            raise ValueError("Audio file has not been started")
+        if segment.samplerate != self._audio_file.samplerate:
+            raise ValueError("All audio segments must have the same sample rate")
+
+        # Read from the segment itself, which may not be backed by a path
+        frames = 0
+        segment.seek(0)
+        for block in segment.blocks(blocksize=AUDIO_BLOCK_FRAMES, dtype="int16"):
+            self._audio_file.write(block)
+            frames += len(block)
+        return frames
+
+    def _close_audio_file(self) -> SoundFile:
+        """Close the audio of the final file.
+
+        Returns:
+            SoundFile: The written audio
+        """
+        if self._audio_file is None:
+            raise ValueError("Audio file has not been started")
+        self._audio_file.close()
+        name = self._audio_file.name
+        self._audio_file = None
+        return SoundFile(name)
+
     def _concatenate_segments(self, segments: list[SoundFile]) -> SoundFile:
         """Concatenate multiple audio segments.
 
@@ -269,16 +338,7 @@ class AudioHandler:
             raise ValueError("All audio segments must have the same sample rate")
 
         # Concatenate the audio data
-        temp_file = self.cache_dir_manager.get_file("concatenated")
-        format_info = SUPPORTED_AUDIO_FORMATS[self.extension]
-        concatenated_data = SoundFile(
-            temp_file,
-            mode="w",
-            samplerate=sample_rate,
-            channels=1,
-            format=format_info.format,
-            subtype=format_info.subtype,
-        )
+        self.start_audio_file(sample_rate)
         with tqdm(
             total=sum(segment.frames for segment in segments),
             desc="Concatenating audio segments",
@@ -286,12 +346,16 @@ class AudioHandler:
             unit="frames",
         ) as pbar:
             for segment in segments:
-                with SoundFile(segment.name, mode="r") as sf:
-                    data = sf.read()
-                concatenated_data.write(data)
-                pbar.update(len(data))
-        concatenated_data.close()
-        return SoundFile(concatenated_data.name)
+                pbar.update(self.append_audio(segment))
+        return self._close_audio_file()
+
+    def finish_audio_file(self) -> None:
+        """Complete the final file started with `start_audio_file`.
+
+        Raises:
+            AudioHandlerError: If writing the audio file fails
+        """
+        self._write_final_file(self._close_audio_file())
 
     def finalize_audio_file(self, segments: list[SoundFile]) -> None:
         """Write the final audio file with metadata.
@@ -302,7 +366,17 @@ class AudioHandler:
         Raises:
             AudioHandlerError: If writing the audio file fails
         """
-        final_segment = self._concatenate_segments(segments)
+        self._write_final_file(self._concatenate_segments(segments))
+
+    def _write_final_file(self, final_segment: SoundFile) -> None:
+        """Add metadata to the concatenated audio and move it to the output path.
+
+        Args:
+            final_segment: Concatenated audio of the whole book
+
+        Raises:
+            AudioHandlerError: If writing the audio file fails
+        """
         try:
             # Add metadata
             logger.trace(f"Adding metadata to final audio file, {final_segment.name}")
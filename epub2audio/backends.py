@@ -0,0 +1,1115 @@
+"""Text-to-speech backends that `AudioConverter` dispatches to."""
+
+import contextlib
+import copy
+import json
+import os
+import sys
+import textwrap
+import threading
+import warnings
+import zlib
+from collections.abc import Callable, Iterator
+from importlib import metadata
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Protocol, Union
+
+import numpy as np
+from loguru import logger
+
+from .config import (
+    COMPILED_MODEL_DIR,
+    KOKORO_MAX_PHONEMES,
+    KOKORO_MODEL_NAME,
+    KOKORO_PATHS,
+    KOKORO_REPO_ID,
+    MODEL_CACHE_DIR,
+    ONNX_INTER_OP_THREADS,
+    ONNX_INTRA_OP_THREADS,
+    ONNX_OPSET_VERSION,
+    PRECISIONS,
+    PRIVATE_MODEL_DIR,
+    QUANTIZATIONS,
+    SAMPLE_RATE,
+    STUB_PHONEME_SECONDS,
+    TTS_BACKENDS,
+)
+from .helpers import StrPath, file_sha256
+from .registry import get_registry
+from .voices import Voice
+
+if TYPE_CHECKING:
+    from kokoro import KModel, KPipeline
+
+# Read from the metadata of the package, since importing it imports torch
+kokoro_version = metadata.version("kokoro")
+_kokoro_lock = threading.Lock()
+# Held while building a model with its parameters on the meta device
+_meta_lock = threading.Lock()
+
+
+def _ignored_in_thread(method: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a method of the logger so that this thread's calls are ignored.
+
+    Other threads still call the method, so they can keep setting up logging
+    while kokoro is imported.
+
+    Args:
+        method: Method to wrap
+
+    Returns:
+        Callable[..., Any]: Method ignoring the calls of the current thread
+    """
+    thread = threading.get_ident()
+
+    def call(*args: Any, **kwargs: Any) -> Any:
+        if threading.get_ident() == thread:
+            return None
+        return method(*args, **kwargs)
+
+    return call
+
+
+def _import_kokoro() -> None:
+    """Import the model and pipeline of kokoro into this module, on first use.
+
+    kokoro imports torch, which takes seconds, so it is only imported once a
+    model is loaded. On import it replaces every handler of the logger with
+    its own, which would undo the logging set up by the command by then, so it
+    is kept from touching them. Only the calls of the importing thread are
+    ignored, since the logger is shared by every thread.
+    """
+    with _kokoro_lock:
+        if "kokoro" not in sys.modules:
+            logger.add = _ignored_in_thread(logger.add)  # type: ignore[method-assign]
+            logger.remove = _ignored_in_thread(logger.remove)  # type: ignore[method-assign]
+            try:
+                import kokoro  # noqa: F401
+            finally:
+                del logger.add, logger.remove
+        import kokoro
+
+    # Names patched in already are kept
+    globals().setdefault("KModel", kokoro.KModel)
+    globals().setdefault("KPipeline", kokoro.KPipeline)
+
+
+def __getattr__(name: str) -> Any:
+    """Import the model and pipeline of kokoro when they are looked up.
+
+    Args:
+        name: Name of the attribute
+
+    Returns:
+        Any: The model or pipeline class
+
+    Raises:
+        AttributeError: If the module has no such attribute
+    """
+    if name not in ("KModel", "KPipeline"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    _import_kokoro()
+    return globals()[name]
+
+
+class TTSBackend(Protocol):
+    """A text-to-speech model and its G2P, for the voices of a language.
+
+    Text is spoken in passes of the model: G2P turns text into the phonemes of
+    one or more passes, and the model turns the phonemes of a pass into audio
+    between -1 and 1. A backend may be shared by threads.
+    """
+
+    name: str  # One of `TTS_BACKENDS`
+    version: str  # Identifies the audio of the backend in the segment store
+    phoneme_set: str  # Identifies the phonemes of the backend in the phoneme cache
+
+    def phonemize(self, text: str) -> list[str]:
+        """Convert text to phonemes, without running the model.
+
+        Args:
+            text: Text to convert
+
+        Returns:
+            list[str]: Phonemes of every pass of the model
+        """
+        ...
+
+    def generate(
+        self, text: str, voice: str, speed: float
+    ) -> Iterator[tuple[str, np.ndarray]]:
+        """Convert text to phonemes and speak them, a pass at a time.
+
+        Args:
+            text: Text to speak
+            voice: Name of, or path to, the voice to speak
+            speed: Speech rate multiplier
+
+        Yields:
+            tuple[str, np.ndarray]: Phonemes and audio of every pass
+        """
+        ...
+
+    def synthesize(self, phonemes: str, voice: str, speed: float) -> np.ndarray:
+        """Speak the phonemes of a single pass.
+
+        Args:
+            phonemes: Phonemes, as returned by `phonemize`
+            voice: Name of, or path to, the voice to speak
+            speed: Speech rate multiplier
+
+        Returns:
+            np.ndarray: Audio of the phonemes
+        """
+        ...
+
+
+def _result_audio(result: "KPipeline.Result") -> np.ndarray:
+    """Get the audio of a result of a Kokoro pipeline.
+
+    Args:
+        result: Result of a pass of the model
+
+    Returns:
+        np.ndarray: Audio of the pass, empty if the model did not run
+    """
+    if result.audio is None:
+        return np.zeros(0, dtype=np.float32)
+    audio: np.ndarray = result.audio.float().numpy()
+    return audio
+
+
+def bf16_supported() -> bool:
+    """Tell whether the CPU runs bf16 natively, rather than emulating it.
+
+    Returns:
+        bool: Whether running the model in bf16 can pay off
+    """
+    import torch
+
+    return bool(
+        torch.backends.mkldnn.is_available()
+        and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    )
+
+
+def _keep_istft_fp32(model: "KModel") -> None:
+    """Run the inverse STFT ending the decoder of a model in fp32, under autocast.
+
+    It multiplies complex numbers, which have no bf16 kernels on the CPU, and
+    rounding the spectrum to bf16 would be heard anyway.
+
+    Args:
+        model: Model to change
+    """
+    import torch
+
+    stft = model.decoder.generator.stft
+    inverse = stft.inverse
+
+    def inverse_fp32(magnitude: torch.Tensor, phase: torch.Tensor) -> torch.Tensor:
+        with torch.autocast("cpu", enabled=False):
+            audio: torch.Tensor = inverse(magnitude.float(), phase.float())
+            return audio
+
+    stft.inverse = inverse_fp32
+
+
+class KokoroBackend:
+    """Kokoro, running its model with PyTorch."""
+
+    name = "kokoro"
+    version = f"{KOKORO_REPO_ID} {kokoro_version}"
+
+    def __init__(
+        self,
+        tts: "KPipeline",
+        lang_code: str,
+        quantize: Optional[str] = None,
+        precision: str = "fp32",
+        compiled: bool = False,
+    ):
+        """Wrap a pipeline.
+
+        Args:
+            tts: Pipeline loaded for the language
+            lang_code: Language code of the pipeline
+            quantize: Quantization of the model of the pipeline, one of
+                `QUANTIZATIONS`, or None for full precision
+            precision: Precision to run the model at, one of `PRECISIONS`. bf16
+                falls back to fp32 on CPUs that do not support it
+            compiled: Whether the model of the pipeline is traced
+        """
+        if precision == "bf16" and not bf16_supported():
+            logger.warning("This CPU does not support bf16, running the model in fp32")
+            precision = "fp32"
+        self.tts = tts
+        self.phoneme_set = lang_code
+        self.quantize = quantize
+        self.precision = precision
+        self.compiled = compiled
+        # Quantized weights and lower precisions speak slightly differently
+        if quantize is not None:
+            self.version = f"{KokoroBackend.version} {quantize}"
+        elif precision != "fp32":
+            self.version = f"{KokoroBackend.version} {precision}"
+        self._g2p: Optional[KPipeline] = None
+        self._g2p_lock = threading.Lock()
+
+    @classmethod
+    def load(
+        cls,
+        voice: Voice,
+        quantize: Optional[str] = None,
+        precision: str = "fp32",
+        compiled: bool = False,
+    ) -> "KokoroBackend":
+        """Load the model and the pipeline for the language of a voice.
+
+        Args:
+            voice: Voice the pipeline is for
+            quantize: Quantization of the model, one of `QUANTIZATIONS`, or None
+                for full precision
+            precision: Precision to run the model at, one of `PRECISIONS`
+            compiled: Whether to run the model traced with TorchScript, which
+                only runs in fp32
+
+        Returns:
+            KokoroBackend: Backend that can speak any voice of the language
+
+        Raises:
+            ValueError: If the model is run in bf16 quantized or compiled
+        """
+        if quantize is not None and precision != "fp32":
+            raise ValueError(f"A {quantize} model cannot run in {precision}")
+        if compiled and precision != "fp32":
+            raise ValueError(f"A compiled model cannot run in {precision}")
+        _import_kokoro()
+        model: Union[bool, KModel] = True
+        if compiled:
+            model = False
+        elif quantize is not None:
+            model = load_quantized_model(quantize)
+        elif get_registry().model_weight is not None:
+            # Built from the files found, as the pipeline would ask the hub
+            model = _load_model()
+        tts = KPipeline(lang_code=voice.lang_code, repo_id=KOKORO_REPO_ID, model=model)
+        if compiled:
+            # The pipeline only calls its model, so the traced one stands in
+            tts.model = load_compiled_model(quantize)
+        backend = cls(tts, voice.lang_code, quantize, precision, compiled)
+        if backend.precision == "bf16":
+            _keep_istft_fp32(tts.model)
+        return backend
+
+    def _inference(self) -> contextlib.ExitStack:
+        """Enter the mode to run the model in, for a pass.
+
+        Inference mode skips the bookkeeping of autograd, and autocast runs
+        the matrix products and convolutions in bf16 if asked to.
+
+        Returns:
+            contextlib.ExitStack: Context to run the model in
+        """
+        import torch
+
+        stack = contextlib.ExitStack()
+        stack.enter_context(torch.inference_mode())
+        if self.precision == "bf16":
+            stack.enter_context(torch.autocast("cpu", dtype=torch.bfloat16))
+        return stack
+
+    def _map_voice(self, voice: str) -> None:
+        """Map the pack of a voice from its file, before the pipeline reads it.
+
+        Args:
+            voice: Name of, or path to, the voice. Voices without a pack on
+                this machine are left to the pipeline, which downloads them
+        """
+        import torch
+
+        path = _local_voice(voice)
+        if path.endswith(".pt") and voice not in self.tts.voices:
+            self.tts.voices[voice] = torch.load(
+                path, map_location="cpu", mmap=True, weights_only=True
+            )
+
+    def phonemize(self, text: str) -> list[str]:
+        """Convert text to phonemes, without running the model.
+
+        Args:
+            text: Text to convert
+
+        Returns:
+            list[str]: Phonemes of every pass of the model
+        """
+        with self._g2p_lock:
+            if self._g2p is None:
+                # A pipeline without a model only runs G2P, sharing it with `tts`
+                self._g2p = copy.copy(self.tts)
+                self._g2p.model = None
+            return [result.phonemes for result in self._g2p(text, split_pattern=None)]
+
+    def generate(
+        self, text: str, voice: str, speed: float
+    ) -> Iterator[tuple[str, np.ndarray]]:
+        """Convert text to phonemes and speak them, a pass at a time.
+
+        Args:
+            text: Text to speak
+            voice: Name of, or path to, the voice to speak
+            speed: Speech rate multiplier
+
+        Yields:
+            tuple[str, np.ndarray]: Phonemes and audio of every pass
+        """
+        self._map_voice(voice)
+        results = iter(self.tts(text, voice=voice, speed=speed, split_pattern=None))
+        while True:
+            # Only the pass runs in the mode, not whoever consumes it
+            with self._inference():
+                result = next(results, None)
+            if result is None:
+                return
+            yield result.phonemes, _result_audio(result)
+
+    def synthesize(self, phonemes: str, voice: str, speed: float) -> np.ndarray:
+        """Speak the phonemes of a single pass.
+
+        Args:
+            phonemes: Phonemes, as returned by `phonemize`
+            voice: Name of, or path to, the voice to speak
+            speed: Speech rate multiplier
+
+        Returns:
+            np.ndarray: Audio of the phonemes
+        """
+        self._map_voice(voice)
+        with self._inference():
+            audio = [
+                _result_audio(result)
+                for result in self.tts.generate_from_tokens(
+                    phonemes, voice=voice, speed=speed
+                )
+            ]
+        return np.concatenate(audio) if audio else np.zeros(0, dtype=np.float32)
+
+
+class OnnxBackend:
+    """Kokoro, running its model exported to ONNX with ONNX Runtime.
+
+    G2P and the voices are those of Kokoro, so the phonemes and the audio are
+    the same as those of `KokoroBackend`, up to rounding.
+    """
+
+    name = "onnx"
+    version = f"{KOKORO_REPO_ID} {kokoro_version} onnx"
+
+    def __init__(self, session: Any, g2p: "KPipeline", vocab: dict[str, int]):
+        """Wrap an inference session.
+
+        Args:
+            session: ONNX Runtime session of the graph exported by `export_onnx`
+            g2p: Pipeline without a model for the language, for G2P and voices
+            vocab: Token of every phoneme, from the configuration of the model
+        """
+        self.session = session
+        self.g2p = g2p
+        self.vocab = vocab
+        self.phoneme_set = g2p.lang_code
+        self._inputs = [graph_input.name for graph_input in session.get_inputs()]
+        self._voices: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, voice: Voice) -> "OnnxBackend":
+        """Load the exported graph and the G2P for the language of a voice.
+
+        Args:
+            voice: Voice the backend is for
+
+        Returns:
+            OnnxBackend: Backend that can speak any voice of the language
+
+        Raises:
+            ImportError: If ONNX Runtime is not installed
+            FileNotFoundError: If the model has not been exported
+        """
+        try:
+            import onnxruntime as ort  # type: ignore
+        except ImportError as e:
+            raise ImportError(
+                "The onnx backend needs ONNX Runtime: pip install 'epub2audio[onnx]'"
+            ) from e
+        path = Path(KOKORO_PATHS["onnx_model"])
+        if not path.exists():
+            raise FileNotFoundError(
+                f"No ONNX model at {path}, export one with `epub2audio export-onnx`"
+            )
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = ONNX_INTRA_OP_THREADS
+        options.inter_op_num_threads = ONNX_INTER_OP_THREADS
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(
+            str(path), options, providers=["CPUExecutionProvider"]
+        )
+        logger.debug(f"Loaded ONNX model {path}")
+        _import_kokoro()
+        g2p = KPipeline(lang_code=voice.lang_code, repo_id=KOKORO_REPO_ID, model=False)
+        return cls(session, g2p, _load_config()["vocab"])
+
+    def _voice(self, voice: str) -> np.ndarray:
+        """Get the styles of a voice, loading it on first use.
+
+        Args:
+            voice: Name of, or path to, the voice
+
+        Returns:
+            np.ndarray: Style of the voice for every number of phonemes
+        """
+        with self._lock:
+            if voice not in self._voices:
+                self._voices[voice] = self.g2p.load_voice(_local_voice(voice)).numpy()
+            return self._voices[voice]
+
+    def phonemize(self, text: str) -> list[str]:
+        """Convert text to phonemes.
+
+        Args:
+            text: Text to convert
+
+        Returns:
+            list[str]: Phonemes of every pass of the model
+        """
+        with self._lock:
+            return [result.phonemes for result in self.g2p(text, split_pattern=None)]
+
+    def generate(
+        self, text: str, voice: str, speed: float
+    ) -> Iterator[tuple[str, np.ndarray]]:
+        """Convert text to phonemes and speak them, a pass at a time.
+
+        Args:
+            text: Text to speak
+            voice: Name of, or path to, the voice to speak
+            speed: Speech rate multiplier
+
+        Yields:
+            tuple[str, np.ndarray]: Phonemes and audio of every pass
+        """
+        for phonemes in self.phonemize(text):
+            yield phonemes, self.synthesize(phonemes, voice, speed)
+
+    def synthesize(self, phonemes: str, voice: str, speed: float) -> np.ndarray:
+        """Speak the phonemes of a single pass.
+
+        Args:
+            phonemes: Phonemes, as returned by `phonemize`
+            voice: Name of, or path to, the voice to speak
+            speed: Speech rate multiplier
+
+        Returns:
+            np.ndarray: Audio of the phonemes
+        """
+        if not phonemes:
+            return np.zeros(0, dtype=np.float32)
+        tokens = [token for token in map(self.vocab.get, phonemes) if token is not None]
+        # Like Kokoro, pick the style for the number of phonemes
+        style = self._voice(voice)[len(phonemes) - 1]
+        input_ids, ref_s, speed_input = self._inputs
+        waveform = self.session.run(
+            None,
+            {
+                input_ids: np.array([[0, *tokens, 0]], dtype=np.int64),
+                ref_s: style.astype(np.float32),
+                speed_input: np.array([speed], dtype=np.float32),
+            },
+        )[0]
+        return np.asarray(waveform, dtype=np.float32).reshape(-1)
+
+
+class StubBackend:
+    """Fast and deterministic stand-in for a model, speaking tones.
+
+    The phonemes of a pass are its text, and its audio a tone lasting
+    `STUB_PHONEME_SECONDS` per character at normal speed, pitched by voice.
+    It runs everything but the model, to measure or test the rest of a
+    conversion on any machine.
+    """
+
+    name = "stub"
+    version = "stub 1"
+    phoneme_set = "stub"
+
+    def phonemize(self, text: str) -> list[str]:
+        """Split text into passes, as long as those of Kokoro at most.
+
+        Args:
+            text: Text to convert
+
+        Returns:
+            list[str]: Text of every pass
+        """
+        return textwrap.wrap(text, KOKORO_MAX_PHONEMES)
+
+    def generate(
+        self, text: str, voice: str, speed: float
+    ) -> Iterator[tuple[str, np.ndarray]]:
+        """Split text into passes and speak them.
+
+        Args:
+            text: Text to speak
+            voice: Name of, or path to, the voice to speak
+            speed: Speech rate multiplier
+
+        Yields:
+            tuple[str, np.ndarray]: Text and audio of every pass
+        """
+        for phonemes in self.phonemize(text):
+            yield phonemes, self.synthesize(phonemes, voice, speed)
+
+    def synthesize(self, phonemes: str, voice: str, speed: float) -> np.ndarray:
+        """Speak a tone as long as the phonemes.
+
+        Args:
+            phonemes: Text of the pass
+            voice: Name of, or path to, the voice to speak
+            speed: Speech rate multiplier
+
+        Returns:
+            np.ndarray: Audio of the tone
+        """
+        frames = int(len(phonemes) * STUB_PHONEME_SECONDS * SAMPLE_RATE / speed)
+        pitch = 110 + zlib.crc32(voice.encode()) % 220
+        seconds = np.arange(frames, dtype=np.float32) / SAMPLE_RATE
+        return (0.1 * np.sin(2 * np.pi * pitch * seconds)).astype(np.float32)
+
+
+def _local_voice(voice: str) -> str:
+    """Resolve a voice to its pack on this machine, if it has one.
+
+    Args:
+        voice: Name of, or path to, the voice
+
+    Returns:
+        str: Path to the pack of the voice in the registry, or the voice as
+            given, for a path or a voice to download
+    """
+    path = get_registry().voices.get(voice)
+    return voice if path is None else str(path)
+
+
+def _load_config() -> dict[str, Any]:
+    """Load the configuration of the Kokoro model, downloading it if needed.
+
+    Returns:
+        dict[str, Any]: Configuration of the model
+    """
+    path = get_registry().config
+    if path is None:
+        from huggingface_hub import hf_hub_download
+
+        path = Path(hf_hub_download(repo_id=KOKORO_REPO_ID, filename="config.json"))
+    with open(path, encoding="utf-8") as f:
+        config: dict[str, Any] = json.load(f)
+    return config
+
+
+def _model_weight_path() -> Path:
+    """Get the weights of the Kokoro model, downloading them if needed.
+
+    Returns:
+        Path: Path to the local weights, or to those downloaded
+    """
+    weights = get_registry().model_weight
+    if weights is None:
+        from huggingface_hub import hf_hub_download
+
+        weights = Path(
+            hf_hub_download(repo_id=KOKORO_REPO_ID, filename=KOKORO_MODEL_NAME)
+        )
+    return weights
+
+
+@contextlib.contextmanager
+def _parameters_on_meta() -> Iterator[None]:
+    """Create the parameters of modules on the meta device, without storage.
+
+    Buffers and other tensors are still created on the CPU, since modules
+    compute them rather than load them. Modules are patched for every thread,
+    but only those the current thread creates are affected, and one thread at
+    a time.
+
+    Yields:
+        None: While parameters are created on the meta device
+    """
+    import torch
+
+    thread = threading.get_ident()
+
+    with _meta_lock:
+        register_parameter = torch.nn.Module.register_parameter
+
+        def register_on_meta(
+            self: torch.nn.Module, name: str, param: Optional[torch.nn.Parameter]
+        ) -> None:
+            if (
+                param is not None
+                and not param.is_meta
+                and threading.get_ident() == thread
+            ):
+                param = type(param)(param.to("meta"), requires_grad=param.requires_grad)
+            register_parameter(self, name, param)
+
+        torch.nn.Module.register_parameter = register_on_meta  # type: ignore[method-assign]
+        try:
+            yield
+        finally:
+            torch.nn.Module.register_parameter = register_parameter  # type: ignore[method-assign]
+
+
+def _fold_weight_norm(model: Any) -> Any:
+    """Fold the weight normalization of a model into its weights.
+
+    Weight-normalized layers compute their weights from a direction and a
+    magnitude on every pass, and keep them, so folding spares the computation
+    and lets the weights be shared.
+
+    Args:
+        model: Model to fold, in place
+
+    Returns:
+        Any: The model, without weight normalization
+    """
+    import torch
+    from torch.nn.utils.weight_norm import WeightNorm
+
+    for module in model.modules():
+        for hook in list(module._forward_pre_hooks.values()):
+            if isinstance(hook, WeightNorm):
+                torch.nn.utils.remove_weight_norm(module, hook.name)
+    return model
+
+
+def _derived_model_path(kind: str) -> Path:
+    """Get where a model derived from the weights is cached, by their digest.
+
+    Args:
+        kind: What was made of the weights, naming the file
+
+    Returns:
+        Path: Path to the cached model, in `MODEL_CACHE_DIR`
+    """
+    digest = file_sha256(_model_weight_path())[:16]
+    return MODEL_CACHE_DIR / f"kokoro-{digest}.{kind}.pt"
+
+
+def folded_model_path() -> Path:
+    """Get where the model with its weight normalization folded is cached.
+
+    Returns:
+        Path: Path to the cached weights
+    """
+    return _derived_model_path("folded")
+
+
+def _build_model(weights: Path) -> "KModel":
+    """Build the Kokoro model without weights, for them to be assigned.
+
+    Args:
+        weights: Weights of the model, which it maps but does not keep
+
+    Returns:
+        KModel: Model with its parameters on the meta device
+    """
+    from torch.utils.serialization import config as serialization
+
+    _import_kokoro()
+
+    mmap = serialization.load.mmap
+    # The model loads its weights into parameters without storage, so map
+    # them rather than read them for nothing
+    serialization.load.mmap = True
+    try:
+        with _parameters_on_meta(), warnings.catch_warnings():
+            warnings.filterwarnings("ignore", ".*copying from a non-meta parameter")
+            return KModel(
+                repo_id=KOKORO_REPO_ID, config=_load_config(), model=str(weights)
+            )
+    finally:
+        serialization.load.mmap = mmap
+
+
+def _load_model() -> "KModel":
+    """Load the Kokoro model at full precision, mapping its weights.
+
+    The weights are memory-mapped rather than read, so every process running
+    the model shares a single copy of them in the page cache rather than
+    holding its own. They are mapped with their weight normalization folded,
+    which is cached on first use, by the digest of the weights.
+
+    Returns:
+        KModel: Model at full precision, for inference
+    """
+    import torch
+
+    _import_kokoro()
+    weights = _model_weight_path()
+    path = folded_model_path()
+    if not path.exists():
+        logger.info(f"Folding the weight normalization of the model into {path}")
+        model = KModel(
+            repo_id=KOKORO_REPO_ID, config=_load_config(), model=str(weights)
+        )
+        state = _fold_weight_norm(model).state_dict()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        scratch = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        torch.save(state, scratch)
+        os.replace(scratch, path)
+    logger.debug(f"Mapping the model weights {path}")
+    model = _fold_weight_norm(_build_model(weights))
+    model.load_state_dict(
+        torch.load(path, map_location="cpu", mmap=True, weights_only=True),
+        assign=True,
+    )
+    # The pipeline leaves models it is given in training mode, with dropout
+    return model.eval()
+
+
+def quantized_model_path(quantize: str) -> Path:
+    """Get where the quantized model is cached.
+
+    The model is pickled by the versions of PyTorch and Kokoro at hand, so it
+    is cached under them as well as under the digest of the weights.
+
+    Args:
+        quantize: Quantization of the model, one of `QUANTIZATIONS`
+
+    Returns:
+        Path: Path to the cached model, in `PRIVATE_MODEL_DIR`
+    """
+    import torch
+
+    digest = file_sha256(_model_weight_path())[:16]
+    return PRIVATE_MODEL_DIR / (
+        f"kokoro-{digest}.{quantize}-torch-{torch.__version__}"
+        f"-kokoro-{kokoro_version}.pt"
+    )
+
+
+def _is_private_dir(path: Path) -> bool:
+    """Create a directory only the user can access, and check it still is.
+
+    Args:
+        path: Path to the directory
+
+    Returns:
+        bool: Whether the directory belongs to the user, and nobody else can
+            write to it
+    """
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    info = path.stat()
+    return info.st_uid == os.getuid() and not info.st_mode & 0o022
+
+
+def _flatten_nothing() -> None:
+    """Stand in for the `flatten_parameters` that quantized LSTMs lack."""
+
+
+def quantize_model(model: Any) -> Any:
+    """Quantize the linear and LSTM layers of a model to int8, dynamically.
+
+    Weights are stored as int8 and activations quantized on the fly, which
+    speeds up the matrix products that dominate inference on the CPU. Weight
+    normalization is folded into the weights beforehand, sparing inference
+    from computing them again on every pass.
+
+    The model is quantized in place, since weight-normalized layers cannot be
+    copied.
+
+    Args:
+        model: Model at full precision
+
+    Returns:
+        Any: The model, quantized for the CPU
+    """
+    import torch
+    from torch.ao.nn.quantized.dynamic import LSTM as QuantizedLSTM
+    from torch.ao.quantization import quantize_dynamic
+
+    _fold_weight_norm(model)
+    with warnings.catch_warnings():
+        # Eager mode quantization and its tensors are deprecated, for torchao
+        warnings.simplefilter("ignore")
+        quantize_dynamic(
+            model.eval(),
+            {torch.nn.Linear, torch.nn.LSTM},
+            dtype=torch.qint8,
+            inplace=True,
+        )
+    for module in model.modules():
+        if isinstance(module, QuantizedLSTM):
+            # Kokoro flattens the parameters of its LSTMs before every pass
+            module.flatten_parameters = _flatten_nothing  # type: ignore[assignment]
+    return model
+
+
+def load_quantized_model(quantize: str) -> Any:
+    """Load the quantized Kokoro model, quantizing it on first use.
+
+    The quantized model is cached as a whole module, since its state only
+    loads into a model quantized already, by the digest of the weights and the
+    versions of PyTorch and Kokoro, so it is quantized again whenever one of
+    them changes. Loading a module runs code, so it is only cached in a
+    directory nobody else can write to.
+
+    Args:
+        quantize: Quantization of the model, one of `QUANTIZATIONS`
+
+    Returns:
+        Any: Quantized model
+
+    Raises:
+        ValueError: If there is no such quantization
+    """
+    import torch
+
+    if quantize not in QUANTIZATIONS:
+        raise ValueError(
+            f"Unknown quantization {quantize!r}, expected one of {QUANTIZATIONS}"
+        )
+    path = quantized_model_path(quantize)
+    if not _is_private_dir(path.parent):
+        logger.warning(
+            f"Other users can write to {path.parent}, "
+            f"quantizing the model to {quantize} without caching it"
+        )
+        return quantize_model(_load_model())
+    if path.exists():
+        logger.debug(f"Loading the {quantize} model {path}")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            # Only the layers left at full precision are mapped, quantized
+            # ones are packed again on loading
+            return torch.load(path, mmap=True, weights_only=False)
+    logger.info(f"Quantizing the model to {quantize}, cached in {path}")
+    model = quantize_model(_load_model())
+    scratch = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    torch.save(model, scratch)
+    os.replace(scratch, path)
+    return model
+
+
+class CompiledKModel:
+    """Kokoro model traced with TorchScript, standing in for a `KModel`.
+
+    It has what a pipeline uses of a model: it is called with phonemes and a
+    style, on the CPU.
+    """
+
+    def __init__(self, module: Any, vocab: dict[str, int], context_length: int):
+        """Wrap a traced model.
+
+        Args:
+            module: `KModelForONNX` traced by `load_compiled_model`
+            vocab: Token of every phoneme, from the configuration of the model
+            context_length: Most tokens the model reads in a pass
+        """
+        import torch
+
+        self.module = module
+        self.vocab = vocab
+        self.context_length = context_length
+        self.device = torch.device("cpu")
+
+    def __call__(
+        self, phonemes: str, ref_s: Any, speed: float = 1, return_output: bool = False
+    ) -> Any:
+        """Speak phonemes, like `KModel.forward`.
+
+        Args:
+            phonemes: Phonemes of a pass
+            ref_s: Style of the voice for the number of phonemes
+            speed: Speech rate multiplier
+            return_output: Whether to return the durations with the audio
+
+        Returns:
+            Any: Audio, or a `KModel.Output` with the durations if asked for
+        """
+        import torch
+
+        _import_kokoro()
+
+        tokens = [token for token in map(self.vocab.get, phonemes) if token is not None]
+        if len(tokens) + 2 > self.context_length:
+            raise ValueError(
+                f"{len(tokens)} tokens do not fit in a pass of {self.context_length}"
+            )
+        audio, pred_dur = self.module(
+            torch.tensor([[0, *tokens, 0]], dtype=torch.long),
+            ref_s,
+            torch.tensor([speed], dtype=torch.float32),
+        )
+        audio = audio.squeeze()
+        return KModel.Output(audio=audio, pred_dur=pred_dur) if return_output else audio
+
+
+def _example_inputs() -> tuple[Any, Any, Any]:
+    """Build inputs of the model to trace it with.
+
+    Returns:
+        tuple[Any, Any, Any]: Tokens, style and speed
+    """
+    import torch
+
+    input_ids = torch.randint(1, 100, (1, 64), dtype=torch.long)
+    style = torch.randn(1, 256)
+    speed = torch.tensor([1.0])
+    return input_ids, style, speed
+
+
+def compiled_model_path(quantize: Optional[str] = None) -> Path:
+    """Get where the traced model is cached, by weights and torch version.
+
+    Args:
+        quantize: Quantization of the model, one of `QUANTIZATIONS`, or None
+            for full precision
+
+    Returns:
+        Path: Path to the cached model
+    """
+    import torch
+
+    digest = file_sha256(_model_weight_path())[:16]
+    return (
+        COMPILED_MODEL_DIR
+        / f"kokoro-{digest}-{quantize or 'fp32'}-torch-{torch.__version__}.pt"
+    )
+
+
+def load_compiled_model(quantize: Optional[str] = None) -> CompiledKModel:
+    """Load the Kokoro model traced with TorchScript, tracing it on first use.
+
+    Tracing records the operations of a pass on example inputs, in a graph
+    that takes any number of tokens. The graph holds the weights, so loading
+    it skips building the model, as well as quantizing it.
+
+    Args:
+        quantize: Quantization of the model, one of `QUANTIZATIONS`, or None
+            for full precision
+
+    Returns:
+        CompiledKModel: Traced model
+    """
+    import torch
+
+    _import_kokoro()
+    from kokoro.model import KModelForONNX  # type: ignore
+
+    path = compiled_model_path(quantize)
+    config = _load_config()
+    context_length = config["plbert"]["max_position_embeddings"]
+    with warnings.catch_warnings():
+        # TorchScript is deprecated, and tracing warns of the Python values it
+        # records, none of which depend on the number of tokens
+        warnings.simplefilter("ignore")
+        if path.exists():
+            logger.debug(f"Loading the traced model {path}")
+            module = torch.jit.load(str(path), map_location="cpu")
+            return CompiledKModel(module, config["vocab"], context_length)
+
+        model = load_quantized_model(quantize) if quantize else _load_model()
+        logger.info(f"Tracing the model with TorchScript, cached in {path}")
+        with torch.inference_mode():
+            # The decoder adds noise, so two traces never match
+            module = torch.jit.trace(
+                KModelForONNX(model).eval(), _example_inputs(), check_trace=False
+            )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        scratch = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        torch.jit.save(module, str(scratch))
+        os.replace(scratch, path)
+    return CompiledKModel(module, config["vocab"], context_length)
+
+
+def export_onnx(path: StrPath) -> None:
+    """Export the Kokoro model to an ONNX graph, for `OnnxBackend`.
+
+    Args:
+        path: Path to write the graph to
+    """
+    import torch
+
+    _import_kokoro()
+    from kokoro.model import KModelForONNX
+
+    # The decoder runs its STFT on complex numbers, which ONNX cannot, unless
+    # it is built to run it as convolutions instead
+    model = KModel(
+        repo_id=KOKORO_REPO_ID,
+        config=_load_config(),
+        model=str(_model_weight_path()),
+        disable_complex=True,
+    )
+    model = KModelForONNX(_fold_weight_norm(model)).eval()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    torch.onnx.export(
+        model,
+        _example_inputs(),
+        str(path),
+        input_names=["input_ids", "style", "speed"],
+        output_names=["waveform", "duration"],
+        dynamic_axes={
+            "input_ids": {1: "tokens"},
+            "waveform": {0: "samples"},
+            "duration": {0: "tokens"},
+        },
+        opset_version=ONNX_OPSET_VERSION,
+        dynamo=False,
+    )
+
+
+def load_backend(
+    name: str,
+    voice: Voice,
+    quantize: Optional[str] = None,
+    precision: str = "fp32",
+    compiled: bool = False,
+) -> TTSBackend:
+    """Load a backend for the language of a voice.
+
+    Args:
+        name: Name of the backend, one of `TTS_BACKENDS`
+        voice: Voice the backend is for
+        quantize: Quantization of the model, one of `QUANTIZATIONS`, or None
+            for full precision. Only the kokoro backend quantizes its model
+        precision: Precision to run the model at, one of `PRECISIONS`. Only
+            the kokoro backend runs at another precision than fp32
+        compiled: Whether to run the model traced with TorchScript. Only the
+            kokoro backend traces its model
+
+    Returns:
+        TTSBackend: Backend that can speak any voice of the language
+
+    Raises:
+        ValueError: If there is no such backend, or it cannot run the model
+            as asked
+    """
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}, expected one of {TTS_BACKENDS}")
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unknown precision {precision!r}, expected one of {PRECISIONS}"
+        )
+    if quantize is not None and name != "kokoro":
+        raise ValueError(f"The {name} backend cannot be quantized")
+    if precision != "fp32" and name != "kokoro":
+        raise ValueError(f"The {name} backend cannot run in {precision}")
+    if compiled and name != "kokoro":
+        raise ValueError(f"The {name} backend cannot be compiled")
+    if name == "stub":
+        return StubBackend()
+    if name == "onnx":
+        return OnnxBackend.load(voice)
+    return KokoroBackend.load(voice, quantize, precision, compiled)
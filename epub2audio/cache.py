@@ -0,0 +1,966 @@
+"""Persistent caches shared across books, voices and runs."""
+
+import contextlib
+import fcntl
+import io
+import json
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, BinaryIO, Optional, Union
+
+from loguru import logger
+from soundfile import SoundFile  # type: ignore
+
+from .config import (
+    MAX_PACK_BYTES,
+    NETWORK_FILESYSTEMS,
+    PACK_CACHE_DIR,
+    PACK_INDEX_MMAP_BYTES,
+    SEGMENT_CACHE_DIR,
+    SEGMENT_EXTENSION,
+    SQLITE_JOURNAL_MODE,
+    STALE_SCRATCH_SECONDS,
+)
+from .helpers import StrPath
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a chunk of text before using it as a cache key.
+
+    Args:
+        text: Chunk of text
+
+    Returns:
+        str: The text with runs of whitespace collapsed to single spaces
+    """
+    return " ".join(text.split())
+
+
+def _filesystem_type(path: Path, mounts: StrPath = "/proc/mounts") -> str:
+    """Get the type of the filesystem holding a path, as Linux mounted it.
+
+    Args:
+        path: Path on the filesystem, which need not exist
+        mounts: Table of the mounted filesystems
+
+    Returns:
+        str: Type of the filesystem, such as "ext4" or "nfs4", or an empty
+            string if it is unknown
+    """
+    path = path.resolve()
+    mount_point, filesystem = Path("/"), ""
+    try:
+        with open(mounts, encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # Spaces in mount points are escaped
+                mount = Path(fields[1].replace("\\040", " "))
+                if (mount == path or mount in path.parents) and (
+                    len(mount.parts) >= len(mount_point.parts)
+                ):
+                    mount_point, filesystem = mount, fields[2]
+    except OSError:
+        return ""
+    return filesystem
+
+
+def sqlite_journal_mode(path: StrPath) -> str:
+    """Choose the journal mode of a cache database.
+
+    WAL lets lookups run while another process writes, but it coordinates
+    them through shared memory, which processes on different hosts do not
+    share. Databases on a network filesystem use a rollback journal instead,
+    and `SQLITE_JOURNAL_MODE` overrides the choice.
+
+    Args:
+        path: Path to the database
+
+    Returns:
+        str: Journal mode to open the database with
+    """
+    if SQLITE_JOURNAL_MODE:
+        return SQLITE_JOURNAL_MODE
+    filesystem = _filesystem_type(Path(path))
+    if filesystem in NETWORK_FILESYSTEMS:
+        logger.debug(f"{path} is on {filesystem}, journaling it without WAL")
+        return "DELETE"
+    return "WAL"
+
+
+class PhonemeCache:
+    """On-disk cache of the phonemes of text chunks.
+
+    Phonemes only depend on the text and the language, not on the voice or the
+    speech rate, so the phonemes of a chunk are looked up by language code and
+    normalized text. A chunk may map to several phoneme strings, one for every
+    pass of the model.
+
+    The cache is an SQLite database, which is safe to share between the worker
+    processes converting a book. If it cannot be read or written, a warning is
+    logged and the cache is disabled, as phonemes can always be generated again.
+    """
+
+    def __init__(self, path: StrPath):
+        """Initialize the phoneme cache.
+
+        The database is only opened when first used.
+
+        Args:
+            path: Path to the SQLite database
+        """
+        self.path = Path(path)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._disabled = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database, creating it if needed.
+
+        Returns:
+            sqlite3.Connection: Connection to the database
+        """
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Pipelined conversions look phonemes up from a stage thread
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection = connection
+            connection.execute(f"PRAGMA journal_mode={sqlite_journal_mode(self.path)}")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS phonemes ("
+                "lang_code TEXT NOT NULL, "
+                "text TEXT NOT NULL, "
+                "phonemes TEXT NOT NULL, "
+                "PRIMARY KEY (lang_code, text))"
+            )
+            connection.commit()
+        return self._connection
+
+    def get(self, lang_code: str, text: str) -> Optional[list[str]]:
+        """Get the cached phonemes of a chunk of text.
+
+        Args:
+            lang_code: Language code of the pipeline
+            text: Chunk of text
+
+        Returns:
+            Optional[list[str]]: Phoneme strings of the chunk, or None if the
+                chunk is not cached
+        """
+        if self._disabled:
+            return None
+        try:
+            with self._lock:
+                cursor = self._connect().execute(
+                    "SELECT phonemes FROM phonemes WHERE lang_code = ? AND text = ?",
+                    (lang_code, normalize_text(text)),
+                )
+                row = cursor.fetchone()
+        except sqlite3.Error as e:
+            self._disable(e)
+            return None
+        if row is None:
+            return None
+        phonemes: list[str] = json.loads(row[0])
+        return phonemes
+
+    def put(self, lang_code: str, text: str, phonemes: list[str]) -> None:
+        """Cache the phonemes of a chunk of text.
+
+        Args:
+            lang_code: Language code of the pipeline
+            text: Chunk of text
+            phonemes: Phoneme strings of the chunk
+        """
+        if self._disabled:
+            return
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO phonemes VALUES (?, ?, ?)",
+                    (lang_code, normalize_text(text), json.dumps(phonemes)),
+                )
+                connection.commit()
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def _disable(self, error: sqlite3.Error) -> None:
+        """Stop using the cache after an error.
+
+        Args:
+            error: Error raised by the database
+        """
+        logger.warning(f"Phoneme cache {self.path} disabled: {error}")
+        self._disabled = True
+        self.close()
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def segment_key(model_version: str, voice: str, speech_rate: float, text: str) -> str:
+    """Get the content address of a synthesized segment.
+
+    Args:
+        model_version: Version of the model synthesizing the segment
+        voice: Name of the voice
+        speech_rate: Speech rate multiplier
+        text: Text of the segment
+
+    Returns:
+        str: Hex digest identifying the segment
+    """
+    data = f"{model_version}\0{voice}\0{speech_rate:g}\0{normalize_text(text)}"
+    return sha256(data.encode()).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Hits and misses of a cache over a run."""
+
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def lookups(self) -> int:
+        """Number of times the cache was consulted."""
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of the lookups that were hits."""
+        if not self.lookups:
+            return 0.0
+        return self.hits / self.lookups
+
+    def record(self, hit: bool) -> None:
+        """Record a lookup.
+
+        Args:
+            hit: Whether the lookup was a hit
+        """
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def update(self, other: "CacheStats") -> None:
+        """Add the lookups of another run, such as a worker process.
+
+        Args:
+            other: Statistics to add
+        """
+        self.hits += other.hits
+        self.misses += other.misses
+
+    def __str__(self) -> str:
+        """Return a string representation of the cache statistics."""
+        return f"{self.hits}/{self.lookups} hits ({self.hit_rate:.1%})"
+
+
+@dataclass
+class StoreUsage:
+    """Number of segments in a segment store and the space they take up."""
+
+    segments: int = 0
+    size: int = 0
+    disk_size: int = 0
+
+    def add(self, size: int) -> None:
+        """Count a segment.
+
+        Args:
+            size: Size of the segment in bytes
+        """
+        self.segments += 1
+        self.size += size
+        self.disk_size += size
+
+
+def writer_id() -> str:
+    """Get an identifier of the current thread, unique across processes.
+
+    Returns:
+        str: Process and thread identifiers
+    """
+    return f"{os.getpid()}-{threading.get_ident()}"
+
+
+def _is_readable_segment(segment: Union[StrPath, BinaryIO]) -> bool:
+    """Check a segment can be decoded.
+
+    Args:
+        segment: Path or file object of the segment
+
+    Returns:
+        bool: Whether the segment is a readable audio file
+    """
+    try:
+        with SoundFile(segment) as audio:
+            audio.read(frames=1)
+        return True
+    except Exception:
+        return False
+
+
+class SegmentStore:
+    """Content-addressed store of synthesized segments, shared by all books.
+
+    Segments are addressed by `segment_key`, so identical text synthesized with
+    the same model, voice and speech rate is only ever synthesized once, even
+    across books. Every segment is a file of its own, spread over
+    subdirectories named after the first two characters of its key.
+
+    Segments are referred to by name, which worker processes can pass back to
+    the process assembling the audiobook. Here, the name is the path.
+    """
+
+    def __init__(self, root: StrPath):
+        """Initialize the segment store.
+
+        Args:
+            root: Directory holding the segments
+        """
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        """Get the path of a segment, creating its directory if needed.
+
+        Args:
+            key: Key of the segment
+
+        Returns:
+            Path: Path of the segment file, which may not exist yet
+        """
+        directory = self.root / key[:2]
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f"{key}{SEGMENT_EXTENSION}"
+
+    def find(self, key: str) -> Optional[str]:
+        """Find a segment in the store.
+
+        Args:
+            key: Key of the segment
+
+        Returns:
+            Optional[str]: Name of the segment, or None if it is not stored
+        """
+        path = str(self.path(key))
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return path
+
+    @staticmethod
+    def _touch(path: str) -> None:
+        """Mark a segment as used, for least recently used eviction.
+
+        The access time is set explicitly, as filesystems mounted with
+        `noatime` or `relatime` do not keep it up to date.
+
+        Args:
+            path: Path of the segment
+        """
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError as e:
+            logger.debug(f"Failed to update access time of {path}: {e}")
+
+    def scratch_path(self, key: str) -> str:
+        """Get a path to synthesize a segment to before storing it.
+
+        The path is unique to the thread, as other processes and threads may
+        be synthesizing the same text into the store.
+
+        Args:
+            key: Key of the segment
+
+        Returns:
+            str: Path of the temporary file
+        """
+        return f"{self.path(key)}.{writer_id()}.generating"
+
+    def put(self, key: str, path: str) -> str:
+        """Move a synthesized segment into the store.
+
+        Args:
+            key: Key of the segment
+            path: Path of the synthesized segment, see `scratch_path`
+
+        Returns:
+            str: Name of the segment
+        """
+        final_path = str(self.path(key))
+        os.replace(path, final_path)
+        return final_path
+
+    def open(self, name: str) -> SoundFile:
+        """Open a stored segment.
+
+        Args:
+            name: Name of the segment
+
+        Returns:
+            SoundFile: Audio of the segment
+        """
+        return SoundFile(name)
+
+    def _segment_files(self) -> list[tuple[Path, os.stat_result]]:
+        """List the segment files of the store.
+
+        Returns:
+            list[tuple[Path, os.stat_result]]: Every segment and its status
+        """
+        segments = []
+        for path in self.root.glob(f"??/*{SEGMENT_EXTENSION}"):
+            try:
+                segments.append((path, path.stat()))
+            except FileNotFoundError:
+                # Evicted by another process in the meantime
+                continue
+        return segments
+
+    def usage(self) -> StoreUsage:
+        """Measure the segments held by the store.
+
+        Returns:
+            StoreUsage: Number and size of the segments
+        """
+        segments = self._segment_files()
+        size = sum(status.st_size for _, status in segments)
+        return StoreUsage(len(segments), size, size)
+
+    def prune(self, max_bytes: int) -> StoreUsage:
+        """Evict the least recently used segments until the store fits a budget.
+
+        Args:
+            max_bytes: Size the segments may take up
+
+        Returns:
+            StoreUsage: Number and size of the evicted segments
+        """
+        segments = sorted(self._segment_files(), key=lambda s: s[1].st_atime)
+        size = sum(status.st_size for _, status in segments)
+        evicted = StoreUsage()
+        for path, status in segments:
+            if size <= max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            size -= status.st_size
+            evicted.add(status.st_size)
+        return evicted
+
+    def verify(self, fix: bool = False) -> list[str]:
+        """Check every segment of the store can be read.
+
+        Args:
+            fix: Whether to remove the segments that cannot be read, along
+                with scratch files left behind by interrupted runs
+
+        Returns:
+            list[str]: Names of the segments that cannot be read, and of the
+                leftover scratch files
+        """
+        bad = []
+        for path, _ in self._segment_files():
+            if not _is_readable_segment(path):
+                bad.append(str(path))
+                if fix:
+                    path.unlink(missing_ok=True)
+        stale = time.time() - STALE_SCRATCH_SECONDS
+        for path in self.root.glob("??/*.generating"):
+            if path.stat().st_mtime < stale:
+                bad.append(str(path))
+                if fix:
+                    path.unlink(missing_ok=True)
+        return bad
+
+    def close(self) -> None:
+        """Release the resources held by the store."""
+
+
+class _MappedSegment(io.RawIOBase):
+    """Read-only file over a segment of a memory-mapped pack.
+
+    Reads copy straight from the map into the buffer of the reader, rather
+    than through a copy of the whole segment.
+    """
+
+    def __init__(self, pack_map: mmap.mmap, offset: int, length: int):
+        """Initialize the file at the start of the segment.
+
+        Args:
+            pack_map: Map of the pack holding the segment
+            offset: Offset of the segment in the pack
+            length: Length of the segment
+        """
+        super().__init__()
+        self._map = pack_map
+        self._offset = offset
+        self._length = length
+        self._position = 0
+
+    def readable(self) -> bool:
+        """Tell the file can be read."""
+        return True
+
+    def seekable(self) -> bool:
+        """Tell the file can be sought."""
+        return True
+
+    def tell(self) -> int:
+        """Get the position in the segment."""
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Move to a position in the segment.
+
+        Args:
+            offset: Offset from the start, the position or the end of the
+                segment
+            whence: What the offset is from
+
+        Returns:
+            int: The new position
+        """
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._length
+        self._position = max(0, offset)
+        return self._position
+
+    def readinto(self, buffer: Any) -> int:
+        """Read from the segment into a buffer.
+
+        Args:
+            buffer: Buffer to fill
+
+        Returns:
+            int: Number of bytes read, 0 at the end of the segment
+        """
+        start = min(self._position, self._length)
+        with memoryview(buffer) as target, memoryview(self._map) as view:
+            count = min(target.nbytes, self._length - start)
+            begin = self._offset + start
+            target.cast("B")[:count] = view[begin : begin + count]
+        self._position = start + count
+        return count
+
+
+class PackSegmentStore(SegmentStore):
+    """Segment store keeping segments in a few large append-only pack files.
+
+    Caches on network filesystems suffer from the many small files of
+    `SegmentStore`. Here, every process appends the segments it synthesizes to
+    a pack file of its own, and an SQLite index maps each key to the pack, the
+    offset and the length of its segment, along with its number of frames.
+    Packs are memory-mapped for reading, so assembling a book reads them
+    sequentially instead of opening a file per segment. Segments are referred
+    to by key.
+
+    The index also records when each segment was last used. Evicted segments
+    are dropped from the index, and packs left with unused space are rewritten
+    once no process has appended to them for a while. Processes looking
+    segments up share a lock on the store that rewriting a pack takes
+    exclusively, so no segment moves or disappears between being looked up
+    and its pack being mapped, which keeps it readable once unlinked.
+    """
+
+    def __init__(self, root: StrPath, max_pack_bytes: int = MAX_PACK_BYTES):
+        """Initialize the pack segment store.
+
+        Args:
+            root: Directory holding the packs and their index
+            max_pack_bytes: Size after which a process starts a new pack
+        """
+        super().__init__(root)
+        self.max_pack_bytes = max_pack_bytes
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pack: Optional[BinaryIO] = None
+        self._pack_name = ""
+        self._maps: dict[str, mmap.mmap] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the index, creating it if needed.
+
+        Returns:
+            sqlite3.Connection: Connection to the index
+        """
+        if self._connection is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.root / "index.sqlite3", timeout=30, check_same_thread=False
+            )
+            self._connection = connection
+            journal_mode = sqlite_journal_mode(self.root / "index.sqlite3")
+            connection.execute(f"PRAGMA journal_mode={journal_mode}")
+            # A segment lost on power failure is synthesized again, skip fsyncs.
+            # Packs are synced before being indexed, so no row outlives its data
+            connection.execute("PRAGMA synchronous=NORMAL")
+            # Let lookups read the index through a memory map
+            connection.execute(f"PRAGMA mmap_size={PACK_INDEX_MMAP_BYTES}")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                "key TEXT PRIMARY KEY, "
+                "pack TEXT NOT NULL, "
+                "offset INTEGER NOT NULL, "
+                "length INTEGER NOT NULL, "
+                "frames INTEGER NOT NULL, "
+                "last_access REAL NOT NULL DEFAULT 0)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS segments_by_pack ON segments (pack)"
+            )
+            connection.commit()
+        return self._connection
+
+    @contextlib.contextmanager
+    def _store_lock(self, exclusive: bool = False) -> Iterator[None]:
+        """Hold the lock on the store, shared by readers, across processes.
+
+        The lock file is opened afresh every time, so that threads of the same
+        process exclude each other too.
+
+        Args:
+            exclusive: Whether to exclude every other holder, to move segments
+
+        Yields:
+            None: Once the lock is held
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / "store.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _lookup(self, key: str) -> Optional[tuple[str, int, int]]:
+        """Look a segment up in the index.
+
+        Args:
+            key: Key of the segment
+
+        Returns:
+            Optional[tuple[str, int, int]]: Pack, offset and length of the
+                segment, or None if it is not stored
+        """
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT pack, offset, length FROM segments WHERE key = ?", (key,)
+                )
+                .fetchone()
+            )
+        return None if row is None else (row[0], row[1], row[2])
+
+    def find(self, key: str) -> Optional[str]:
+        """Find a segment in the store.
+
+        Args:
+            key: Key of the segment
+
+        Returns:
+            Optional[str]: Name of the segment, or None if it is not stored
+        """
+        if self._lookup(key) is None:
+            return None
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "UPDATE segments SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            connection.commit()
+        return key
+
+    def scratch_path(self, key: str) -> str:
+        """Get a path to synthesize a segment to before storing it.
+
+        Args:
+            key: Key of the segment
+
+        Returns:
+            str: Path of the temporary file
+        """
+        scratch_dir = self.root / "scratch"
+        scratch_dir.mkdir(parents=True, exist_ok=True)
+        return str(scratch_dir / f"{key}.{writer_id()}{SEGMENT_EXTENSION}")
+
+    def _writable_pack(self) -> BinaryIO:
+        """Get the pack of this process, starting a new one when full.
+
+        Returns:
+            BinaryIO: Pack file opened for appending
+        """
+        if self._pack is not None and (
+            self._pack.tell() >= self.max_pack_bytes
+            # Rewritten by `prune` after sitting idle
+            or not (self.root / self._pack_name).exists()
+        ):
+            self._pack.close()
+            self._pack = None
+        if self._pack is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._pack_name = f"{uuid.uuid4().hex}.pack"
+            self._pack = open(self.root / self._pack_name, "ab")
+        return self._pack
+
+    def put(self, key: str, path: str) -> str:
+        """Append a synthesized segment to the pack of this process.
+
+        Args:
+            key: Key of the segment
+            path: Path of the synthesized segment, see `scratch_path`
+
+        Returns:
+            str: Name of the segment
+        """
+        with SoundFile(path) as segment:
+            frames = segment.frames
+        with open(path, "rb") as f:
+            data = f.read()
+        with self._lock:
+            pack = self._writable_pack()
+            offset = pack.tell()
+            pack.write(data)
+            # Readers in other processes may map the pack as soon as it is
+            # indexed, and the index must not point past it after a crash
+            pack.flush()
+            os.fsync(pack.fileno())
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR IGNORE INTO segments VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self._pack_name, offset, len(data), frames, time.time()),
+            )
+            connection.commit()
+        os.remove(path)
+        return key
+
+    def _map(self, pack: str, end: int) -> mmap.mmap:
+        """Memory-map a pack, mapping it again if it grew past the old map.
+
+        Args:
+            pack: Name of the pack
+            end: Offset up to which the pack must be mapped
+
+        Returns:
+            mmap.mmap: Read-only map of the pack
+        """
+        pack_map = self._maps.get(pack)
+        if pack_map is None or len(pack_map) < end:
+            # The old map is left to segments still reading from it, and
+            # closed once they are done with it
+            with open(self.root / pack, "rb") as f:
+                pack_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[pack] = pack_map
+        return pack_map
+
+    def open(self, name: str) -> SoundFile:
+        """Open a stored segment.
+
+        Args:
+            name: Name of the segment
+
+        Returns:
+            SoundFile: Audio of the segment
+
+        Raises:
+            KeyError: If the segment is not stored
+        """
+        with self._store_lock():
+            location = self._lookup(name)
+            if location is None:
+                raise KeyError(f"Segment {name} is not in {self.root}")
+            pack, offset, length = location
+            with self._lock:
+                pack_map = self._map(pack, offset + length)
+        return SoundFile(_MappedSegment(pack_map, offset, length))
+
+    def usage(self) -> StoreUsage:
+        """Measure the segments held by the store.
+
+        Returns:
+            StoreUsage: Number and size of the segments, and the size of the
+                packs holding them
+        """
+        with self._lock:
+            count, size = (
+                self._connect()
+                .execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM segments")
+                .fetchone()
+            )
+        disk_size = sum(pack.stat().st_size for pack in self.root.glob("*.pack"))
+        return StoreUsage(count, size, disk_size)
+
+    def prune(self, max_bytes: int) -> StoreUsage:
+        """Evict the least recently used segments until the store fits a budget.
+
+        Args:
+            max_bytes: Size the segments may take up
+
+        Returns:
+            StoreUsage: Number and size of the evicted segments
+        """
+        evicted = StoreUsage()
+        with self._lock:
+            connection = self._connect()
+            (size,) = connection.execute(
+                "SELECT COALESCE(SUM(length), 0) FROM segments"
+            ).fetchone()
+            rows = connection.execute(
+                "SELECT key, length FROM segments ORDER BY last_access"
+            )
+            keys = []
+            for key, length in rows:
+                if size <= max_bytes:
+                    break
+                keys.append((key,))
+                size -= length
+                evicted.add(length)
+            connection.executemany("DELETE FROM segments WHERE key = ?", keys)
+            connection.commit()
+        self._compact()
+        return evicted
+
+    def _compact(self) -> None:
+        """Rewrite idle packs that hold evicted segments, deleting empty ones.
+
+        Each pack is rewritten holding the lock on the store exclusively, for
+        no process to look up a segment being moved out of it.
+        """
+        idle = time.time() - STALE_SCRATCH_SECONDS
+        for pack_path in self.root.glob("*.pack"):
+            pack = pack_path.name
+            status = pack_path.stat()
+            if pack == self._pack_name or status.st_mtime > idle:
+                continue
+            with self._store_lock(exclusive=True), self._lock:
+                if not pack_path.exists():
+                    # Rewritten by another process meanwhile
+                    continue
+                connection = self._connect()
+                rows = connection.execute(
+                    "SELECT key, offset, length FROM segments WHERE pack = ? "
+                    "ORDER BY offset",
+                    (pack,),
+                ).fetchall()
+                if sum(length for _, _, length in rows) >= status.st_size:
+                    continue
+                # The map is left to segments still reading from it, which
+                # the pack outlives once unlinked
+                self._maps.pop(pack, None)
+                logger.debug(f"Compacting {pack_path}, keeping {len(rows)} segments")
+                with open(pack_path, "rb") as old:
+                    for key, offset, length in rows:
+                        old.seek(offset)
+                        data = old.read(length)
+                        new = self._writable_pack()
+                        new_offset = new.tell()
+                        new.write(data)
+                        connection.execute(
+                            "UPDATE segments SET pack = ?, offset = ? WHERE key = ?",
+                            (self._pack_name, new_offset, key),
+                        )
+                if self._pack is not None:
+                    self._pack.flush()
+                    os.fsync(self._pack.fileno())
+                connection.commit()
+                pack_path.unlink()
+        with self._lock:
+            if self._pack is not None:
+                self._pack.close()
+                self._pack = None
+                self._pack_name = ""
+
+    def verify(self, fix: bool = False) -> list[str]:
+        """Check every segment of the store can be read.
+
+        Args:
+            fix: Whether to drop the segments that cannot be read from the
+                index, and remove scratch files left behind by interrupted runs
+
+        Returns:
+            list[str]: Keys of the segments that cannot be read, and paths of
+                the leftover scratch files
+        """
+        # Segments moved by a compaction meanwhile would be found missing
+        with self._store_lock():
+            with self._lock:
+                rows = (
+                    self._connect()
+                    .execute("SELECT key, pack, offset, length FROM segments")
+                    .fetchall()
+                )
+            bad = []
+            for key, pack, offset, length in rows:
+                try:
+                    with self._lock:
+                        pack_map = self._map(pack, offset + length)
+                        data = pack_map[offset : offset + length]
+                    readable = len(data) == length and _is_readable_segment(
+                        io.BytesIO(data)
+                    )
+                except (OSError, ValueError):
+                    # Missing, or an empty pack that cannot be mapped
+                    readable = False
+                if not readable:
+                    bad.append(key)
+            if fix and bad:
+                with self._lock:
+                    connection = self._connect()
+                    connection.executemany(
+                        "DELETE FROM segments WHERE key = ?", [(key,) for key in bad]
+                    )
+                    connection.commit()
+        stale = time.time() - STALE_SCRATCH_SECONDS
+        for path in self.root.glob("scratch/*"):
+            if path.stat().st_mtime < stale:
+                bad.append(str(path))
+                if fix:
+                    path.unlink(missing_ok=True)
+        return bad
+
+    def close(self) -> None:
+        """Close the pack of this process, the maps and the index."""
+        with self._lock:
+            if self._pack is not None:
+                self._pack.close()
+                self._pack = None
+                self._pack_name = ""
+            for pack_map in self._maps.values():
+                pack_map.close()
+            self._maps.clear()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def open_segment_store(backend: str) -> SegmentStore:
+    """Open the segment store of a cache backend.
+
+    Args:
+        backend: Name of the backend, one of `CACHE_BACKENDS`
+
+    Returns:
+        SegmentStore: The segment store
+    """
+    if backend == "pack":
+        return PackSegmentStore(PACK_CACHE_DIR)
+    return SegmentStore(SEGMENT_CACHE_DIR)
@@ -23,14 +23,77 @@ DEFAULT_BITRATE = "192k"
 DEFAULT_SPEECH_RATE = 1.0
 AUDIO_FORMAT = "ogg"
 AUDIO_CHANNELS = 1  # Mono
+AUDIO_BLOCK_FRAMES = 65536  # Frames copied at a time when writing the final file
+# Segments are cached losslessly and only encoded to the output format at the end
+SEGMENT_EXTENSION = ".flac"
 
 # File handling
 DEFAULT_OUTPUT = "audiobook.ogg"
 CACHE_DIR = Path(getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "epub2audio"
+PHONEME_CACHE_PATH = CACHE_DIR / "phonemes.sqlite3"
+SEGMENT_CACHE_DIR = CACHE_DIR / "segments"
+PACK_CACHE_DIR = CACHE_DIR / "packs"
+COMPILED_MODEL_DIR = CACHE_DIR / "compiled"  # Models traced with TorchScript
+MODEL_CACHE_DIR = CACHE_DIR / "models"  # Weights folded by weight normalization
+# Quantized models are pickled whole, and run code when loaded, so they are kept
+# out of the cache, which may be shared, in a directory only the user can write
+PRIVATE_MODEL_DIR = (
+    Path(getenv("XDG_DATA_HOME", Path.home() / ".local" / "share"))
+    / "epub2audio"
+    / "models"
+)
+CACHE_BACKENDS = ["files", "pack"]
+MAX_PACK_BYTES = 1024 * 1024 * 1024  # A process starts a new pack past this size
+PACK_INDEX_MMAP_BYTES = 256 * 1024 * 1024
+# Size the segment store is pruned to after a conversion, such as "500M" or "10G"
+CACHE_MAX_SIZE = getenv("EPUB2AUDIO_CACHE_MAX_SIZE", "10G")
+HASH_INDEX_PATH = CACHE_DIR / "file_hashes.sqlite3"
+# Journal mode of the cache databases, such as "WAL" or "DELETE". WAL unless
+# the cache is on a network filesystem, whose hosts share no memory for it
+SQLITE_JOURNAL_MODE = getenv("EPUB2AUDIO_SQLITE_JOURNAL_MODE", "").upper()
+NETWORK_FILESYSTEMS = (
+    "nfs",
+    "nfs4",
+    "cifs",
+    "smb3",
+    "smbfs",
+    "9p",
+    "afs",
+    "ceph",
+    "glusterfs",
+    "lustre",
+    "gpfs",
+    "fuse.sshfs",
+    "fuse.glusterfs",
+)
+HASH_BLOCK_BYTES = 1024 * 1024  # Bytes read at a time when hashing an EPUB
+# Files left this long by a writer belong to an interrupted or idle process
+STALE_SCRATCH_SECONDS = 60 * 60
 
 # Progress reporting
 PROGRESS_UPDATE_INTERVAL = 0.5  # seconds
 
+# Request multiplexing, see `InferenceMultiplexer`
+INFERENCE_LOOKAHEAD = 4  # Chunks a converter queues ahead of the one it writes
+
+# Job server, see `epub2audio serve`
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 8765
+
+# Library conversion, see `epub2audio library`
+LIBRARY_INDEX_NAME = ".epub2audio-library.json"  # In the output directory
+BOOK_DOCUMENT_EXTENSIONS = (".xhtml", ".html", ".htm")
+
+# Maximum number of chapters waiting between two stages of the pipeline
+PIPELINE_QUEUE_SIZE = 2
+
+# Text chunking. Kokoro reads at most 510 phonemes at once, and English text
+# comes to about one phoneme per character, so this leaves room for numbers
+# and abbreviations that expand when spoken.
+MAX_CHUNK_CHARS = 400
+
+KOKORO_REPO_ID = "hexgrad/Kokoro-82M"
+KOKORO_MODEL_NAME = "kokoro-v1_0.pth"  # Weights of the model in the repository
 KOKORO_PATHS = {
     "config": getenv("KOKORO_CONFIG_PATH", "packages/kokoro-weights/config.json"),
     "model_weight": getenv(
@@ -39,9 +102,28 @@ KOKORO_PATHS = {
     "voice_weights": getenv(
         "KOKORO_VOICE_WEIGHTS_PATH", "packages/kokoro-weights/voices"
     ),
+    # Exported with `epub2audio export-onnx`, for the onnx backend
+    "onnx_model": getenv(
+        "KOKORO_ONNX_MODEL_PATH", "packages/kokoro-weights/kokoro-v1_0.onnx"
+    ),
 }
 
 
+# Text-to-speech backends, see `load_backend`
+TTS_BACKENDS = ["kokoro", "onnx", "stub"]
+KOKORO_MAX_PHONEMES = 510  # Phonemes the model speaks in a single pass
+# Threads ONNX Runtime runs an operator on, 0 for one per physical core
+ONNX_INTRA_OP_THREADS = int(getenv("EPUB2AUDIO_ONNX_THREADS", "0"))
+# The graph is a chain of operators, so running several at once rarely pays
+ONNX_INTER_OP_THREADS = 1
+ONNX_OPSET_VERSION = 17
+STUB_PHONEME_SECONDS = 0.07  # Audio the stub backend speaks per phoneme
+# Weights the kokoro backend can quantize its model to, on the CPU
+QUANTIZATIONS = ["int8"]
+# Precisions the kokoro backend can run its model at, bf16 on supporting CPUs
+PRECISIONS = ["fp32", "bf16"]
+
+
 # Error codes
 class ErrorCodes:
     """Error codes for the EPUB to Audiobook converter."""
@@ -51,6 +133,7 @@ class ErrorCodes:
     INVALID_VOICE = 2
     FILESYSTEM_ERROR = 3
     DISK_SPACE_ERROR = 4
+    MISSING_SEGMENTS = 5
     UNKNOWN_ERROR = 99
 
 
@@ -4,23 +4,31 @@
 import re
 import sys
 import time
+from collections.abc import Callable, Iterable, Iterator
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, Any, Optional, Union
 
 import click
 import roman
 from loguru import logger
-from soundfile import SoundFile  # type: ignore
 from tqdm import tqdm  # type: ignore
 
-from .audio_converter import AudioConverter
-from .audio_handler import AudioHandler
 from .config import (
+    CACHE_BACKENDS,
+    CACHE_MAX_SIZE,
     DEFAULT_LOGGER_ID,
+    DEFAULT_SERVER_HOST,
+    DEFAULT_SERVER_PORT,
     DEFAULT_SPEECH_RATE,
+    KOKORO_PATHS,
+    PHONEME_CACHE_PATH,
+    PIPELINE_QUEUE_SIZE,
+    PRECISIONS,
+    QUANTIZATIONS,
+    SAMPLE_RATE,
+    TTS_BACKENDS,
     ErrorCodes,
 )
-from .epub_processor import Chapter, EpubProcessor, get_book_length
 from .helpers import (
     ROMAN_REGEX,
     AudioHandlerError,
@@ -29,11 +37,25 @@ from .helpers import (
     check_disk_space,
     clean_filename,
     ensure_dir_exists,
+    file_sha256,
+    format_size,
     format_time,
-    get_duration,
+    parse_size,
 )
+from .manifest import Manifest
+from .pipeline import Pipeline, StageStats
+from .scheduler import ScheduleStats, lpt_schedule
 from .voices import Voice
 
+# Modules that import numpy, torch or the EPUB parsers are imported where they
+# are used, so that commands that do not convert start quickly
+if TYPE_CHECKING:
+    from .audio_converter import Segment
+    from .backends import TTSBackend
+    from .epub_processor import Chapter
+    from .multiplexer import InferenceMultiplexer
+    from .workers import ChapterAudio
+
 
 class Epub2Audio:
     """An epub converted into an audio book with AI."""
@@ -49,6 +71,19 @@ class Epub2Audio:
         convert: bool = True,
         max_chapters: int = -1,
         format: str = "ogg",
+        workers: int = 1,
+        pipeline: bool = False,
+        chunk_workers: int = 1,
+        cache_backend: str = "files",
+        cache_max_size: Optional[int] = None,
+        resume: bool = False,
+        shard: Optional[tuple[int, int]] = None,
+        merge: bool = False,
+        backend: Union[str, "TTSBackend"] = "kokoro",
+        multiplexer: Optional["InferenceMultiplexer"] = None,
+        quantize: Optional[str] = None,
+        precision: str = "fp32",
+        compiled: bool = False,
     ):
         """Creates an AudioBook from an Epub.
 
@@ -62,13 +97,51 @@ class Epub2Audio:
             convert: Whether to convert the epub immediately
             max_chapters: Maximum number of chapters to process, or -1 for no limit.
             format: Format to use for the output file.
+            workers: Number of worker processes synthesizing chapters in parallel.
+            pipeline: Whether to parse, synthesize, and encode chapters concurrently.
+            chunk_workers: Number of worker processes synthesizing the chunks of a
+                single chapter in parallel.
+            cache_backend: How cached segments are stored, "files" or "pack".
+            cache_max_size: Bytes the segment store is pruned to after the
+                conversion, or None for `CACHE_MAX_SIZE`.
+            resume: Whether to reuse the segments recorded in the manifest of
+                an interrupted conversion of the same book.
+            shard: Index starting at 1 and count of the shard to synthesize, to
+                only synthesize every count-th chapter into the segment store
+                without writing the audiobook. Implies cache, but not pipeline.
+            merge: Whether to assemble the audiobook from segments synthesized
+                by every shard, failing if any is missing. Implies cache.
+            backend: Name of the text-to-speech backend, one of `TTS_BACKENDS`,
+                or a backend already loaded for the language of the voice.
+            multiplexer: Multiplexer running the model for the language of the voice,
+                shared with other conversions, or None to run it directly.
+            quantize: Quantization of the model, one of `QUANTIZATIONS`, or None
+                for full precision.
+            precision: Precision the model runs at, one of `PRECISIONS`.
+            compiled: Whether to run the model traced with TorchScript.
         """
+        self.shard = shard
+        self.merge = merge
+        # Shards hand their segments over through the segment store
+        cache = cache or shard is not None or merge
         self.cache = cache
         self.quiet = quiet
         self.epub_path = epub_path
         self.voice = voice
         self.speech_rate = speech_rate
         self.max_chapters = max_chapters
+        self.workers = workers
+        # Shards are assigned from the whole list of chapters
+        self.pipeline = pipeline and shard is None and not merge
+        self.chunk_workers = chunk_workers
+        self.cache_backend = cache_backend
+        # Parsed before converting, rather than failing once the book is done
+        self.cache_max_size = (
+            parse_size(CACHE_MAX_SIZE) if cache_max_size is None else cache_max_size
+        )
+        self.resume = resume
+        self.stage_stats: list[StageStats] = []
+        self.schedule_stats: Optional[ScheduleStats] = None
         self.extension = f".{format}"
         if (
             output_path
@@ -97,12 +170,33 @@ class Epub2Audio:
 
         self.current_audibook_time = 0.0
 
+        from .audio_converter import AudioConverter
+        from .audio_handler import AudioHandler
+        from .epub_processor import get_book_length
+
         self.converter = AudioConverter(
             self.epub_path,
             voice=self.voice,
             speech_rate=self.speech_rate,
             cache=self.cache,
-            extension=self.extension,
+            chunk_workers=self.chunk_workers,
+            cache_backend=self.cache_backend,
+            backend=backend,
+            multiplexer=multiplexer,
+            quantize=quantize,
+            precision=precision,
+            compiled=compiled,
+        )
+        self.manifest = Manifest(
+            self.output_path.with_suffix(".manifest.jsonl"),
+            {
+                "epub_sha256": file_sha256(self.epub_path),
+                "voice": self.converter.voice.name,
+                "speech_rate": self.speech_rate,
+                "model_version": self.converter.model_version,
+                "cache": self.cache,
+                "cache_backend": self.cache_backend,
+            },
         )
         self.audio_handler = AudioHandler(
             self.epub_path,
@@ -112,7 +206,12 @@ class Epub2Audio:
         )
 
         # Estimate required disk space (rough estimate: 1MB per minute of audio)
-        estimated_space = get_book_length(self.chapters) * 100  # Very rough estimate
+        if self.pipeline:
+            # Chapters are only parsed while converting, so go by the file size
+            book_length = Path(self.epub_path).stat().st_size
+        else:
+            book_length = get_book_length(self.chapters)
+        estimated_space = book_length * 100  # Very rough estimate
         check_disk_space(self.output_path.parent, estimated_space)
 
         if convert:
@@ -130,11 +229,16 @@ class Epub2Audio:
         if not self.quiet:
             logger.info(f"Processing EPUB file: {self.epub_path}")
 
-        # Process EPUB
-        self.epub = EpubProcessor(self.epub_path)
+        from .epub_processor import EpubProcessor
+
+        # Process EPUB, leaving the chapters to the pipeline if it is used
+        self.epub = EpubProcessor(self.epub_path, lazy=self.pipeline)
         self.metadata = self.epub.metadata
         self.chapters = self.epub.chapters
         self.warnings = self.epub.warnings
+        if self.pipeline:
+            return
+
         uses_roman_numerals = True
         for chapter in self.chapters[1:]:
             if not re.search(r"^chapter\s+[ivxclm]+\s", chapter.title.lower()):
@@ -143,11 +247,15 @@ class Epub2Audio:
 
         if uses_roman_numerals:
             logger.debug("Using roman numerals for chapter markers")
-            self._roman_to_arabic()
+            self._roman_to_arabic(self.chapters)
+
+    def _roman_to_arabic(self, chapters: Iterable["Chapter"]) -> None:
+        """Convert roman numerals to arabic numerals.
 
-    def _roman_to_arabic(self) -> None:
-        """Convert roman numerals to arabic numerals."""
-        for chapter in self.chapters:
+        Args:
+            chapters: Chapters whose titles to convert
+        """
+        for chapter in chapters:
             chapter_number = ROMAN_REGEX.search(chapter.title)
             if chapter_number:
                 chapter_number = roman.fromRoman(chapter_number.group("number"))
@@ -155,39 +263,457 @@ class Epub2Audio:
                     ROMAN_REGEX, f"Chapter {chapter_number} ", chapter.title
                 )
 
-    def _process_epub_chapter(self, chapter: Chapter) -> None:
-        if self.max_chapters > 0 and len(self.chapters) > self.max_chapters:
-            logger.info(f"Skipping chapter {chapter.title} as max chapters reached")
-            return
+    def _chapters_to_convert(
+        self, chapters: Iterable["Chapter"]
+    ) -> Iterator["Chapter"]:
+        """Limit chapters to the maximum number of chapters to process.
+
+        Args:
+            chapters: Chapters of the book, in order
+
+        Yields:
+            Chapter: Chapters to convert
+        """
+        for i, chapter in enumerate(chapters):
+            if 0 < self.max_chapters <= i:
+                logger.info(f"Skipping chapter {chapter.title} as max chapters reached")
+                continue
+            yield chapter
+
+    def _parse_chapters(self, chapters: Iterator["Chapter"]) -> Iterator["Chapter"]:
+        """Prepare chapters as they are parsed, for the pipelined conversion.
+
+        Without the whole book at hand we cannot check that every chapter is
+        numbered in roman numerals, so any numeral heading is converted.
+
+        Args:
+            chapters: Chapters streamed from the EPUB
+
+        Yields:
+            Chapter: Chapters to convert
+        """
+        for chapter in self._chapters_to_convert(chapters):
+            self._roman_to_arabic([chapter])
+            self.chapters.append(chapter)
+            yield chapter
+
+    def _shard_chapters(self) -> list["Chapter"]:
+        """Get the chapters of the shard being synthesized.
+
+        Chapters are dealt out longest first to the shard with the least text
+        so far, so that the shards finish at about the same time, and every
+        node assigns the same chapters to a shard.
+
+        Returns:
+            list[Chapter]: Chapters of the shard
+        """
+        assert self.shard is not None
+        index, count = self.shard
+        chapters = list(self._chapters_to_convert(self.chapters))
+        costs = [len(chapter.title) + len(chapter.content) for chapter in chapters]
+        assignment, stats = lpt_schedule(costs, count)
+        logger.debug(f"Shards of {count} are expected to be {stats}")
+        return [chapters[i] for i in assignment[index - 1]]
+
+    def _synthesize_shard(self) -> None:
+        """Synthesize the chapters of a shard into the segment store."""
+        from .epub_processor import get_book_length
+
+        assert self.shard is not None
+        shard = f"{self.shard[0]}/{self.shard[1]}"
+        chapters = self._shard_chapters()
+        try:
+            with tqdm(
+                total=get_book_length(chapters),
+                desc=f"Synthesizing shard {shard}",
+                disable=self.quiet,
+                unit="chars",
+            ) as pbar:
+                for chapter, _ in self._synthesize_chapter_segments(chapters):
+                    pbar.update(len(chapter.content))
+        finally:
+            self.converter.close()
+
+        if not self.quiet:
+            generation_time = time.time() - self.generation_start_time
+            logger.success(
+                f"Shard {shard} synthesized {len(chapters)} chapters in "
+                f"{format_time(generation_time)}, merge once every shard is done"
+            )
+
+    def _check_shards_merged(self) -> None:
+        """Check that every chapter was synthesized by one of the shards.
+
+        Raises:
+            ConversionError: If a chapter is missing from the segment store
+        """
+        missing = [
+            chapter
+            for chapter in self._chapters_to_convert(self.chapters)
+            if not self.converter.is_cached(chapter.title)
+            or not self.converter.is_cached(chapter.content)
+        ]
+        if missing:
+            titles = ", ".join(f"'{chapter.title}'" for chapter in missing[:5])
+            raise ConversionError(
+                f"{len(missing)} chapters have not been synthesized by any shard "
+                f"yet, such as {titles}",
+                ErrorCodes.MISSING_SEGMENTS,
+            )
+
+    def _synthesize_part(
+        self, chapter: "Chapter", part: str, text: str
+    ) -> list["Segment"]:
+        """Synthesize a part of a chapter, unless the manifest has it already.
+
+        The chunks recorded in the manifest are reused, and every other chunk
+        is recorded as soon as it is synthesized, so an interrupted conversion
+        resumes at the first chunk missing rather than at the chapter.
+
+        Args:
+            chapter: Chapter the text belongs to
+            part: Part of the chapter, "announcement" or "content"
+            text: Text of the part
+
+        Returns:
+            list[Segment]: Audio segments of the chunks of the text
+        """
+        from .audio_converter import Segment
+        from .epub_processor import split_text_chunks
+
+        chunks = list(split_text_chunks(text))
+        entries = [
+            self.manifest.get(chapter.order, part, index, chunk)
+            for index, chunk in enumerate(chunks)
+        ]
+        missing = [chunk for chunk, entry in zip(chunks, entries) if entry is None]
+        segments = []
+        try:
+            synthesized = self.converter.synthesize_chunks(missing)
+            for index, (chunk, entry) in enumerate(zip(chunks, entries)):
+                if entry is not None:
+                    segments.append(Segment(chunk, entry.name, entry.frames))
+                    continue
+                segment = next(synthesized)
+                self._record_segment(chapter, part, index, segment)
+                segments.append(segment)
+        except Exception as e:
+            raise ConversionError(
+                f"Failed to convert text to speech: {str(e)}", ErrorCodes.UNKNOWN_ERROR
+            ) from e
+        return segments
+
+    def _synthesize_chapter(self, chapter: "Chapter") -> "ChapterAudio":
+        """Synthesize the announcement and content of a chapter.
+
+        Args:
+            chapter: Chapter to synthesize
+
+        Returns:
+            ChapterAudio: Segments of the announcement and content
+        """
+        from .cache import CacheStats
+        from .workers import ChapterAudio
 
         # Generate chapter announcement
-        announcement = self.converter.convert_text(chapter.title)
-        self.audio_segments.append(announcement)
-        logger.debug(
-            f"Chapter: '{chapter.title}' "
-            f"announcement duration: {get_duration(announcement)}"
-        )
+        announcement = self._synthesize_part(chapter, "announcement", chapter.title)
 
         # Convert chapter text
         logger.trace(
             f"start converting chapter '{chapter.title}' content: "
             f"{len(chapter.content)}"
         )
-        chapter_audio = self.converter.convert_text(chapter.content)
-        self.audio_segments.append(chapter_audio)
+        content = self._synthesize_part(chapter, "content", chapter.content)
+        return ChapterAudio(chapter.order, announcement, content, CacheStats())
+
+    def _resumed_part(
+        self, chapter: "Chapter", part: str, text: str
+    ) -> Optional[list["Segment"]]:
+        """Get the segments of a part of a chapter recorded in the manifest.
+
+        Args:
+            chapter: Chapter the text belongs to
+            part: Part of the chapter, "announcement" or "content"
+            text: Text of the part
+
+        Returns:
+            Optional[list[Segment]]: Segments of the chunks of the text, or None
+                unless every chunk was recorded
+        """
+        from .audio_converter import Segment
+        from .epub_processor import split_text_chunks
+
+        segments = []
+        for index, chunk in enumerate(split_text_chunks(text)):
+            entry = self.manifest.get(chapter.order, part, index, chunk)
+            if entry is None:
+                return None
+            segments.append(Segment(chunk, entry.name, entry.frames))
+        return segments
+
+    def _resumed_chapter(self, chapter: "Chapter") -> Optional["ChapterAudio"]:
+        """Get the segments of a chapter recorded in the manifest.
+
+        Args:
+            chapter: Chapter to look up
+
+        Returns:
+            Optional[ChapterAudio]: Segments of the announcement and content,
+                or None unless every chunk of both was recorded
+        """
+        from .cache import CacheStats
+        from .workers import ChapterAudio
+
+        announcement = self._resumed_part(chapter, "announcement", chapter.title)
+        content = self._resumed_part(chapter, "content", chapter.content)
+        if announcement is None or content is None:
+            return None
+        return ChapterAudio(chapter.order, announcement, content, CacheStats())
+
+    def _synthesize_chapter_segments(
+        self, chapters: Iterable["Chapter"]
+    ) -> Iterator[tuple["Chapter", "ChapterAudio"]]:
+        """Synthesize chapters, serially or in a worker pool.
+
+        Args:
+            chapters: Chapters to synthesize
+
+        Yields:
+            tuple[Chapter, ChapterAudio]: The chapter and its audio segments,
+                in chapter order
+        """
+        if self.workers <= 1:
+            for chapter in chapters:
+                yield chapter, self._synthesize_chapter(chapter)
+            return
+
+        from .workers import ChapterWorkerPool
+
+        with ChapterWorkerPool(
+            self.epub_path,
+            self.workers,
+            voice=self.converter.voice.name,
+            speech_rate=self.speech_rate,
+            cache=self.cache,
+            cache_backend=self.cache_backend,
+            backend=self.converter.backend.name,
+            quantize=self.converter.quantize,
+            precision=self.converter.precision,
+            compiled=self.converter.compiled,
+        ) as pool:
+            try:
+                yield from pool.convert(
+                    chapters,
+                    resume=self._resumed_chapter,
+                    longest_first=not self.pipeline,
+                )
+            finally:
+                self.converter.cache_stats.update(pool.cache_stats)
+                self.schedule_stats = pool.schedule_stats
+
+    def _record_segment(
+        self, chapter: "Chapter", part: str, index: int, segment: "Segment"
+    ) -> None:
+        """Record a segment of a chapter in the manifest, unless it already is.
+
+        Args:
+            chapter: Chapter the segment belongs to
+            part: Part of the chapter, "announcement" or "content"
+            index: Index of the chunk of the segment in the part
+            segment: The segment
+        """
+        if self.shard is not None:
+            # Shards hand their segments over through the segment store alone
+            return
+        entry = self.manifest.get(chapter.order, part, index, segment.text)
+        if entry is not None and entry.name == segment.name:
+            return
+        self.manifest.record(
+            chapter.order, part, index, segment.name, segment.frames, segment.text
+        )
+
+    def _synthesize_chapters(
+        self, chapters: Iterable["Chapter"]
+    ) -> Iterator[tuple["Chapter", list["Segment"], list["Segment"]]]:
+        """Synthesize chapters, recording their segments in the manifest.
+
+        Every segment is recorded in the manifest once synthesized, so an
+        interrupted conversion can be resumed from there. Worker processes
+        do not share the manifest, so theirs are recorded once their chapter
+        is done.
+
+        Args:
+            chapters: Chapters to synthesize
+
+        Yields:
+            tuple[Chapter, list[Segment], list[Segment]]: The chapter and the
+                segments of its announcement and content, in chapter order
+        """
+        for chapter, audio in self._synthesize_chapter_segments(chapters):
+            for part, segments in (
+                ("announcement", audio.announcement),
+                ("content", audio.content),
+            ):
+                for index, segment in enumerate(segments):
+                    self._record_segment(chapter, part, index, segment)
+            yield chapter, audio.announcement, audio.content
+
+    def _append_part(
+        self, chapter: "Chapter", part: str, index: int, segment: "Segment"
+    ) -> "Segment":
+        """Append a segment of a chapter to the final file.
+
+        The segment is only opened while it is copied. A segment recorded by an
+        earlier run may have been evicted from the segment store since, in
+        which case its chunk is synthesized again.
+
+        Args:
+            chapter: Chapter the segment belongs to
+            part: Part of the chapter, "announcement" or "content"
+            index: Index of the chunk of the segment in the part
+            segment: The segment
+
+        Returns:
+            Segment: The segment appended
+        """
+        try:
+            audio = self.converter.open_segment(segment.name)
+        except Exception:
+            logger.warning(
+                f"Segment {segment.name} of '{chapter.title}' is gone, "
+                "synthesizing it again"
+            )
+            segment = next(self.converter.synthesize_chunks([segment.text]))
+            self._record_segment(chapter, part, index, segment)
+            audio = self.converter.open_segment(segment.name)
+        with audio:
+            self.audio_handler.append_audio(audio)
+        return segment
+
+    def _append_chapter(
+        self,
+        chapter: "Chapter",
+        announcement: list["Segment"],
+        content: list["Segment"],
+    ) -> int:
+        """Append the audio of a chapter to the final file and add its marker.
+
+        Args:
+            chapter: Chapter the audio belongs to
+            announcement: Segments of the chapter announcement
+            content: Segments of the chapter content
+
+        Returns:
+            int: Number of frames appended
+        """
+        announcement = [
+            self._append_part(chapter, "announcement", index, segment)
+            for index, segment in enumerate(announcement)
+        ]
+        content = [
+            self._append_part(chapter, "content", index, segment)
+            for index, segment in enumerate(content)
+        ]
+        self._add_chapter_marker(chapter, announcement, content)
+        return sum(segment.frames for segment in announcement + content)
+
+    def _add_chapter_marker(
+        self,
+        chapter: "Chapter",
+        announcement: list["Segment"],
+        content: list["Segment"],
+    ) -> None:
+        """Add the marker of a chapter following the previous chapters.
+
+        The duration of the chapter is taken from the frames of its segments,
+        as recorded in the manifest, every segment being synthesized at
+        `SAMPLE_RATE`.
+
+        Args:
+            chapter: Chapter the audio belongs to
+            announcement: Segments of the chapter announcement
+            content: Segments of the chapter content
+        """
+        announcement_duration = sum(s.frames for s in announcement) / SAMPLE_RATE
+        content_duration = sum(s.frames for s in content) / SAMPLE_RATE
         logger.debug(
-            f"Chapter: '{chapter.title}' audio duration: {get_duration(chapter_audio)}"
+            f"Chapter: '{chapter.title}' announcement duration: {announcement_duration}"
         )
+        logger.debug(f"Chapter: '{chapter.title}' audio duration: {content_duration}")
 
-        # Add chapter marker
         start_time = self.current_audibook_time
-        self.current_audibook_time += get_duration(announcement) + get_duration(
-            chapter_audio
-        )
+        self.current_audibook_time += announcement_duration + content_duration
         self.audio_handler.add_chapter_marker(
             chapter.title, start_time, self.current_audibook_time
         )
 
+    def _convert_serially(self) -> None:
+        """Synthesize every chapter, then concatenate them into the final file."""
+        from .epub_processor import get_book_length
+
+        with tqdm(
+            total=get_book_length(self.chapters),
+            desc="Converting chapters",
+            disable=self.quiet,
+            unit="chars",
+        ) as pbar:
+            chapters = []
+            for chapter, announcement, content in self._synthesize_chapters(
+                self._chapters_to_convert(self.chapters)
+            ):
+                chapters.append((chapter, announcement, content))
+                pbar.update(len(chapter.content))
+
+        # Concatenate all audio segments
+        if not self.quiet:
+            logger.info("Finalizing audio file...")
+
+        self.audio_handler.start_audio_file()
+        with tqdm(
+            total=sum(s.frames for _, a, c in chapters for s in a + c),
+            desc="Concatenating audio segments",
+            disable=self.quiet,
+            unit="frames",
+        ) as pbar:
+            for chapter, announcement, content in chapters:
+                pbar.update(self._append_chapter(chapter, announcement, content))
+        self.audio_handler.finish_audio_file()
+
+    def _convert_pipelined(self) -> None:
+        """Parse, synthesize, and encode chapters concurrently.
+
+        Each stage runs in its own thread, connected by bounded queues, so the
+        final file is written while later chapters are still being synthesized.
+        """
+        with tqdm(desc="Converting chapters", disable=self.quiet, unit="chars") as pbar:
+
+            def encode_chapters(
+                chapters: Iterator[tuple["Chapter", list["Segment"], list["Segment"]]],
+            ) -> Iterator["Chapter"]:
+                self.audio_handler.start_audio_file()
+                for chapter, announcement, content in chapters:
+                    self._append_chapter(chapter, announcement, content)
+                    pbar.update(len(chapter.content))
+                    yield chapter
+
+            pipeline = (
+                Pipeline(queue_size=PIPELINE_QUEUE_SIZE)
+                .add_stage("parse", self._parse_chapters)
+                .add_stage("synthesize", self._synthesize_chapters)
+                .add_stage("encode", encode_chapters)
+            )
+            self.stage_stats = pipeline.run(self.epub.iter_chapters())
+
+        if not self.quiet:
+            logger.info("Finalizing audio file...")
+        self.audio_handler.finish_audio_file()
+
+        if not self.quiet:
+            for stats in self.stage_stats:
+                logger.info(f"Pipeline stage {stats}")
+            if pipeline.bottleneck:
+                logger.info(f"Pipeline bottleneck: {pipeline.bottleneck.name}")
+
     def convert(self) -> None:
         """Process an EPUB file and convert it to an audiobook.
 
@@ -202,29 +728,43 @@ class Epub2Audio:
         """
         self.generation_start_time = time.time()
 
+        if self.shard is not None:
+            self._synthesize_shard()
+            return
+        if self.merge:
+            self._check_shards_merged()
+
         # Process chapters
         self.current_audibook_time = 0.0
-        self.audio_segments: list[SoundFile] = []
+        if self.resume:
+            resumed = self.manifest.resume()
+            if resumed and not self.quiet:
+                logger.info(
+                    f"Resuming with {resumed} segments from {self.manifest.path}"
+                )
+        self.manifest.start()
 
-        with tqdm(
-            total=get_book_length(self.chapters),
-            desc="Converting chapters",
-            disable=self.quiet,
-            unit="chars",
-        ) as pbar:
-            for chapter in self.chapters:
-                self._process_epub_chapter(chapter)
-                pbar.update(len(chapter.content))
+        try:
+            if self.pipeline:
+                self._convert_pipelined()
+            else:
+                self._convert_serially()
+        finally:
+            self.converter.close()
 
-        # Concatenate all audio segments
-        if not self.quiet:
-            logger.info("Finalizing audio file...")
-
-        self.audio_handler.finalize_audio_file(self.audio_segments)
+        self.manifest.remove()
 
-        # Clean up cache files
+        # Clean up cache files, or keep the cache within its budget
         if not self.cache:
             self.converter.cache_dir_manager.cleanup()
+        else:
+            evicted = self.converter.segment_store.prune(self.cache_max_size)
+            self.converter.segment_store.close()
+            if evicted.segments:
+                logger.debug(
+                    f"Evicted {evicted.segments} segments to keep the cache "
+                    f"within {format_size(self.cache_max_size)}"
+                )
 
         if self.quiet:
             return
@@ -238,6 +778,10 @@ class Epub2Audio:
         logger.info(f"Total time generating: {display_generation}")
         logger.info(f"Total audio duration: {display_duration}")
         logger.info(f"Total chapters: {self.audio_handler.total_chapters}")
+        if self.cache:
+            logger.info(f"Segment cache: {self.converter.cache_stats}")
+        if self.schedule_stats:
+            logger.info(f"Chapter workers: {self.schedule_stats}")
 
         # Display any warnings
         if self.warnings:
@@ -256,6 +800,18 @@ def process_epub(
     convert: bool = True,
     max_chapters: int = -1,
     format: str = "flac",
+    workers: int = 1,
+    pipeline: bool = False,
+    chunk_workers: int = 1,
+    cache_backend: str = "files",
+    resume: bool = False,
+    shard: Optional[tuple[int, int]] = None,
+    merge: bool = False,
+    backend: str = "kokoro",
+    cache_max_size: Optional[int] = None,
+    quantize: Optional[str] = None,
+    precision: str = "fp32",
+    compiled: bool = False,
 ) -> Epub2Audio:
     """Process an EPUB file and convert it to an audiobook.
 
@@ -269,6 +825,19 @@ def process_epub(
         convert: Whether to convert the epub immediately
         max_chapters: Maximum number of chapters to process, or -1 for no limit.
         format: Format to use for the output file.
+        workers: Number of worker processes synthesizing chapters in parallel.
+        pipeline: Whether to parse, synthesize, and encode chapters concurrently.
+        chunk_workers: Number of worker processes synthesizing the chunks of a
+            single chapter in parallel.
+        cache_backend: How cached segments are stored, "files" or "pack".
+        resume: Whether to resume an interrupted conversion of the same book.
+        shard: Index starting at 1 and count of the shard to synthesize.
+        merge: Whether to assemble the audiobook from synthesized shards.
+        backend: Name of the text-to-speech backend.
+        cache_max_size: Bytes the segment store is pruned to afterwards.
+        quantize: Quantization of the model, or None for full precision.
+        precision: Precision the model runs at.
+        compiled: Whether to run the model traced with TorchScript.
     """
     return Epub2Audio(
         input_epub,
@@ -280,26 +849,471 @@ def process_epub(
         convert=convert,
         max_chapters=max_chapters,
         format=format,
+        workers=workers,
+        pipeline=pipeline,
+        chunk_workers=chunk_workers,
+        cache_backend=cache_backend,
+        resume=resume,
+        shard=shard,
+        merge=merge,
+        backend=backend,
+        cache_max_size=cache_max_size,
+        quantize=quantize,
+        precision=precision,
+        compiled=compiled,
     )
 
 
-@click.command()
+class _DefaultGroup(click.Group):
+    """Group running its default command unless another command is named."""
+
+    def __init__(self, *args: Any, default_command: str, **kwargs: Any):
+        """Initialize the group.
+
+        Args:
+            *args: Arguments of `click.Group`
+            default_command: Name of the command to run by default
+            **kwargs: Keyword arguments of `click.Group`
+        """
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        """Run the default command when the first argument is not a command."""
+        options = [*ctx.help_option_names, "--version"]
+        if not args or (args[0] not in self.commands and args[0] not in options):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=_DefaultGroup, default_command="convert")
+@click.version_option()
+def main() -> None:
+    """Convert EPUB ebooks to audiobooks.
+
+    Without a command, the arguments are passed to `convert`, so
+    `epub2audio book.epub` converts book.epub.
+    """
+
+
+_backend_option = click.option(
+    "--backend",
+    type=click.Choice(TTS_BACKENDS),
+    help="Run Kokoro with PyTorch or ONNX Runtime, or a stub speaking tones.",
+    default="kokoro",
+    show_default=True,
+)
+_quantize_option = click.option(
+    "--quantize",
+    type=click.Choice(QUANTIZATIONS),
+    help="Quantize the Kokoro model, to run it faster on the CPU.",
+    default=None,
+)
+_precision_option = click.option(
+    "--precision",
+    type=click.Choice(PRECISIONS),
+    help="Run the Kokoro model in bf16 on CPUs supporting it.",
+    default="fp32",
+    show_default=True,
+)
+_compile_option = click.option(
+    "--compile",
+    "compiled",
+    is_flag=True,
+    help="Run the Kokoro model traced with TorchScript, cached once traced.",
+)
+
+
+def _parse_size_option(ctx: click.Context, param: click.Parameter, value: str) -> int:
+    """Parse a size option, such as "500M" or "10G"."""
+    try:
+        return parse_size(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from e
+
+
+def _book_options(func: Callable[..., None]) -> Callable[..., None]:
+    """Add the arguments shared by the commands that write an audiobook.
+
+    Args:
+        func: Command function
+
+    Returns:
+        Callable[..., None]: The command function with the arguments added
+    """
+    options = [
+        click.argument(
+            "input_epub",
+            type=click.Path(
+                exists=True,
+                readable=True,
+                file_okay=True,
+                dir_okay=False,
+                path_type=Path,
+            ),
+        ),
+        click.option(
+            "--output",
+            "-o",
+            type=click.Path(exists=False, writable=True, path_type=Path),
+            default=None,
+            help="Output path for the audiobook OGG file, default to book title",
+        ),
+        click.option(
+            "--voice",
+            "-v",
+            type=Voice,
+            default=Voice.AF_HEART,
+            help="Voice to use for text-to-speech.",
+            show_choices=False,
+        ),
+        click.option(
+            "--speech-rate",
+            "-s",
+            type=float,
+            default=DEFAULT_SPEECH_RATE,
+            help="Speech rate multiplier.",
+        ),
+        click.option(
+            "--format",
+            "-f",
+            type=str,
+            default="ogg",
+            help="Format to use for the output file.",
+            show_choices=["ogg", "flac", "mp3"],
+        ),
+        click.option(
+            "--quiet", "-q", is_flag=True, help="Suppress progress reporting."
+        ),
+        click.option("--verbose", "-v", help="Enable verbose mode.", count=True),
+        click.option(
+            "--max-chapters",
+            "-m",
+            type=int,
+            help="Maximum number of chapters to process, or -1 for no limit.",
+            default=-1,
+            show_default=True,
+        ),
+        click.option(
+            "--cache-backend",
+            type=click.Choice(CACHE_BACKENDS),
+            help="Store cached segments as a file each, or in a few pack files.",
+            default="files",
+            show_default=True,
+        ),
+        click.option(
+            "--cache-max-size",
+            default=CACHE_MAX_SIZE,
+            show_default=True,
+            callback=_parse_size_option,
+            help="Size the cache is pruned to afterwards, such as 500M or 10G.",
+        ),
+        _backend_option,
+        _quantize_option,
+        _precision_option,
+        _compile_option,
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+def _configure_logging(quiet: bool, verbose: int) -> None:
+    """Set the logging level of a command.
+
+    Args:
+        quiet: Whether to suppress progress reporting
+        verbose: How verbose to be, 1 for debug and 2 for trace logs
+    """
+    if quiet:
+        logger.remove(DEFAULT_LOGGER_ID)
+    if verbose:
+        logger.remove(DEFAULT_LOGGER_ID)
+        if verbose >= 2:
+            logger.add(sys.stderr, level="TRACE")
+            logger.debug("Logging level: TRACE")
+        elif verbose >= 1:
+            logger.add(sys.stderr, level="DEBUG")
+            logger.debug("Logging level: DEBUG")
+
+
+def _run_conversion(*args: Any, **kwargs: Any) -> None:
+    """Run `process_epub`, exiting with the error code of any failure.
+
+    Args:
+        *args: Arguments of `process_epub`
+        **kwargs: Keyword arguments of `process_epub`
+    """
+    try:
+        process_epub(*args, **kwargs)
+    except ConversionError as e:
+        logger.exception(e)
+        logger.error(f"Conversion error: {e.message}", err=True)
+        exit(e.error_code)
+    except AudioHandlerError as e:
+        logger.exception(e)
+        logger.error(f"Audio handler error: {e.message}", err=True)
+        exit(e.error_code)
+    except Exception as e:
+        logger.exception(e)
+        logger.error(f"Unexpected error: {str(e)}", err=True)
+        exit(ErrorCodes.UNKNOWN_ERROR)
+
+
+def _parse_shard_option(
+    ctx: click.Context, param: click.Parameter, value: Optional[str]
+) -> Optional[tuple[int, int]]:
+    """Parse a shard option, such as "2/3" for the second of three shards."""
+    if value is None:
+        return None
+    match = re.fullmatch(r"(\d+)/(\d+)", value.strip())
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise click.BadParameter(f"Expected a shard such as 1/3, got {value!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+@main.command(name="convert")
+@_book_options
+@click.option("--cache", "-c", is_flag=True, help="Enable caching of audio segments.")
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    help="Number of worker processes synthesizing chapters in parallel.",
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--pipeline",
+    "-p",
+    is_flag=True,
+    help="Parse, synthesize, and encode chapters concurrently.",
+)
+@click.option(
+    "--chunk-workers",
+    type=click.IntRange(min=1),
+    help="Number of worker processes synthesizing the chunks of a chapter.",
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Resume an interrupted conversion, reusing the audio it synthesized.",
+)
+@click.option(
+    "--shard",
+    metavar="I/N",
+    callback=_parse_shard_option,
+    help="Only synthesize shard I of N of the chapters into the cache, for "
+    "`merge` to assemble. Implies --cache.",
+)
+def convert_epub(
+    input_epub: Path,
+    output: Path,
+    voice: Union[str, Voice],
+    speech_rate: float,
+    quiet: bool,
+    cache: bool,
+    verbose: int,
+    convert: bool = True,
+    max_chapters: int = -1,
+    format: str = "flac",
+    workers: int = 1,
+    pipeline: bool = False,
+    chunk_workers: int = 1,
+    cache_backend: str = "files",
+    cache_max_size: Optional[int] = None,
+    resume: bool = False,
+    shard: Optional[tuple[int, int]] = None,
+    backend: str = "kokoro",
+    quantize: Optional[str] = None,
+    precision: str = "fp32",
+    compiled: bool = False,
+) -> None:
+    """Convert an EPUB ebook to an audiobook.
+
+    INPUT_EPUB is the path to the EPUB file to convert.
+    """
+    _configure_logging(quiet, verbose)
+    if verbose:
+        logger.trace(f"Input EPUB: {input_epub}")
+        logger.trace(f"Output path: {output}")
+        logger.trace(f"Voice: {voice}")
+        logger.trace(f"Speech rate: {speech_rate}")
+        logger.trace(f"Quiet: {quiet}")
+        logger.trace(f"Cache: {cache}")
+        logger.trace(f"Convert: {convert}")
+        logger.trace(f"Format: {format}")
+        logger.trace(f"Max chapters: {max_chapters}")
+        logger.trace(f"Workers: {workers}")
+        logger.trace(f"Pipeline: {pipeline}")
+        logger.trace(f"Chunk workers: {chunk_workers}")
+        logger.trace(f"Cache backend: {cache_backend}")
+        logger.trace(f"Cache max size: {cache_max_size}")
+        logger.trace(f"Resume: {resume}")
+        logger.trace(f"Shard: {shard}")
+        logger.trace(f"Backend: {backend}")
+        logger.trace(f"Quantize: {quantize}")
+        logger.trace(f"Precision: {precision}")
+        logger.trace(f"Compiled: {compiled}")
+    _run_conversion(
+        input_epub,
+        output,
+        speech_rate,
+        voice,
+        quiet,
+        cache,
+        convert,
+        max_chapters,
+        format,
+        workers,
+        pipeline,
+        chunk_workers,
+        cache_backend,
+        resume,
+        shard,
+        backend=backend,
+        cache_max_size=cache_max_size,
+        quantize=quantize,
+        precision=precision,
+        compiled=compiled,
+    )
+
+
+@main.command()
+@_book_options
+def merge(
+    input_epub: Path,
+    output: Path,
+    voice: Union[str, Voice],
+    speech_rate: float,
+    format: str,
+    quiet: bool,
+    verbose: int,
+    max_chapters: int,
+    cache_backend: str,
+    cache_max_size: int,
+    backend: str,
+    quantize: Optional[str],
+    precision: str,
+    compiled: bool,
+) -> None:
+    """Assemble an audiobook from the shards synthesized with `convert --shard`.
+
+    INPUT_EPUB is the path to the EPUB file the shards were synthesized from.
+    Every shard must have finished, with the same options as given here.
+    """
+    _configure_logging(quiet, verbose)
+    _run_conversion(
+        input_epub,
+        output,
+        speech_rate,
+        voice,
+        quiet=quiet,
+        max_chapters=max_chapters,
+        format=format,
+        cache_backend=cache_backend,
+        merge=True,
+        backend=backend,
+        cache_max_size=cache_max_size,
+        quantize=quantize,
+        precision=precision,
+        compiled=compiled,
+    )
+
+
+@main.command()
+@click.option(
+    "--host",
+    default=DEFAULT_SERVER_HOST,
+    show_default=True,
+    help="Address to listen on.",
+)
+@click.option(
+    "--port",
+    type=click.IntRange(min=0, max=65535),
+    default=DEFAULT_SERVER_PORT,
+    show_default=True,
+    help="Port to listen on.",
+)
+@click.option(
+    "--voice",
+    "voices",
+    type=Voice,
+    multiple=True,
+    default=[Voice.AF_HEART],
+    show_default=True,
+    help="Voice to load before accepting jobs, may be repeated.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of jobs to run at once, sharing the model.",
+)
+@_backend_option
+@_quantize_option
+@_precision_option
+@_compile_option
+@click.option("--verbose", "-v", help="Enable verbose mode.", count=True)
+def serve(
+    host: str,
+    port: int,
+    voices: tuple[Voice, ...],
+    jobs: int,
+    backend: str,
+    quantize: Optional[str],
+    precision: str,
+    compiled: bool,
+    verbose: int,
+) -> None:
+    """Convert books submitted over HTTP, keeping the models loaded.
+
+    Jobs are posted as JSON to /jobs, with the path of the EPUB file and any
+    of the options output, voice, speech_rate, format, max_chapters,
+    cache_backend and pipeline. Their status is at /jobs/<id>.
+    """
+    from .server import JobScheduler, JobServer
+
+    _configure_logging(False, verbose)
+    scheduler = JobScheduler(
+        voices,
+        jobs=jobs,
+        backend=backend,
+        quantize=quantize,
+        precision=precision,
+        compiled=compiled,
+    )
+    with JobServer((host, port), scheduler) as server:
+        logger.info(f"Serving on http://{host}:{server.server_port}/jobs")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("Finishing queued jobs")
+        finally:
+            scheduler.close()
+
+
+@main.command()
 @click.argument(
-    "input_epub",
-    type=click.Path(
-        exists=True, readable=True, file_okay=True, dir_okay=False, path_type=Path
-    ),
+    "paths",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, readable=True, path_type=Path),
 )
 @click.option(
     "--output",
     "-o",
-    type=click.Path(exists=False, writable=True, path_type=Path),
-    default=None,
-    help="Output path for the audiobook OGG file, default to book title",
+    type=click.Path(file_okay=False, writable=True, path_type=Path),
+    default=Path("."),
+    show_default=True,
+    help="Directory to write the audiobooks to, named after their EPUB files.",
 )
 @click.option(
     "--voice",
-    "-v",
     type=Voice,
     default=Voice.AF_HEART,
     help="Voice to use for text-to-speech.",
@@ -317,12 +1331,8 @@ def process_epub(
     "-f",
     type=str,
     default="ogg",
-    help="Format to use for the output file.",
-    show_choices=["ogg", "flac", "mp3"],
+    help="Format to use for the output files.",
 )
-@click.option("--quiet", "-q", is_flag=True, help="Suppress progress reporting.")
-@click.option("--cache", "-c", is_flag=True, help="Enable caching of audio segments.")
-@click.option("--verbose", "-v", help="Enable verbose mode.", count=True)
 @click.option(
     "--max-chapters",
     "-m",
@@ -331,67 +1341,169 @@ def process_epub(
     default=-1,
     show_default=True,
 )
-@click.version_option()
-def main(
-    input_epub: Path,
+@click.option(
+    "--cache-backend",
+    type=click.Choice(CACHE_BACKENDS),
+    help="Store cached segments as a file each, or in a few pack files.",
+    default="files",
+    show_default=True,
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of books to convert at once, sharing the model.",
+)
+@click.option(
+    "--force", is_flag=True, help="Convert books whose audiobook is up to date."
+)
+@_backend_option
+@_quantize_option
+@_precision_option
+@_compile_option
+@click.option("--quiet", "-q", is_flag=True, help="Suppress progress reporting.")
+@click.option("--verbose", "-v", help="Enable verbose mode.", count=True)
+def library(
+    paths: tuple[Path, ...],
     output: Path,
-    voice: Union[str, Voice],
+    voice: Voice,
     speech_rate: float,
+    format: str,
+    max_chapters: int,
+    cache_backend: str,
+    jobs: int,
+    force: bool,
+    backend: str,
+    quantize: Optional[str],
+    precision: str,
+    compiled: bool,
     quiet: bool,
-    cache: bool,
     verbose: int,
-    convert: bool = True,
-    max_chapters: int = -1,
-    format: str = "flac",
 ) -> None:
-    """Convert an EPUB ebook to an audiobook.
+    """Convert every book of a library, loading the model once.
 
-    INPUT_EPUB is the path to the EPUB file to convert.
+    PATHS are EPUB files, and directories searched for them. Books already
+    converted into the output directory with the same options are skipped.
     """
-    if quiet:
-        logger.remove(DEFAULT_LOGGER_ID)
-    if verbose:
-        logger.remove(DEFAULT_LOGGER_ID)
-        if verbose >= 2:
-            logger.add(sys.stderr, level="TRACE")
-            logger.debug("Logging level: TRACE")
-        elif verbose >= 1:
-            logger.add(sys.stderr, level="DEBUG")
-            logger.debug("Logging level: DEBUG")
-        logger.trace(f"Input EPUB: {input_epub}")
-        logger.trace(f"Output path: {output}")
-        logger.trace(f"Voice: {voice}")
-        logger.trace(f"Speech rate: {speech_rate}")
-        logger.trace(f"Quiet: {quiet}")
-        logger.trace(f"Cache: {cache}")
-        logger.trace(f"Convert: {convert}")
-        logger.trace(f"Format: {format}")
-        logger.trace(f"Max chapters: {max_chapters}")
-    try:
-        process_epub(
-            input_epub,
-            output,
-            speech_rate,
-            voice,
-            quiet,
-            cache,
-            convert,
-            max_chapters,
-            format,
-        )
-    except ConversionError as e:
-        logger.exception(e)
-        logger.error(f"Conversion error: {e.message}", err=True)
-        exit(e.error_code)
-    except AudioHandlerError as e:
-        logger.exception(e)
-        logger.error(f"Audio handler error: {e.message}", err=True)
-        exit(e.error_code)
-    except Exception as e:
-        logger.exception(e)
-        logger.error(f"Unexpected error: {str(e)}", err=True)
+    from .library import convert_library
+
+    _configure_logging(quiet, verbose)
+    books = convert_library(
+        paths,
+        output,
+        voice=voice,
+        speech_rate=speech_rate,
+        format=format,
+        max_chapters=max_chapters,
+        cache_backend=cache_backend,
+        jobs=jobs,
+        force=force,
+        backend=backend,
+        quantize=quantize,
+        precision=precision,
+        compiled=compiled,
+    )
+    for book in books:
+        if book["status"] == "failed":
+            click.echo(f"failed: {book['epub']}: {book['error']}")
+        else:
+            click.echo(f"{book['status']}: {book['epub']} -> {book['output']}")
+    if any(book["status"] == "failed" for book in books):
         exit(ErrorCodes.UNKNOWN_ERROR)
 
 
+@main.command(name="export-onnx")
+@click.argument(
+    "path",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default=KOKORO_PATHS["onnx_model"],
+)
+def export_onnx_model(path: Path) -> None:
+    """Export the Kokoro model to ONNX, for `--backend onnx`.
+
+    PATH is where to write the model, by default where the onnx backend looks
+    for it, which KOKORO_ONNX_MODEL_PATH sets.
+    """
+    from .backends import export_onnx
+
+    export_onnx(path)
+    click.echo(f"Exported the model to {path}")
+
+
+@main.group(name="cache")
+def cache_group() -> None:
+    """Inspect and maintain the cache of synthesized audio."""
+
+
+@cache_group.command()
+def stats() -> None:
+    """Show how much audio each cache backend holds."""
+    from .cache import open_segment_store
+
+    for backend in CACHE_BACKENDS:
+        store = open_segment_store(backend)
+        if not store.root.exists():
+            click.echo(f"{backend}: empty")
+            continue
+        usage = store.usage()
+        store.close()
+        click.echo(
+            f"{backend}: {usage.segments} segments, {format_size(usage.size)} "
+            f"({format_size(usage.disk_size)} on disk) in {store.root}"
+        )
+    if PHONEME_CACHE_PATH.exists():
+        size = format_size(PHONEME_CACHE_PATH.stat().st_size)
+        click.echo(f"phonemes: {size} in {PHONEME_CACHE_PATH}")
+    click.echo(f"Budget per backend: {CACHE_MAX_SIZE}")
+
+
+@cache_group.command()
+@click.option(
+    "--max-size",
+    "-s",
+    default=CACHE_MAX_SIZE,
+    show_default=True,
+    callback=_parse_size_option,
+    help="Size each backend may take up, such as 500M or 10G.",
+)
+def prune(max_size: int) -> None:
+    """Evict the least recently used audio until the cache fits its budget."""
+    from .cache import open_segment_store
+
+    for backend in CACHE_BACKENDS:
+        store = open_segment_store(backend)
+        if not store.root.exists():
+            continue
+        evicted = store.prune(max_size)
+        store.close()
+        click.echo(
+            f"{backend}: evicted {evicted.segments} segments, "
+            f"{format_size(evicted.size)}"
+        )
+
+
+@cache_group.command()
+@click.option("--fix", is_flag=True, help="Remove the segments that cannot be read.")
+def verify(fix: bool) -> None:
+    """Check every cached segment can be read."""
+    from .cache import open_segment_store
+
+    failed = False
+    for backend in CACHE_BACKENDS:
+        store = open_segment_store(backend)
+        if not store.root.exists():
+            continue
+        bad = store.verify(fix=fix)
+        store.close()
+        for name in bad:
+            click.echo(f"{backend}: {'removed' if fix else 'bad'} {name}")
+        click.echo(f"{backend}: {len(bad)} bad segments")
+        failed = failed or bool(bad)
+    if failed and not fix:
+        sys.exit(ErrorCodes.FILESYSTEM_ERROR)
+
+
 if __name__ == "__main__":
     main()
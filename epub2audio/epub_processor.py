@@ -2,6 +2,7 @@
 
 import base64
 import re
+from collections.abc import Generator, Iterable
 from dataclasses import dataclass
 from typing import Optional
 
@@ -10,9 +11,36 @@ from bs4 import BeautifulSoup
 from ebooklib import epub
 from loguru import logger
 
-from .config import METADATA_FIELDS, ErrorCodes, WarningTypes
+from .config import MAX_CHUNK_CHARS, METADATA_FIELDS, ErrorCodes, WarningTypes
 from .helpers import ConversionError, ConversionWarning, StrPath
 
+# Elements whose text forms its own paragraph
+BLOCK_ELEMENTS = [
+    "p",
+    "div",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "li",
+    "blockquote",
+    "pre",
+    "tr",
+    "dt",
+    "dd",
+    "figcaption",
+    "section",
+    "article",
+]
+
+# Marks paragraph boundaries while the rest of the whitespace is normalized
+PARAGRAPH_BREAK = "\u2029"
+
+# End of a sentence, including any closing quotes or brackets
+SENTENCE_END_REGEX = re.compile(r"([.!?\u2026]+[\"'\u201d\u2019)\]]*)\s+")
+
 
 @dataclass
 class Chapter:
@@ -53,6 +81,19 @@ class Chapter:
             return False
         return self.order <= other.order
 
+    def iter_chunks(
+        self, max_chars: int = MAX_CHUNK_CHARS
+    ) -> Generator[str, None, None]:
+        """Split the chapter content into chunks small enough to synthesize.
+
+        Args:
+            max_chars: Maximum number of characters in a chunk
+
+        Yields:
+            str: Chunks of the chapter content, in order
+        """
+        yield from split_text_chunks(self.content, max_chars)
+
 
 @dataclass
 class BookMetadata:
@@ -112,6 +153,83 @@ class Book:
         )
 
 
+def _split_sentences(paragraph: str) -> Generator[str, None, None]:
+    """Split a paragraph into sentences.
+
+    Args:
+        paragraph: Paragraph to split
+
+    Yields:
+        str: Sentences of the paragraph, with their punctuation
+    """
+    parts = SENTENCE_END_REGEX.split(paragraph)
+    # Parts alternate between sentence text and the punctuation ending it
+    for i in range(0, len(parts) - 1, 2):
+        yield parts[i] + parts[i + 1]
+    if parts[-1]:
+        yield parts[-1]
+
+
+def _split_words(sentence: str, max_chars: int) -> Generator[str, None, None]:
+    """Split an overly long sentence on word boundaries.
+
+    Args:
+        sentence: Sentence to split
+        max_chars: Maximum number of characters in a chunk
+
+    Yields:
+        str: Chunks of the sentence
+    """
+    chunk = ""
+    for word in sentence.split():
+        if chunk and len(chunk) + 1 + len(word) > max_chars:
+            yield chunk
+            chunk = word
+        else:
+            chunk = f"{chunk} {word}" if chunk else word
+    if chunk:
+        yield chunk
+
+
+def split_text_chunks(
+    text: str, max_chars: int = MAX_CHUNK_CHARS
+) -> Generator[str, None, None]:
+    """Split text into chunks that fit in a single pass of the TTS model.
+
+    Every paragraph starts a new chunk. Paragraphs that are too long are split
+    between sentences, and sentences that are still too long between words.
+
+    Args:
+        text: Text to split, with one paragraph per line
+        max_chars: Maximum number of characters in a chunk
+
+    Yields:
+        str: Chunks of the text, in order
+    """
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+
+        chunk = ""
+        for sentence in _split_sentences(paragraph):
+            if len(sentence) > max_chars:
+                if chunk:
+                    yield chunk
+                    chunk = ""
+                yield from _split_words(sentence, max_chars)
+            elif chunk and len(chunk) + 1 + len(sentence) > max_chars:
+                yield chunk
+                chunk = sentence
+            else:
+                chunk = f"{chunk} {sentence}" if chunk else sentence
+        if chunk:
+            yield chunk
+
+
 def get_book_length(chapters: list[Chapter]) -> int:
     """Get the length of an EPUB book.
 
@@ -124,11 +242,13 @@ def get_book_length(chapters: list[Chapter]) -> int:
 class EpubProcessor:
     """Class for processing EPUB files and extracting content."""
 
-    def __init__(self, epub_path: StrPath):
+    def __init__(self, epub_path: StrPath, lazy: bool = False):
         """Initialize the EPUB processor.
 
         Args:
             epub_path: Path to the EPUB file
+            lazy: Only extract the metadata up front, leaving the chapters to be
+                streamed with `iter_chapters`
 
         Raises:
             ConversionError: If the EPUB file is invalid or cannot be read
@@ -144,6 +264,12 @@ class EpubProcessor:
 
         self._chapters_in_one_page = False
         self.metadata = self._extract_metadata()
+        self.chapters: list[Chapter] = []
+        if lazy:
+            self.book = Book(metadata=self.metadata, chapters=self.chapters)
+            logger.debug(f"Metadata: {self.metadata}")
+            return
+
         self.chapters = self._extract_chapters()
         if len(self.chapters) == 0:
             raise ConversionError(
@@ -213,7 +339,7 @@ class EpubProcessor:
             html_content: Raw HTML content
 
         Returns:
-            str: Cleaned text content
+            str: Cleaned text content, with one paragraph per line
         """
         soup = BeautifulSoup(html_content, "html.parser")
 
@@ -232,12 +358,20 @@ class EpubProcessor:
             )
             element.decompose()
 
+        # Mark paragraph boundaries, which the TTS model uses to split its work
+        for element in soup.find_all(BLOCK_ELEMENTS):
+            element.insert_before(PARAGRAPH_BREAK)
+            element.insert_after(PARAGRAPH_BREAK)
+        for element in soup.find_all("br"):
+            element.replace_with(PARAGRAPH_BREAK)
+
         # Get text and clean it
         text = soup.get_text()
 
-        # Normalize whitespace
-        text = re.sub(r"\s+", " ", text)
-        text = text.strip()
+        # Normalize whitespace within paragraphs
+        text = re.sub(rf"[^\S{PARAGRAPH_BREAK}]+", " ", text)
+        paragraphs = (paragraph.strip() for paragraph in text.split(PARAGRAPH_BREAK))
+        text = "\n".join(paragraph for paragraph in paragraphs if paragraph)
 
         return text
 
@@ -362,7 +496,7 @@ class EpubProcessor:
                 current = current.find_next_sibling()
 
             # Join the content paragraphs
-            chapter_content = " ".join(content)
+            chapter_content = "\n".join(content)
             order += 1
 
             # Create the chapter
@@ -412,7 +546,7 @@ class EpubProcessor:
                     current = current.find_next_sibling()
 
                 # Join the content paragraphs
-                chapter_content = " ".join(content)
+                chapter_content = "\n".join(content)
                 order += 1
 
                 # Create the chapter
@@ -444,7 +578,20 @@ class EpubProcessor:
         Args:
             table_of_contents: The table of contents of the book
         """
-        chapters: list[Chapter] = []
+        return list(self._iter_chapters_from_pages(table_of_contents))
+
+    def _iter_chapters_from_pages(
+        self,
+        table_of_contents: list[epub.EpubItem],
+    ) -> Generator[Chapter, None, None]:
+        """Get the chapters from the pages of the EPUB file, one page at a time.
+
+        Args:
+            table_of_contents: The table of contents of the book
+
+        Yields:
+            Chapter: Chapters in reading order
+        """
         order = 0
 
         for item in table_of_contents:
@@ -473,12 +620,9 @@ class EpubProcessor:
                 logger.trace(f"Skipping empty chapter: {title}")
                 continue
 
-            chapter = Chapter(title=title, content=content, order=order, id=item.id)
-            chapters.append(chapter)
+            yield Chapter(title=title, content=content, order=order, id=item.id)
             order += 1
 
-        return chapters
-
     def _find_content_item_for_single_page(
         self, table_of_contents: list[epub.EpubItem | epub.Link]
     ) -> tuple[epub.EpubItem | None, list[epub.Link]]:
@@ -530,7 +674,21 @@ class EpubProcessor:
         Returns:
             List[Chapter]: List of extracted chapters
         """
-        chapters = []
+        return sorted(self.iter_chapters())
+
+    def iter_chapters(self) -> Generator[Chapter, None, None]:
+        """Extract chapters from the EPUB file one at a time.
+
+        Pages are cleaned as the chapters are consumed, so the first chapters
+        are available long before the whole book has been parsed.
+
+        Yields:
+            Chapter: Extracted chapters, in reading order
+
+        Raises:
+            ConversionError: If no valid chapters are found
+        """
+        chapters: Iterable[Chapter] = []
 
         # Get the table of contents
         table_of_contents = self.epub.toc
@@ -558,20 +716,23 @@ class EpubProcessor:
         else:
             # For multi-page EPUBs
             unique_items = self._get_unique_chapter_items(table_of_contents)
-            chapters = self._get_chapters_from_pages(unique_items)
-
-        if not chapters:
+            chapters = self._iter_chapters_from_pages(unique_items)
+
+        found_chapters = False
+        for chapter in chapters:
+            # Add title chapter as the first chapter for both formats
+            if not found_chapters and self.metadata.title:
+                title_chapter = self._get_title_chapter()
+                logger.trace(f"Book title added: {title_chapter}")
+                yield title_chapter
+            found_chapters = True
+            yield chapter
+
+        if not found_chapters:
             raise ConversionError(
                 "No valid chapters found in EPUB file", ErrorCodes.INVALID_EPUB
             )
 
-        # Add title chapter as the first chapter for both formats
-        if self.metadata.title:
-            chapters.insert(0, self._get_title_chapter())
-            logger.trace(f"Book title added: {chapters[0]}")
-
-        return sorted(chapters)
-
     def _is_cover(self, item: epub.EpubItem) -> bool:
         """Determine if an EPUB item is a cover.
 
@@ -679,4 +840,4 @@ class EpubProcessor:
             content_split.pop(0)
         content_split.append(rest_of_content)
         content = " ".join(content_split)
-        return content
+        return content.strip()
@@ -3,16 +3,20 @@
 import os
 import re
 import shutil
+import sqlite3
+from contextlib import closing
 from dataclasses import dataclass
 from hashlib import sha256
 from pathlib import Path
-from typing import Any, ClassVar, Optional, Union
+from typing import TYPE_CHECKING, Any, ClassVar, Optional, Union
 
 from loguru import logger
-from soundfile import SoundFile  # type: ignore
 from tqdm import tqdm  # type: ignore
 
-from .config import CACHE_DIR, ErrorCodes
+from .config import CACHE_DIR, HASH_BLOCK_BYTES, HASH_INDEX_PATH, ErrorCodes
+
+if TYPE_CHECKING:
+    from soundfile import SoundFile  # type: ignore
 
 StrPath = Union[str, Path]
 
@@ -74,6 +78,82 @@ class AudioHandlerError(Epub2AudioError):
         super().__init__(self.message, self.error_code)
 
 
+# Digests of the files hashed by this process, see `file_sha256`
+_file_hashes: dict[tuple[str, int, int, int], str] = {}
+
+
+def _hash_index(key: tuple[str, int, int, int], digest: str = "") -> Optional[str]:
+    """Look a file digest up in the persistent index, or add one to it.
+
+    Args:
+        key: Path, size, modification time and inode of the file
+        digest: Digest to add, or an empty string to look the file up
+
+    Returns:
+        Optional[str]: The digest of the file, or None if it is not indexed
+    """
+    try:
+        HASH_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(HASH_INDEX_PATH, timeout=30)) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS hashes ("
+                "path TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, "
+                "inode INTEGER NOT NULL, "
+                "sha256 TEXT NOT NULL, "
+                "PRIMARY KEY (path, size, mtime_ns, inode))"
+            )
+            if digest:
+                # Forget digests of earlier versions of the file
+                connection.execute("DELETE FROM hashes WHERE path = ?", key[:1])
+                connection.execute(
+                    "INSERT INTO hashes VALUES (?, ?, ?, ?, ?)", (*key, digest)
+                )
+                connection.commit()
+                return digest
+            row = connection.execute(
+                "SELECT sha256 FROM hashes WHERE path = ? AND size = ? "
+                "AND mtime_ns = ? AND inode = ?",
+                key,
+            ).fetchone()
+            return None if row is None else str(row[0])
+    except sqlite3.Error as e:
+        logger.debug(f"File hash index {HASH_INDEX_PATH} unavailable: {e}")
+        return None
+
+
+def file_sha256(path: StrPath) -> str:
+    """Get the SHA-256 digest of a file.
+
+    The file is hashed in blocks, so it is never held in memory at once, and
+    the digest is remembered by path, size, modification time and inode, both
+    in this process and in an index in the cache directory. A file is only
+    hashed again once it changes.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        str: Hex digest of the file
+    """
+    status = os.stat(path)
+    key = (str(Path(path).resolve()), status.st_size, status.st_mtime_ns, status.st_ino)
+    if key in _file_hashes:
+        return _file_hashes[key]
+
+    digest = _hash_index(key)
+    if digest is None:
+        file_hash = sha256()
+        with open(path, "rb") as f:
+            while block := f.read(HASH_BLOCK_BYTES):
+                file_hash.update(block)
+        digest = file_hash.hexdigest()
+        _hash_index(key, digest)
+    _file_hashes[key] = digest
+    return digest
+
+
 class CacheDirManager:
     """Manager for cache directories based on EPUB file hashes."""
 
@@ -89,9 +169,7 @@ class CacheDirManager:
             extension: File extension to use for cached files
             voice: Name of the voice to use for cached files
         """
-        with open(epub_path, "rb") as f:
-            f_bytes = f.read()
-            self.epub_hash = sha256(f_bytes).hexdigest()
+        self.epub_hash = file_sha256(epub_path)
         self.epub_path = epub_path
         self._ensure_cache_dir()
         self.extension = extension
@@ -131,9 +209,7 @@ class CacheDirManager:
         """Clean up the temporary directory."""
         if self.epub_hash in self._cache_dirs:
             try:
-                for file in self._cache_dirs[self.epub_hash].iterdir():
-                    file.unlink()
-                self._cache_dirs[self.epub_hash].rmdir()
+                shutil.rmtree(self._cache_dirs[self.epub_hash])
                 del self._cache_dirs[self.epub_hash]
             except Exception as e:
                 logger.warning(
@@ -145,12 +221,35 @@ class CacheDirManager:
         """Clean up all temporary directories."""
         for cache_dir in list(cls._cache_dirs.values()):
             try:
-                cache_dir.rmdir()
+                shutil.rmtree(cache_dir)
             except Exception as e:
                 logger.warning(f"Failed to clean up cache directory: {e}")
         cls._cache_dirs.clear()
 
 
+def parse_size(size: str) -> int:
+    """Parse a size in bytes, optionally with a binary unit suffix.
+
+    Args:
+        size: Size such as "1024", "500M" or "10G"
+
+    Returns:
+        int: Size in bytes
+
+    Raises:
+        ValueError: If the size cannot be parsed
+    """
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    size = size.strip().upper().removesuffix("B").removesuffix("I")
+    multiplier = units.get(size[-1:], 1)
+    if size[-1:] in units:
+        size = size[:-1]
+    try:
+        return int(float(size) * multiplier)
+    except ValueError as e:
+        raise ValueError(f"Invalid size '{size}'") from e
+
+
 def check_disk_space(path: StrPath, required_bytes: int) -> bool:
     """Check if there's enough disk space available.
 
@@ -250,7 +349,23 @@ def format_time(seconds: float) -> str:
     return f"{hours:02d}:{minutes:02d}:{seconds_part:06.3f}"
 
 
-def get_duration(audio: SoundFile) -> float:
+def format_size(size: float) -> str:
+    """Format a size in bytes to a human-readable string.
+
+    Args:
+        size: Size in bytes
+
+    Returns:
+        str: Size with a binary unit, such as "1.5 GiB"
+    """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def get_duration(audio: "SoundFile") -> float:
     """Get the duration of an audio file.
 
     Args:
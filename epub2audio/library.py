@@ -0,0 +1,271 @@
+"""Conversion of a library of books, sharing the models between them."""
+
+import json
+import os
+import threading
+import zipfile
+from collections import defaultdict
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from loguru import logger
+
+from .config import BOOK_DOCUMENT_EXTENSIONS, LIBRARY_INDEX_NAME
+from .helpers import StrPath, clean_filename, ensure_dir_exists, file_sha256
+from .scheduler import longest_first, lpt_schedule
+from .server import JobScheduler
+from .voices import Voice
+
+
+def find_books(paths: Iterable[StrPath]) -> list[Path]:
+    """List the EPUB files given, searching directories recursively.
+
+    Args:
+        paths: EPUB files and directories holding them
+
+    Returns:
+        list[Path]: Every EPUB file found, once, in the order given
+    """
+    books: dict[Path, None] = {}
+    for path in map(Path, paths):
+        found = sorted(path.rglob("*.epub")) if path.is_dir() else [path]
+        for book in found:
+            if book.is_file():
+                books.setdefault(book.resolve())
+    return list(books)
+
+
+def book_cost(path: StrPath) -> int:
+    """Estimate how long a book takes to convert, from the size of its text.
+
+    EPUB files are zip archives, so the uncompressed size of their documents
+    tells the length of their text apart from their images and fonts.
+
+    Args:
+        path: Path to the EPUB file
+
+    Returns:
+        int: Size of the documents of the book, or of the file if it cannot be
+            read as an archive
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            return sum(
+                info.file_size
+                for info in archive.infolist()
+                if info.filename.lower().endswith(BOOK_DOCUMENT_EXTENSIONS)
+            )
+    except (zipfile.BadZipFile, OSError):
+        return Path(path).stat().st_size
+
+
+def audiobook_names(books: list[Path]) -> dict[Path, str]:
+    """Name the audiobook of every book after its EPUB file, uniquely.
+
+    Titles are often missing or shared by several editions, so books are
+    named by the stem of their file instead. Books sharing a stem are named by
+    their path from the directory holding all of them.
+
+    Args:
+        books: EPUB files of the library
+
+    Returns:
+        dict[Path, str]: Name of the audiobook of every book, without extension
+    """
+    twins: dict[str, list[Path]] = defaultdict(list)
+    for book in books:
+        twins[book.stem].append(book.parent)
+    names: dict[Path, str] = {}
+    taken: set[str] = set()
+    for book in books:
+        name = book.stem
+        if len(twins[book.stem]) > 1:
+            root = os.path.commonpath(twins[book.stem])
+            name = "-".join(book.relative_to(root).with_suffix("").parts)
+        name = unique = clean_filename(name)
+        # Cleaning may join names, and file systems may ignore their case
+        count = 1
+        while unique.lower() in taken:
+            count += 1
+            unique = f"{name}-{count}"
+        taken.add(unique.lower())
+        names[book] = unique
+    return names
+
+
+class LibraryIndex:
+    """Record of the books converted into an output directory.
+
+    Every book is recorded by the digest of its EPUB file, with the options it
+    was converted with and the path and digest of its audiobook, so a book is
+    only converted again if it, the options, or its audiobook changed.
+    """
+
+    def __init__(self, directory: StrPath):
+        """Load the index of a directory.
+
+        Args:
+            directory: Output directory of the audiobooks
+        """
+        self.path = Path(directory) / LIBRARY_INDEX_NAME
+        self.entries: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Library index {self.path} unreadable, ignoring: {e}")
+
+    def converted(self, epub_sha256: str, options: dict[str, Any]) -> Optional[Path]:
+        """Find the audiobook of a book converted with the same options.
+
+        Args:
+            epub_sha256: Digest of the EPUB file
+            options: Options the book is converted with
+
+        Returns:
+            Optional[Path]: The audiobook, or None if it has to be converted
+        """
+        entry = self.entries.get(epub_sha256)
+        if entry is None or entry["options"] != options:
+            return None
+        output = Path(entry["output"])
+        if not output.is_file() or file_sha256(output) != entry["output_sha256"]:
+            return None
+        return output
+
+    def record(
+        self, epub_sha256: str, options: dict[str, Any], output: StrPath
+    ) -> None:
+        """Record a converted book, writing the index.
+
+        Args:
+            epub_sha256: Digest of the EPUB file
+            options: Options the book was converted with
+            output: Path to the audiobook
+        """
+        with self._lock:
+            self.entries[epub_sha256] = {
+                "options": options,
+                "output": str(output),
+                "output_sha256": file_sha256(output),
+            }
+            scratch = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(scratch, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(scratch, self.path)
+
+
+def convert_library(
+    paths: Iterable[StrPath],
+    output_dir: StrPath,
+    voice: Union[str, Voice] = Voice.AF_HEART,
+    speech_rate: float = 1.0,
+    format: str = "ogg",
+    max_chapters: int = -1,
+    cache_backend: str = "files",
+    jobs: int = 1,
+    force: bool = False,
+    backend: str = "kokoro",
+    quantize: Optional[str] = None,
+    precision: str = "fp32",
+    compiled: bool = False,
+) -> list[dict[str, Any]]:
+    """Convert every book of a library in this process, loading the model once.
+
+    Books are converted by a `JobScheduler`, `jobs` at a time, sharing its
+    models and voices. They start longest first, so that the short books fill
+    in around the long ones at the end.
+
+    Args:
+        paths: EPUB files and directories holding them
+        output_dir: Directory to write the audiobooks to, named by
+            `audiobook_names`
+        voice: Voice to speak every book with
+        speech_rate: Speech rate multiplier
+        format: Format of the audiobooks
+        max_chapters: Maximum number of chapters of a book, or -1 for no limit
+        cache_backend: How cached segments are stored, "files" or "pack"
+        jobs: Number of books to convert at once
+        force: Whether to convert books whose audiobook is up to date
+        backend: Name of the text-to-speech backend, one of `TTS_BACKENDS`
+        quantize: Quantization of the model, or None for full precision
+        precision: Precision the model runs at, one of `PRECISIONS`
+        compiled: Whether to run the model traced with TorchScript
+
+    Returns:
+        list[dict[str, Any]]: Every book as a job dictionary, with the status
+            done, failed or skipped
+    """
+    if not isinstance(voice, Voice):
+        voice = Voice.get_by_name(voice)
+    options: dict[str, Any] = {
+        "voice": voice.name,
+        "speech_rate": speech_rate,
+        "format": format,
+        "max_chapters": max_chapters,
+        "cache_backend": cache_backend,
+    }
+    # Audio depends on the model too, which is common to every job
+    recorded = {
+        **options,
+        "backend": backend,
+        "quantize": quantize,
+        "precision": precision,
+    }
+    ensure_dir_exists(output_dir)
+    index = LibraryIndex(output_dir)
+
+    skipped: list[dict[str, Any]] = []
+    pending: dict[str, Path] = {}
+    digests: dict[str, str] = {}
+    found = find_books(paths)
+    names = audiobook_names(found)
+    for book in found:
+        digest = file_sha256(book)
+        if digest in digests.values():
+            logger.info(f"Skipping {book}, a copy of another book")
+            continue
+        digests[str(book)] = digest
+        output = None if force else index.converted(digest, recorded)
+        if output is None:
+            pending[str(book)] = book
+            continue
+        logger.info(f"Skipping {book}, already converted to {output}")
+        skipped.append({"epub": str(book), "status": "skipped", "output": str(output)})
+    if not pending:
+        return skipped
+
+    def record(job: dict[str, Any]) -> None:
+        if job["status"] == "done":
+            index.record(digests[job["epub"]], recorded, job["output"])
+
+    books = list(pending.values())
+    costs = [book_cost(book) for book in books]
+    _, stats = lpt_schedule(costs, jobs)
+    logger.info(f"Converting {len(books)} books, expecting {stats}")
+    scheduler = JobScheduler(
+        [voice],
+        jobs=jobs,
+        on_finish=record,
+        backend=backend,
+        quantize=quantize,
+        precision=precision,
+        compiled=compiled,
+    )
+    try:
+        submitted = [
+            scheduler.submit(
+                str(books[i]),
+                {
+                    **options,
+                    "output": str(Path(output_dir) / f"{names[books[i]]}.{format}"),
+                },
+            )
+            for i in longest_first(costs)
+        ]
+    finally:
+        scheduler.close()
+    return skipped + [scheduler.status(job["id"]) for job in submitted]
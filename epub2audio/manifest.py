@@ -0,0 +1,156 @@
+"""Checkpoint manifest of a conversion, to resume it after an interruption."""
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, Optional
+
+from loguru import logger
+
+from .helpers import StrPath
+
+
+def text_sha256(text: str) -> str:
+    """Get the digest of the text a segment was synthesized from.
+
+    Args:
+        text: Text of the segment
+
+    Returns:
+        str: Hex digest of the text
+    """
+    return sha256(text.encode()).hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    """A synthesized chunk of a chapter, as recorded in the manifest."""
+
+    chapter: int
+    part: str
+    index: int
+    name: str
+    frames: int
+    text_sha256: str
+
+
+class Manifest:
+    """Append-only record of the segments synthesized by a conversion.
+
+    The first line of the manifest describes the job, every following line a
+    segment that was synthesized from a chunk of a chapter, as JSON. Every
+    line is flushed to disk before the conversion moves on, so after an
+    interruption the manifest lists exactly the chunks that can be reused,
+    and a long chapter resumes at its first chunk missing. A manifest is only
+    resumed if it was written for the same job, and a segment only if the
+    text of its chunk did not change since. Segments are recorded with their
+    number of frames, so the chapter markers of a resumed conversion are
+    rebuilt without opening their audio.
+    """
+
+    def __init__(self, path: StrPath, job: dict[str, Any]):
+        """Initialize the manifest, without touching the file yet.
+
+        Args:
+            path: Path to the manifest
+            job: Settings that the synthesized segments depend on
+        """
+        self.path = Path(path)
+        self.job = job
+        self.entries: dict[tuple[int, str, int], ManifestEntry] = {}
+
+    def resume(self) -> int:
+        """Load the segments recorded by an earlier run of the same job.
+
+        Returns:
+            int: Number of segments that can be reused
+        """
+        if not self.path.exists():
+            return 0
+        with open(self.path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        if not lines or self._parse(lines[0]) != {"job": self.job}:
+            logger.warning(f"Manifest {self.path} is for another job, starting over")
+            return 0
+        for line in lines[1:]:
+            record = self._parse(line)
+            if record is None:
+                # The run was interrupted while writing this line
+                continue
+            entry = ManifestEntry(**record)
+            self.entries[(entry.chapter, entry.part, entry.index)] = entry
+        return len(self.entries)
+
+    @staticmethod
+    def _parse(line: str) -> Optional[dict[str, Any]]:
+        """Parse a line of the manifest.
+
+        Args:
+            line: Line to parse
+
+        Returns:
+            Optional[dict[str, Any]]: The record, or None if the line is broken
+        """
+        try:
+            record: dict[str, Any] = json.loads(line)
+            return record
+        except json.JSONDecodeError:
+            return None
+
+    def start(self) -> None:
+        """Write the manifest afresh, keeping the entries being resumed."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lines = [{"job": self.job}, *(asdict(e) for e in self.entries.values())]
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(line) + "\n" for line in lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def get(
+        self, chapter: int, part: str, index: int, text: str
+    ) -> Optional[ManifestEntry]:
+        """Get a recorded segment, if it was synthesized from the same text.
+
+        Args:
+            chapter: Order of the chapter
+            part: Part of the chapter, "announcement" or "content"
+            index: Index of the chunk in the part
+            text: Text of the chunk the segment should be synthesized from
+
+        Returns:
+            Optional[ManifestEntry]: The recorded segment, or None
+        """
+        entry = self.entries.get((chapter, part, index))
+        if entry is None or entry.text_sha256 != text_sha256(text):
+            return None
+        return entry
+
+    def record(
+        self, chapter: int, part: str, index: int, name: str, frames: int, text: str
+    ) -> ManifestEntry:
+        """Durably record a synthesized segment.
+
+        Args:
+            chapter: Order of the chapter
+            part: Part of the chapter, "announcement" or "content"
+            index: Index of the chunk in the part
+            name: Name of the segment, see `AudioConverter.synthesize`
+            frames: Number of frames of the segment
+            text: Text of the chunk the segment was synthesized from
+
+        Returns:
+            ManifestEntry: The recorded segment
+        """
+        entry = ManifestEntry(chapter, part, index, name, frames, text_sha256(text))
+        self.entries[(chapter, part, index)] = entry
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(entry)) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return entry
+
+    def remove(self) -> None:
+        """Remove the manifest once the conversion is complete."""
+        self.path.unlink(missing_ok=True)
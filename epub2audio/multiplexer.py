@@ -0,0 +1,86 @@
+"""Request multiplexing, sharing one model between concurrent conversions."""
+
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from .backends import TTSBackend
+
+
+@dataclass
+class _Request:
+    """Phonemes waiting for the model."""
+
+    phonemes: str
+    voice: str
+    speed: float
+    future: "Future[np.ndarray]" = field(default_factory=Future)
+
+
+class InferenceMultiplexer:
+    """Runs the model of a backend on requests from any number of threads.
+
+    Converters phonemize their text in their own thread and queue the phonemes
+    here, so G2P and writing audio overlap with inference. The model runs in a
+    single thread, on one request at a time in the order they were queued, so
+    it is never idle while any converter has phonemes ready and never waits
+    for more.
+
+    Requests are not batched: a Kokoro forward pass speaks a single text, and
+    padding texts into one pass would change their audio, as its duration LSTM
+    and the instance norms of its decoder run over the padding too.
+    """
+
+    def __init__(self, backend: TTSBackend):
+        """Start the model thread.
+
+        Args:
+            backend: Backend whose model to run
+        """
+        self.backend = backend
+        self.requests = 0
+        self._queue: queue.Queue[Optional[_Request]] = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="model", daemon=True)
+        self._thread.start()
+
+    def submit(self, phonemes: str, voice: str, speed: float) -> "Future[np.ndarray]":
+        """Queue phonemes for the model.
+
+        Args:
+            phonemes: Phonemes of a single pass of the model
+            voice: Name of, or path to, the voice to speak
+            speed: Speech rate multiplier
+
+        Returns:
+            Future[np.ndarray]: Audio of the phonemes, between -1 and 1
+        """
+        request = _Request(phonemes, voice, speed)
+        self._queue.put(request)
+        return request.future
+
+    def close(self) -> None:
+        """Run the queued requests and stop the model thread."""
+        self._queue.put(None)
+        self._thread.join()
+        if self.requests:
+            logger.debug(f"Ran {self.requests} requests")
+
+    def _run(self) -> None:
+        """Run requests until closed."""
+        while (request := self._queue.get()) is not None:
+            self.requests += 1
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            try:
+                request.future.set_result(
+                    self.backend.synthesize(
+                        request.phonemes, request.voice, request.speed
+                    )
+                )
+            except Exception as e:
+                request.future.set_exception(e)
@@ -0,0 +1,226 @@
+"""Staged pipeline with bounded queues between its stages."""
+
+import queue
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+# How long a blocked stage waits before checking whether the pipeline failed
+_POLL_INTERVAL = 0.1
+
+StageFunction = Callable[[Iterator[Any]], Iterable[Any]]
+
+
+class _EndOfStream:
+    """Marker put on a queue once its producer is exhausted."""
+
+
+_END = _EndOfStream()
+
+
+@dataclass
+class StageStats:
+    """Timing statistics of a single pipeline stage."""
+
+    name: str
+    items: int = 0
+    busy_time: float = 0.0
+    input_wait: float = 0.0
+    output_wait: float = 0.0
+    wall_time: float = 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Fraction of the wall time the stage spent doing work."""
+        if self.wall_time <= 0:
+            return 0.0
+        return self.busy_time / self.wall_time
+
+    def __str__(self) -> str:
+        """Return a string representation of the stage statistics."""
+        return (
+            f"{self.name}: {self.utilization:6.1%} busy, {self.items} items, "
+            f"waited {self.input_wait:.1f}s on input "
+            f"and {self.output_wait:.1f}s on output"
+        )
+
+
+@dataclass
+class _Stage:
+    """A stage of the pipeline and its statistics."""
+
+    name: str
+    func: StageFunction
+    stats: StageStats = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.stats = StageStats(self.name)
+
+
+class Pipeline:
+    """Chain of stages, each running in its own thread.
+
+    Every stage is a function turning an iterator of inputs into an iterable of
+    outputs, so a stage may hold on to several items at once. Stages are
+    connected by bounded queues, which keeps a fast producer from running too
+    far ahead of a slow consumer, while still letting all stages work at once.
+    """
+
+    def __init__(self, queue_size: int = 2):
+        """Initialize an empty pipeline.
+
+        Args:
+            queue_size: Maximum number of items waiting between two stages
+        """
+        self.queue_size = queue_size
+        self.stages: list[_Stage] = []
+        self._failed = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def add_stage(self, name: str, func: StageFunction) -> "Pipeline":
+        """Append a stage to the pipeline.
+
+        Args:
+            name: Name of the stage, used for reporting
+            func: Function turning the stage's inputs into its outputs
+
+        Returns:
+            Pipeline: The pipeline itself, for chaining
+        """
+        self.stages.append(_Stage(name, func))
+        return self
+
+    @property
+    def stats(self) -> list[StageStats]:
+        """Statistics of every stage, in pipeline order."""
+        return [stage.stats for stage in self.stages]
+
+    @property
+    def bottleneck(self) -> Optional[StageStats]:
+        """The stage that was busy for the largest fraction of the run."""
+        if not self.stages:
+            return None
+        return max(self.stats, key=lambda stats: stats.utilization)
+
+    def run(self, source: Iterable[Any]) -> list[StageStats]:
+        """Run items from the source through every stage.
+
+        The last stage runs in the calling thread, and its outputs are
+        discarded. If any stage raises, the whole pipeline is stopped and the
+        exception is raised again here.
+
+        Args:
+            source: Items fed into the first stage
+
+        Returns:
+            list[StageStats]: Statistics of every stage
+        """
+        if not self.stages:
+            raise ValueError("Pipeline has no stages")
+
+        queues: list[queue.Queue[Any]] = [
+            queue.Queue(maxsize=self.queue_size) for _ in self.stages[1:]
+        ]
+        threads = []
+        for i, stage in enumerate(self.stages[:-1]):
+            inputs = iter(source) if i == 0 else self._consume(queues[i - 1], stage)
+            thread = threading.Thread(
+                target=self._run_stage,
+                args=(stage, inputs, queues[i]),
+                name=f"pipeline-{stage.name}",
+                daemon=True,
+            )
+            threads.append(thread)
+            thread.start()
+
+        last = self.stages[-1]
+        inputs = iter(source) if not queues else self._consume(queues[-1], last)
+        self._run_stage(last, inputs, None)
+
+        for thread in threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.stats
+
+    def _run_stage(
+        self, stage: _Stage, inputs: Iterator[Any], output: "Optional[queue.Queue[Any]]"
+    ) -> None:
+        """Run a stage until its inputs are exhausted or the pipeline fails.
+
+        Args:
+            stage: Stage to run
+            inputs: Inputs of the stage
+            output: Queue to put the outputs on, or None to discard them
+        """
+        stats = stage.stats
+        start = time.perf_counter()
+        outputs: Iterable[Any] = ()
+        try:
+            outputs = stage.func(inputs)
+            for item in outputs:
+                stats.items += 1
+                if output is not None:
+                    stats.output_wait += self._put(output, item)
+                if self._failed.is_set():
+                    break
+        except BaseException as e:
+            if not self._failed.is_set():
+                self._error = e
+                self._failed.set()
+        finally:
+            # Let generator stages release their resources if we stopped early
+            close = getattr(outputs, "close", None)
+            if close is not None:
+                close()
+            if output is not None and not self._failed.is_set():
+                stats.output_wait += self._put(output, _END)
+            stats.wall_time = time.perf_counter() - start
+            stats.busy_time = max(
+                0.0, stats.wall_time - stats.input_wait - stats.output_wait
+            )
+
+    def _consume(self, input_queue: "queue.Queue[Any]", stage: _Stage) -> Iterator[Any]:
+        """Iterate over a queue, recording how long the stage waited on it.
+
+        Args:
+            input_queue: Queue to take items from
+            stage: Stage consuming the queue
+
+        Yields:
+            Any: Items from the queue
+        """
+        while True:
+            start = time.perf_counter()
+            while True:
+                try:
+                    item = input_queue.get(timeout=_POLL_INTERVAL)
+                    break
+                except queue.Empty:
+                    if self._failed.is_set():
+                        return
+            stage.stats.input_wait += time.perf_counter() - start
+            if item is _END:
+                return
+            yield item
+
+    def _put(self, output: "queue.Queue[Any]", item: Any) -> float:
+        """Put an item on a queue, giving up if the pipeline fails.
+
+        Args:
+            output: Queue to put the item on
+            item: Item to put
+
+        Returns:
+            float: Time spent waiting for room on the queue
+        """
+        start = time.perf_counter()
+        while not self._failed.is_set():
+            try:
+                output.put(item, timeout=_POLL_INTERVAL)
+                break
+            except queue.Full:
+                continue
+        return time.perf_counter() - start
@@ -0,0 +1,128 @@
+"""Registry of the Kokoro model and voices found on this machine."""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from .config import KOKORO_MODEL_NAME, KOKORO_PATHS, KOKORO_REPO_ID
+from .helpers import file_sha256
+from .voices import Voice
+
+
+@dataclass
+class Registry:
+    """Files of the Kokoro model and voices, resolved without the network."""
+
+    config: Optional[Path] = None  # Configuration of the model
+    model_weight: Optional[Path] = None  # Weights of the model
+    voices: dict[str, Path] = field(default_factory=dict)  # Packs by voice name
+    rejected: list[Path] = field(default_factory=list)  # Packs failing their hash
+    seconds: float = 0.0  # Time taken to scan for the files
+
+    def __str__(self) -> str:
+        """Summarize what was found and how long it took."""
+        model = "the model" if self.model_weight else "no model"
+        return f"{model} and {len(self.voices)} voices in {self.seconds * 1000:.1f} ms"
+
+
+# Registry of the files at the paths it was scanned for, see `get_registry`
+_registry: Optional[tuple[tuple[str, ...], Registry]] = None
+_registry_lock = threading.Lock()
+
+
+def _hub_snapshot() -> Optional[Path]:
+    """Find the files of the model downloaded from the hub, without asking it.
+
+    Returns:
+        Optional[Path]: Directory of the latest snapshot of the model in the
+            cache of the hub, or None if it was never downloaded
+    """
+    # The constants alone, as the rest of huggingface_hub is slow to import
+    from huggingface_hub import constants
+
+    repo = Path(constants.HF_HUB_CACHE) / f"models--{KOKORO_REPO_ID.replace('/', '--')}"
+    try:
+        revision = (repo / "refs" / "main").read_text().strip()
+    except OSError:
+        return None
+    snapshot = repo / "snapshots" / revision
+    return snapshot if snapshot.is_dir() else None
+
+
+def _file(*paths: Optional[Path]) -> Optional[Path]:
+    """Get the first of paths that is a file.
+
+    Args:
+        *paths: Paths to look for, in order, None for those unknown
+
+    Returns:
+        Optional[Path]: The first path that is a file, or None if none is
+    """
+    return next((path for path in paths if path and path.is_file()), None)
+
+
+def scan_registry() -> Registry:
+    """Scan for the files of the model and voices, never asking the hub.
+
+    Files at `KOKORO_PATHS` come first, then those downloaded to the cache of
+    the hub. A voice pack is only registered once its SHA-256 digest starts
+    with that of its voice, and the digest is kept in the index of
+    `file_sha256`, so a pack is only hashed again once it changes.
+
+    Returns:
+        Registry: Files found, and the time taken to find them
+    """
+    start = time.perf_counter()
+    # Absolute, so that the files are still found from another directory
+    paths = {name: Path(path).absolute() for name, path in KOKORO_PATHS.items()}
+    snapshot = _hub_snapshot()
+    registry = Registry(
+        config=_file(paths["config"], snapshot and snapshot / "config.json"),
+        model_weight=_file(
+            paths["model_weight"], snapshot and snapshot / KOKORO_MODEL_NAME
+        ),
+    )
+
+    voices = {voice.name: voice for voice in Voice}
+    directories = [paths["voice_weights"]]
+    if snapshot is not None:
+        directories.insert(0, snapshot / "voices")
+    for directory in directories:
+        # Packs found later, at `KOKORO_PATHS`, replace those of the hub
+        for path in sorted(directory.glob("*.pt")):
+            voice = voices.get(path.stem)
+            if voice is None:
+                logger.debug(f"Skipping unknown voice pack {path}")
+            elif file_sha256(path).startswith(voice.sha256):
+                registry.voices[voice.name] = path
+            else:
+                logger.warning(
+                    f"Skipping voice pack {path}, as it is not the one of "
+                    f"{voice.name} (SHA-256 {voice.sha256}...)"
+                )
+                registry.rejected.append(path)
+    registry.seconds = time.perf_counter() - start
+    logger.debug(f"Resolved {registry} locally")
+    return registry
+
+
+def get_registry() -> Registry:
+    """Get the registry of the model and voices, scanning for them once.
+
+    The registry is scanned again only if `KOKORO_PATHS` changes.
+
+    Returns:
+        Registry: Files of the model and voices found
+    """
+    global _registry
+    paths = tuple(
+        KOKORO_PATHS[name] for name in ("config", "model_weight", "voice_weights")
+    )
+    with _registry_lock:
+        if _registry is None or _registry[0] != paths:
+            _registry = (paths, scan_registry())
+        return _registry[1]
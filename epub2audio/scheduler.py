@@ -0,0 +1,117 @@
+"""Scheduling of uneven work: longest first, and in buckets of similar length."""
+
+import heapq
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+
+@dataclass
+class ScheduleStats:
+    """How evenly work was spread over workers."""
+
+    workers: int
+    busy: float  # Total work, summed over the workers
+    makespan: float  # Work of the busiest worker, or wall time
+
+    @property
+    def idle(self) -> float:
+        """Work the workers could have done while waiting for the busiest."""
+        return max(self.workers * self.makespan - self.busy, 0.0)
+
+    @property
+    def idle_ratio(self) -> float:
+        """Share of the workers' time spent idle."""
+        capacity = self.workers * self.makespan
+        return self.idle / capacity if capacity else 0.0
+
+    def __str__(self) -> str:
+        """Summarize the idle time."""
+        return f"{self.idle_ratio:.1%} idle over {self.workers} workers"
+
+
+def longest_first(costs: Sequence[float]) -> list[int]:
+    """Order work longest first, ties in their original order.
+
+    Args:
+        costs: Cost of every piece of work
+
+    Returns:
+        list[int]: Indices of the work, longest first
+    """
+    return sorted(range(len(costs)), key=lambda i: (-costs[i], i))
+
+
+def lpt_schedule(
+    costs: Sequence[float], workers: int
+) -> tuple[list[list[int]], ScheduleStats]:
+    """Assign work to workers, longest first to the least loaded worker.
+
+    Longest processing time first keeps the makespan within 4/3 of the
+    optimum, and the assignment only depends on the costs, so every node
+    computing it for the same book gets the same one.
+
+    Args:
+        costs: Cost of every piece of work
+        workers: Number of workers
+
+    Returns:
+        tuple[list[list[int]], ScheduleStats]: Indices of the work of every
+            worker, in their original order, and the expected idle time
+    """
+    loads = [(0.0, worker) for worker in range(workers)]
+    assignment: list[list[int]] = [[] for _ in range(workers)]
+    for i in longest_first(costs):
+        load, worker = heapq.heappop(loads)
+        assignment[worker].append(i)
+        heapq.heappush(loads, (load + costs[i], worker))
+    makespan = max(load for load, _ in loads)
+    stats = ScheduleStats(workers, float(sum(costs)), makespan)
+    return [sorted(indices) for indices in assignment], stats
+
+
+def length_buckets(
+    lengths: Sequence[int], max_size: int, tolerance: float = 0.25
+) -> list[list[int]]:
+    """Group work into buckets of similar length, longest bucket first.
+
+    A bucket takes work until it holds `max_size` pieces or the next one is
+    shorter than its longest by more than `tolerance`, so that padding all of
+    a bucket to its longest wastes little.
+
+    Args:
+        lengths: Length of every piece of work
+        max_size: Maximum number of pieces in a bucket
+        tolerance: Largest share of the longest length a piece may be short of
+
+    Returns:
+        list[list[int]]: Indices of the work of every bucket, longest first
+    """
+    buckets: list[list[int]] = []
+    for i in longest_first(lengths):
+        bucket = buckets[-1] if buckets else None
+        if (
+            bucket is None
+            or len(bucket) >= max_size
+            or lengths[i] < lengths[bucket[0]] * (1 - tolerance)
+        ):
+            buckets.append([i])
+        else:
+            bucket.append(i)
+    return buckets
+
+
+def padding(lengths: Sequence[int], buckets: Sequence[Sequence[int]]) -> int:
+    """Count the padding needed to bring every bucket to its longest length.
+
+    Args:
+        lengths: Length of every piece of work
+        buckets: Indices of the work of every bucket
+
+    Returns:
+        int: Padding summed over the buckets
+    """
+    return sum(
+        max(lengths[i] for i in bucket) * len(bucket) - sum(lengths[i] for i in bucket)
+        for bucket in buckets
+        if bucket
+    )
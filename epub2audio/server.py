@@ -0,0 +1,346 @@
+"""Long-running server that converts books with the models kept in memory."""
+
+import json
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional, Union
+from urllib.parse import urlsplit
+from uuid import uuid4
+
+from loguru import logger
+
+from .backends import load_backend
+from .epub2audio import Epub2Audio
+from .helpers import AudioHandlerError, ConversionError
+from .multiplexer import InferenceMultiplexer
+from .voices import Voice
+
+# Options of `Epub2Audio` a job may set
+JOB_OPTIONS = {
+    "output",
+    "voice",
+    "speech_rate",
+    "format",
+    "max_chapters",
+    "cache_backend",
+    "pipeline",
+}
+
+# Hosts of the web pages that may send requests, as jobs read and write any path
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+
+@dataclass
+class Job:
+    """A book submitted to the server for conversion."""
+
+    id: str
+    epub: str
+    options: dict[str, Any]
+    status: str = "queued"  # queued, running, done or failed
+    output: str = ""
+    error: str = ""
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+
+class JobScheduler:
+    """Runs submitted jobs, with their models kept loaded.
+
+    Jobs start in submission order, up to `jobs` at a time. A pipeline is
+    loaded for the language of the first job in that language and kept for
+    every later job, along with the voices it loaded. Its model runs in an
+    `InferenceMultiplexer` shared by the jobs running at once.
+    """
+
+    def __init__(
+        self,
+        voices: Iterable[Union[str, Voice]] = (),
+        jobs: int = 1,
+        on_finish: Optional[Callable[[dict[str, Any]], None]] = None,
+        backend: str = "kokoro",
+        quantize: Optional[str] = None,
+        precision: str = "fp32",
+        compiled: bool = False,
+    ):
+        """Load the pipelines of the given voices and start running jobs.
+
+        Args:
+            voices: Voices to load before accepting jobs, so that the first job
+                in any of them starts right away
+            jobs: Number of jobs to run at once
+            on_finish: Called with every job, as a dictionary, once it is done
+                or failed, from the thread that ran it
+            backend: Name of the text-to-speech backend, one of `TTS_BACKENDS`
+            quantize: Quantization of the model, or None for full precision
+            precision: Precision the model runs at, one of `PRECISIONS`
+            compiled: Whether to run the model traced with TorchScript
+        """
+        self.jobs: dict[str, Job] = {}
+        self.on_finish = on_finish
+        self.backend = backend
+        self.quantize = quantize
+        self.precision = precision
+        self.compiled = compiled
+        self._multiplexers: dict[str, InferenceMultiplexer] = {}
+        self._queue: queue.Queue[Optional[Job]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        for voice in voices:
+            self.preload(voice)
+        self._threads = [
+            threading.Thread(target=self._run, name=f"jobs-{i}", daemon=True)
+            for i in range(jobs)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def multiplexer(self, voice: Union[str, Voice]) -> InferenceMultiplexer:
+        """Get the multiplexer for the language of a voice, loading it if needed.
+
+        Args:
+            voice: Voice to speak
+
+        Returns:
+            InferenceMultiplexer: Multiplexer of the language of the voice
+        """
+        if not isinstance(voice, Voice):
+            voice = Voice.get_by_name(voice)
+        with self._load_lock:
+            multiplexer = self._multiplexers.get(voice.lang_code)
+            if multiplexer is None:
+                logger.info(f"Loading the {self.backend} backend for {voice.language}")
+                backend = load_backend(
+                    self.backend,
+                    voice,
+                    quantize=self.quantize,
+                    precision=self.precision,
+                    compiled=self.compiled,
+                )
+                multiplexer = InferenceMultiplexer(backend)
+                self._multiplexers[voice.lang_code] = multiplexer
+        return multiplexer
+
+    def preload(self, voice: Union[str, Voice]) -> None:
+        """Load a voice and run the model once, ahead of the first job.
+
+        Args:
+            voice: Voice to load
+        """
+        if not isinstance(voice, Voice):
+            voice = Voice.get_by_name(voice)
+        backend = self.multiplexer(voice).backend
+        for _ in backend.generate("Ready.", voice.name, 1.0):
+            pass
+        logger.debug(f"Loaded voice {voice.name}")
+
+    def submit(self, epub: str, options: dict[str, Any]) -> dict[str, Any]:
+        """Queue a book for conversion.
+
+        Args:
+            epub: Path to the EPUB file, on the machine of the server
+            options: Options of `Epub2Audio`, out of `JOB_OPTIONS`
+
+        Returns:
+            dict[str, Any]: The queued job, as a dictionary
+
+        Raises:
+            ValueError: If the book does not exist or an option is unknown
+        """
+        unknown = set(options) - JOB_OPTIONS
+        if unknown:
+            raise ValueError(f"Unknown options: {', '.join(sorted(unknown))}")
+        if not Path(epub).is_file():
+            raise ValueError(f"No EPUB file at {epub}")
+        job = Job(uuid4().hex[:12], str(Path(epub).resolve()), options)
+        with self._lock:
+            self.jobs[job.id] = job
+            queued = asdict(job)
+        self._queue.put(job)
+        logger.info(f"Queued job {job.id}: {job.epub}")
+        return queued
+
+    def status(self, job_id: Optional[str] = None) -> Any:
+        """Get the status of a job, or of every job.
+
+        Args:
+            job_id: Identifier of the job, or None for every job
+
+        Returns:
+            Any: The job as a dictionary, None if there is no such job, or a
+                list of every job if no identifier is given
+        """
+        with self._lock:
+            if job_id is None:
+                return [asdict(job) for job in self.jobs.values()]
+            job = self.jobs.get(job_id)
+            return asdict(job) if job else None
+
+    def close(self) -> None:
+        """Finish the queued jobs and stop."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        for multiplexer in self._multiplexers.values():
+            multiplexer.close()
+
+    def _run(self) -> None:
+        """Run jobs as they are queued, until closed."""
+        while (job := self._queue.get()) is not None:
+            self._convert(job)
+
+    def _convert(self, job: Job) -> None:
+        """Convert the book of a job, recording how it went.
+
+        Args:
+            job: Job to run
+        """
+        with self._lock:
+            job.status = "running"
+            job.started = time.time()
+        options = dict(job.options)
+        voice = options.pop("voice", Voice.AF_HEART)
+        if "output" in options:
+            # Named like the option of the command line
+            options["output_path"] = options.pop("output")
+        status, output, error = "failed", "", ""
+        try:
+            book = Epub2Audio(
+                job.epub,
+                voice=voice,
+                quiet=True,
+                cache=True,
+                multiplexer=self.multiplexer(voice),
+                **options,
+            )
+            status, output = "done", str(book.output_path.resolve())
+        except (ConversionError, AudioHandlerError) as e:
+            error = e.message
+        except Exception as e:
+            logger.exception(e)
+            error = str(e)
+        with self._lock:
+            job.status, job.output, job.error = status, output, error
+            job.finished = time.time()
+            finished = asdict(job)
+        logger.info(f"Job {job.id} {status}{f': {error}' if error else ''}")
+        if self.on_finish:
+            try:
+                self.on_finish(finished)
+            except Exception as e:
+                # Keep running the jobs that are queued
+                logger.exception(e)
+
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON API of the job server.
+
+    - `POST /jobs` with `{"epub": path, ...options}` queues a book, sent as
+      `application/json`
+    - `GET /jobs` lists every job
+    - `GET /jobs/<id>` gets a single job
+
+    Requests from web pages are only accepted from pages of this machine.
+    """
+
+    server: "JobServer"
+
+    def do_GET(self) -> None:
+        """Get the status of jobs."""
+        if not self._is_local_origin():
+            return
+        if self.path.rstrip("/") == "/jobs":
+            self._send(HTTPStatus.OK, self.server.scheduler.status())
+            return
+        job_id = self.path.removeprefix("/jobs/")
+        job = self.server.scheduler.status(job_id) if job_id != self.path else None
+        if job is None:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"No job at {self.path}"})
+        else:
+            self._send(HTTPStatus.OK, job)
+
+    def do_POST(self) -> None:
+        """Submit a job."""
+        if not self._is_local_origin():
+            return
+        if self.path.rstrip("/") != "/jobs":
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"Cannot post to {self.path}"})
+            return
+        # Browsers cannot send JSON to another origin without asking first, which
+        # the server never allows
+        content_type = self.headers.get_content_type()
+        if content_type != "application/json":
+            self._send(
+                HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+                {"error": f"Expected application/json, not {content_type}"},
+            )
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            options = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(options, dict):
+                raise ValueError("expected a JSON object")
+            epub = options.pop("epub", None)
+            if not isinstance(epub, str):
+                raise ValueError("expected the path of an EPUB file in epub")
+            job = self.server.scheduler.submit(epub, options)
+        except ValueError as e:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": f"Invalid job: {e}"})
+            return
+        self._send(HTTPStatus.ACCEPTED, job)
+
+    def _is_local_origin(self) -> bool:
+        """Refuse requests from web pages served by other hosts.
+
+        Any web page may send requests to the server, even through a host name
+        of its own resolving to this machine, and browsers send the origin of
+        the page along with them. Other clients usually send none.
+
+        Returns:
+            bool: Whether the request may go on, otherwise it was refused
+        """
+        origin = self.headers.get("Origin")
+        if origin is None or urlsplit(origin).hostname in LOCAL_HOSTS:
+            return True
+        self._send(HTTPStatus.FORBIDDEN, {"error": f"Origin {origin} is not allowed"})
+        return False
+
+    def _send(self, status: HTTPStatus, body: Any) -> None:
+        """Send a JSON response.
+
+        Args:
+            status: Status of the response
+            body: Body of the response, to encode as JSON
+        """
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Log requests at debug level rather than to stderr."""
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class JobServer(ThreadingHTTPServer):
+    """HTTP server queuing books on a `JobScheduler`."""
+
+    def __init__(self, address: tuple[str, int], scheduler: JobScheduler):
+        """Bind the server.
+
+        Args:
+            address: Host and port to listen on
+            scheduler: Scheduler to run the jobs
+        """
+        super().__init__(address, _JobRequestHandler)
+        self.scheduler = scheduler
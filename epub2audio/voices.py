@@ -2,10 +2,7 @@
 
 from dataclasses import dataclass
 from enum import Enum
-from pathlib import Path
-from typing import Optional, Union
-
-from .config import KOKORO_PATHS
+from typing import Optional
 
 # Language code mappings
 LANG_CODES = {
@@ -46,7 +43,6 @@ class VoiceInfo:
     training_duration: Optional[str] = None  # Training duration category
     traits: Optional[str] = None  # Emoji traits
     cc_by: Optional[str] = None  # Attribution if under CC BY license
-    local_path: Optional[str] = None  # Local path to the voice model
 
 
 class Voice(Enum):
@@ -185,11 +181,6 @@ class Voice(Enum):
         """Get the voice language code."""
         return self.value.lang_code
 
-    @property
-    def local_path(self) -> str | None:
-        """Get the voice language code."""
-        return self.value.local_path
-
     @property
     def language(self) -> str:
         """Get the full language name or code."""
@@ -210,13 +201,6 @@ class Voice(Enum):
         """Check if the voice is male."""
         return self.value.gender == "M"
 
-    def set_path(self, voice_path: Union[str, Path]) -> bool:
-        """Set local path, if it exists."""
-        if Path(voice_path).is_file():
-            self.value.local_path = str(voice_path)
-            return True
-        return False
-
     @classmethod
     def get_by_name(cls, name: str) -> "Voice":
         """Get a voice by its name.
@@ -232,9 +216,6 @@ class Voice(Enum):
         """
         for voice in cls:
             if voice.name == name:
-                local_path = Path(KOKORO_PATHS["voice_weights"]) / f"{name}.pt"
-                if Path(local_path).is_file():
-                    voice.value.local_path = str(local_path)
                 return voice
         raise ValueError(f"No voice named '{name}'")
 
@@ -289,10 +270,3 @@ def available_voices() -> list[str]:
     """List available voices."""
     voices = Voice.list_voices()
     return [v.name for v in voices]
-
-
-# if Path(KOKORO_PATHS["voice_weights"]).exists():
-#     logger.debug("weight path exists")
-#     for file in Path(KOKORO_PATHS["voice_weights"]).glob("*.pt"):
-#         logger.debug(f"found voice file: {file}")
-#         Voice.get_by_name(file.stem).set_path(file)
@@ -0,0 +1,242 @@
+"""Process pool for synthesizing chapters in parallel."""
+
+import multiprocessing
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from types import TracebackType
+from typing import Optional
+
+from loguru import logger
+
+from . import scheduler
+from .audio_converter import AudioConverter, Segment
+from .cache import CacheStats
+from .epub_processor import Chapter
+from .helpers import StrPath
+from .scheduler import ScheduleStats
+
+# Each worker process holds its own converter, and with it its own backend
+_worker_converter: Optional[AudioConverter] = None
+
+
+@dataclass
+class ChapterAudio:
+    """Synthesized audio segments of a single chapter."""
+
+    order: int
+    announcement: list[Segment]
+    content: list[Segment]
+    cache_stats: CacheStats
+    # Time the worker took, or 0 if the chapter was not synthesized
+    seconds: float = field(default=0.0, compare=False)
+
+
+def _init_worker(
+    epub_path: StrPath,
+    voice: str,
+    speech_rate: float,
+    cache: bool,
+    cache_backend: str,
+    backend: str,
+    quantize: Optional[str],
+    precision: str,
+    compiled: bool,
+) -> None:
+    """Initialize the converter of a worker process.
+
+    Args:
+        epub_path: Path to the EPUB file, used to generate a cache directory
+        voice: Name of the voice to use
+        speech_rate: Speech rate multiplier
+        cache: Whether to reuse cached audio segments
+        cache_backend: How the segment store keeps segments
+        backend: Name of the text-to-speech backend
+        quantize: Quantization of the model, or None for full precision
+        precision: Precision the model runs at
+        compiled: Whether to run the model traced with TorchScript
+    """
+    global _worker_converter
+    _worker_converter = AudioConverter(
+        epub_path,
+        voice=voice,
+        speech_rate=speech_rate,
+        cache=cache,
+        cache_backend=cache_backend,
+        backend=backend,
+        quantize=quantize,
+        precision=precision,
+        compiled=compiled,
+    )
+
+
+def _convert_chapter(chapter: Chapter) -> ChapterAudio:
+    """Synthesize the announcement and content of a chapter in a worker.
+
+    Args:
+        chapter: Chapter to convert
+
+    Returns:
+        ChapterAudio: The synthesized audio segments
+    """
+    assert _worker_converter is not None, "worker was not initialized"
+    start = time.perf_counter()
+    stats = _worker_converter.cache_stats
+    hits, misses = stats.hits, stats.misses
+    announcement = _worker_converter.synthesize(chapter.title)
+    content = _worker_converter.synthesize(chapter.content)
+    return ChapterAudio(
+        chapter.order,
+        announcement,
+        content,
+        CacheStats(stats.hits - hits, stats.misses - misses),
+        time.perf_counter() - start,
+    )
+
+
+class ChapterWorkerPool:
+    """Pool of worker processes that synthesize chapters in parallel."""
+
+    def __init__(
+        self,
+        epub_path: StrPath,
+        workers: int,
+        voice: str,
+        speech_rate: float = 1.0,
+        cache: bool = True,
+        cache_backend: str = "files",
+        backend: str = "kokoro",
+        quantize: Optional[str] = None,
+        precision: str = "fp32",
+        compiled: bool = False,
+    ):
+        """Start the worker processes.
+
+        Args:
+            epub_path: Path to the EPUB file, used to generate a cache directory
+            workers: Number of worker processes to start
+            voice: Name of the voice to use
+            speech_rate: Speech rate multiplier
+            cache: Whether to reuse cached audio segments
+            cache_backend: How the segment store keeps segments
+            backend: Name of the text-to-speech backend
+            quantize: Quantization of the model, or None for full precision
+            precision: Precision the model runs at
+            compiled: Whether to run the model traced with TorchScript
+        """
+        self.workers = workers
+        self.cache_stats = CacheStats()
+        self.schedule_stats = ScheduleStats(workers, 0.0, 0.0)
+        # torch does not survive a fork once its thread pools are running
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                epub_path,
+                voice,
+                speech_rate,
+                cache,
+                cache_backend,
+                backend,
+                quantize,
+                precision,
+                compiled,
+            ),
+        )
+        logger.debug(f"Started {workers} chapter workers")
+
+    def __enter__(self) -> "ChapterWorkerPool":
+        """Enter the context manager."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Shut down the worker processes."""
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the worker processes, cancelling pending chapters."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def convert(
+        self,
+        chapters: Iterable[Chapter],
+        resume: Optional[Callable[[Chapter], Optional[ChapterAudio]]] = None,
+        longest_first: bool = False,
+    ) -> Iterator[tuple[Chapter, ChapterAudio]]:
+        """Synthesize chapters in parallel, yielding them in the order given.
+
+        By default at most two chapters per worker are in flight at once, so
+        chapters can be streamed in and results never pile up far ahead of the
+        consumer. With `longest_first`, every chapter is submitted up front,
+        longest first, so that short chapters fill in around the long ones and
+        no worker is left idle while another finishes a long chapter.
+
+        How busy the workers were is kept in `schedule_stats`.
+
+        Args:
+            chapters: Chapters to convert, sorted by `Chapter.order`
+            resume: Function returning the segments of a chapter synthesized
+                by an earlier run, or None if it must be synthesized
+            longest_first: Whether to submit every chapter at once, longest
+                first
+
+        Yields:
+            tuple[Chapter, ChapterAudio]: The chapter and its audio segments
+        """
+        start = time.perf_counter()
+        finished = [start]
+
+        def submit(chapter: Chapter) -> "Future[ChapterAudio]":
+            resumed = resume(chapter) if resume else None
+            if resumed is not None:
+                future: Future[ChapterAudio] = Future()
+                future.set_result(resumed)
+                return future
+            future = self._executor.submit(_convert_chapter, chapter)
+            future.add_done_callback(lambda _: finished.append(time.perf_counter()))
+            return future
+
+        pending: deque[tuple[Chapter, Future[ChapterAudio]]] = deque()
+        if longest_first:
+            chapters = list(chapters)
+            futures: dict[int, Future[ChapterAudio]] = {}
+            costs = [len(chapter.title) + len(chapter.content) for chapter in chapters]
+            for i in scheduler.longest_first(costs):
+                futures[i] = submit(chapters[i])
+            pending.extend((chapter, futures[i]) for i, chapter in enumerate(chapters))
+        else:
+            for chapter in chapters:
+                pending.append((chapter, submit(chapter)))
+                if len(pending) >= 2 * self.workers:
+                    yield self._collect(*pending.popleft())
+        while pending:
+            yield self._collect(*pending.popleft())
+        self.schedule_stats.makespan += max(finished) - start
+
+    def _collect(
+        self, chapter: Chapter, future: "Future[ChapterAudio]"
+    ) -> tuple[Chapter, ChapterAudio]:
+        """Wait for a chapter to finish.
+
+        Lookups of the segment store made by the worker are added to the
+        `cache_stats` of the pool.
+
+        Args:
+            chapter: Chapter that was submitted
+            future: Future of the chapter's conversion
+
+        Returns:
+            tuple[Chapter, ChapterAudio]: The chapter and its audio segments
+        """
+        result = future.result()
+        self.cache_stats.update(result.cache_stats)
+        self.schedule_stats.busy += result.seconds
+        return chapter, result
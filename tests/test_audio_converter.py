@@ -1,25 +1,37 @@
 """Unit tests for audio conversion module."""
 
+import threading
+import time
 from collections.abc import Generator
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from unittest.mock import Mock, patch
 
 import numpy as np
 import pytest
+import torch
 from soundfile import SoundFile
 
 from epub2audio.audio_converter import AudioConverter
 from epub2audio.config import SAMPLE_RATE, ErrorCodes
-from epub2audio.helpers import ConversionError
+from epub2audio.helpers import CacheDirManager, ConversionError
 from epub2audio.voices import Voice
 
 
 @pytest.fixture
-def mock_tts() -> Generator[Mock, None, None]:
+def mock_tts(tmp_path: Path) -> Generator[Mock, None, None]:
     """Create a mock TTS engine with default test voice and audio output."""
-    with patch("epub2audio.audio_converter.KPipeline") as mock_kpipeline:
-        # Create mock KModel
-        with patch("epub2audio.audio_converter.KModel") as mock_kmodel:
+    with (
+        patch("epub2audio.backends.KPipeline") as mock_kpipeline,
+        patch(
+            "epub2audio.audio_converter.PHONEME_CACHE_PATH",
+            tmp_path / "phonemes.sqlite3",
+        ),
+        patch("epub2audio.cache.SEGMENT_CACHE_DIR", tmp_path / "segments"),
+        patch("epub2audio.cache.PACK_CACHE_DIR", tmp_path / "packs"),
+    ):
+        # Create mock KModel, in place of mapping its weights
+        with patch("epub2audio.backends._load_model") as mock_kmodel:
             # Set up mock model
             _ = mock_kmodel.return_value
 
@@ -28,7 +40,6 @@ def mock_tts() -> Generator[Mock, None, None]:
             voice = Mock()
             voice.value = {"name": "test_voice"}
             voice.name = "test_voice"
-            voice.local_path = None
             tts.get_voice.return_value = voice
 
             # Patch Path.exists to return True for model weights check
@@ -38,10 +49,7 @@ def mock_tts() -> Generator[Mock, None, None]:
 
                 # Set up mock for __call__
                 mock_result = Mock()
-                mock_result.audio = Mock()
-                mock_result.audio.numpy.return_value = np.zeros(
-                    SAMPLE_RATE, dtype=np.float32
-                )
+                mock_result.audio = torch.zeros(SAMPLE_RATE)
                 mock_result.phonemes = "test phonemes"
                 tts.return_value = [mock_result]
 
@@ -132,20 +140,20 @@ def test_convert_text(mock_tts: Mock, tmp_path: Path) -> None:
                 mock_sound_file = Mock(spec=SoundFile)
                 mock_sound_file.close = Mock()
 
-                with patch(
-                    "epub2audio.audio_converter.SoundFile", return_value=mock_sound_file
+                with (
+                    patch(
+                        "epub2audio.audio_converter.SoundFile",
+                        return_value=mock_sound_file,
+                    ),
+                    patch("epub2audio.cache.SoundFile", return_value=mock_sound_file),
                 ):
-                    # Mock os.rename to avoid actual file operations
-                    with patch("os.rename"):
+                    # Mock os.replace to avoid actual file operations
+                    with patch("os.replace"):
                         converter = AudioConverter(epub_path=str(epub_path))
 
-                        # Set up converter._audio_data_generator method to yield mocks
-                        mock_result = Mock()
-                        mock_result.audio = Mock()
-                        mock_result.audio.numpy.return_value = np.zeros(
-                            1000, dtype=np.float32
-                        )
-                        mock_result.phonemes = "test phonemes"
+                        # Set up converter._audio_data_generator method to yield
+                        # the phonemes and audio of a pass
+                        mock_result = ("test phonemes", np.zeros(1000, np.float32))
 
                         with patch.object(
                             converter,
@@ -224,3 +232,179 @@ def test_chapter_announcement_conversion(mock_tts: Mock, tmp_path: Path) -> None
 
                     # Verify the convert_text was called with the chapter title
                     mock_convert_text.assert_called_with(chapter_title)
+
+
+def test_convert_text_in_chunk_workers(mock_tts: Mock, tmp_path: Path) -> None:
+    """Test chunks synthesized by the chunk workers are written in order."""
+    epub_path = tmp_path / "test.epub"
+    epub_path.touch()
+
+    def synthesize(chunk: str, **kwargs: object) -> list[Mock]:
+        # Later chunks finish first, to exercise reordering
+        index = int(chunk.split()[1].rstrip("."))
+        time.sleep(0.01 * (5 - index))
+        result = Mock()
+        result.phonemes = chunk
+        result.audio = torch.full((100,), index / 10)
+        return [result]
+
+    mock_tts.side_effect = synthesize
+    with (
+        patch("epub2audio.audio_converter.CacheDirManager") as mock_cache_dir,
+        patch(
+            "epub2audio.audio_converter.ProcessPoolExecutor",
+            side_effect=lambda mp_context, initializer, initargs, **kwargs: (
+                ThreadPoolExecutor(**kwargs)
+            ),
+        ),
+    ):
+        mock_cache_dir.return_value.get_file.return_value = str(tmp_path / "a.flac")
+        converter = AudioConverter(epub_path=str(epub_path), chunk_workers=2)
+        with patch("epub2audio.audio_converter._chunk_converter", converter):
+            text = "\n".join(f"Paragraph {i}." for i in range(5))
+            segment = converter.convert_text(text)
+        converter.close()
+
+    data = segment.read(dtype="int16")
+    assert len(data) == 500
+    chunk_levels = [int(round(data[i * 100] / 3276.7)) for i in range(5)]
+    assert chunk_levels == list(range(5))
+
+
+def test_phoneme_cache_shared_across_voices(mock_tts: Mock, tmp_path: Path) -> None:
+    """Test phonemes of a chunk are reused by a converter with another voice."""
+    epub_path = tmp_path / "test.epub"
+    epub_path.touch()
+    result = Mock()
+    result.phonemes = "hˈɛlO"
+    result.audio = torch.zeros(100)
+    mock_tts.return_value = [result]
+    mock_tts.generate_from_tokens.return_value = [result]
+
+    with patch("epub2audio.audio_converter.CacheDirManager"):
+        first = AudioConverter(epub_path=str(epub_path), voice=Voice.AF_HEART)
+        assert len(list(first._iter_audio("Hello."))) == 1
+        first.close()
+        second = AudioConverter(
+            epub_path=str(epub_path), voice=Voice.AM_ADAM, speech_rate=1.5
+        )
+        assert len(list(second._iter_audio("Hello."))) == 1
+        second.close()
+
+    mock_tts.assert_called_once()
+    mock_tts.generate_from_tokens.assert_called_once_with(
+        "hˈɛlO", voice=Voice.AM_ADAM.name, speed=1.5
+    )
+
+
+def test_convert_text_multiplexed(mock_tts: Mock, tmp_path: Path) -> None:
+    """Test a converter with a multiplexer phonemizes and leaves the model to it."""
+    epub_path = tmp_path / "test.epub"
+    epub_path.touch()
+
+    def submit(phonemes: str, voice: str, speed: float) -> "Future[np.ndarray]":
+        future: Future[np.ndarray] = Future()
+        future.set_result(np.full(100, int(phonemes) / 10, dtype=np.float32))
+        return future
+
+    backend = Mock(phoneme_set="a", version="test")
+    backend.phonemize.side_effect = lambda chunk: [chunk.split()[1].rstrip(".")]
+    multiplexer = Mock(backend=backend)
+    multiplexer.submit.side_effect = submit
+    with patch("epub2audio.audio_converter.CacheDirManager") as mock_cache_dir:
+        mock_cache_dir.return_value.get_file.return_value = str(tmp_path / "a.flac")
+        converter = AudioConverter(epub_path=str(epub_path), multiplexer=multiplexer)
+        text = "\n".join(f"Paragraph {i}." for i in range(8))
+        segment = converter.convert_text(text)
+        converter.close()
+
+    assert converter.backend is backend
+    backend.generate.assert_not_called()
+    backend.synthesize.assert_not_called()
+    assert backend.phonemize.call_count == 8
+    data = segment.read(dtype="int16")
+    chunk_levels = [int(round(data[i * 100] / 3276.7)) for i in range(8)]
+    assert chunk_levels == list(range(8))
+
+
+def test_convert_text_caches_lossless_segments(mock_tts: Mock, tmp_path: Path) -> None:
+    """Test segments are cached as 16-bit FLAC whatever the audiobook format."""
+    epub_path = tmp_path / "test.epub"
+    epub_path.touch()
+
+    with patch("epub2audio.audio_converter.CacheDirManager") as mock_cache_dir:
+        mock_cache_dir.return_value.get_file.return_value = str(tmp_path / "a.flac")
+        converter = AudioConverter(epub_path=str(epub_path))
+        segment = converter.convert_text("Test text")
+
+    mock_cache_dir.assert_called_once_with(
+        str(epub_path), extension=".flac", voice=Voice.AF_HEART.name
+    )
+    assert segment.format == "FLAC"
+    assert segment.subtype == "PCM_16"
+    assert segment.frames == SAMPLE_RATE
+
+
+def test_segment_store_shared_across_books(mock_tts: Mock, tmp_path: Path) -> None:
+    """Test text synthesized for one book is reused by another."""
+    books = [tmp_path / "first.epub", tmp_path / "second.epub"]
+    for book in books:
+        book.write_text(book.stem)
+
+    with patch("epub2audio.helpers.CACHE_DIR", tmp_path / "books"):
+        first = AudioConverter(epub_path=str(books[0]))
+        first.convert_text("Chapter 1").close()
+        second = AudioConverter(epub_path=str(books[1]))
+        second.convert_text("Chapter  1").close()
+        second.convert_text("Chapter 2").close()
+
+    assert mock_tts.call_count == 2
+    assert str(first.cache_stats) == "0/1 hits (0.0%)"
+    assert str(second.cache_stats) == "1/2 hits (50.0%)"
+
+
+def test_pack_backend_shared_across_books(mock_tts: Mock, tmp_path: Path) -> None:
+    """Test segments appended to packs are found again by another converter."""
+    epub_path = tmp_path / "test.epub"
+    epub_path.write_text("book")
+
+    first = AudioConverter(epub_path=str(epub_path), cache_backend="pack")
+    assert first.convert_text("Chapter 1").frames == SAMPLE_RATE
+    first.close()
+    second = AudioConverter(epub_path=str(epub_path), cache_backend="pack")
+    assert second.convert_text("Chapter 1").frames == SAMPLE_RATE
+    second.close()
+
+    assert mock_tts.call_count == 1
+    assert [path.suffix for path in (tmp_path / "packs").glob("*.pack")] == [".pack"]
+
+
+def test_concurrent_synthesis_of_same_text(mock_tts: Mock, tmp_path: Path) -> None:
+    """Test workers synthesizing the same text never remove each other's file."""
+    epub_path = tmp_path / "test.epub"
+    epub_path.write_text("book")
+    # The phonemes one converter caches are spoken the same by the other
+    mock_tts.generate_from_tokens.return_value = mock_tts.return_value
+    both_written = threading.Barrier(2, timeout=10)
+    write_segment = AudioConverter._write_segment
+
+    def write_and_wait(self: AudioConverter, audio: np.ndarray, path: str) -> None:
+        write_segment(self, audio, path)
+        both_written.wait()
+
+    with (
+        patch("epub2audio.helpers.CACHE_DIR", tmp_path / "books"),
+        patch.dict(CacheDirManager._cache_dirs, clear=True),
+        patch.object(AudioConverter, "_write_segment", write_and_wait),
+    ):
+        converters = [
+            AudioConverter(epub_path=str(epub_path), cache=False) for _ in range(2)
+        ]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            segments = list(
+                executor.map(lambda c: c.synthesize("Chapter 1"), converters)
+            )
+
+    assert segments[0] == segments[1]
+    assert segments[0][0].frames == SAMPLE_RATE
+    assert SoundFile(segments[0][0].name).frames == SAMPLE_RATE
@@ -3,12 +3,13 @@
 from pathlib import Path
 from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest
 from mutagen.oggopus import OggOpus
 from soundfile import SoundFile
 
 from epub2audio.audio_handler import AudioHandler
-from epub2audio.config import ErrorCodes
+from epub2audio.config import SAMPLE_RATE, ErrorCodes
 from epub2audio.epub_processor import BookMetadata
 from epub2audio.helpers import AudioHandlerError
 
@@ -170,3 +171,33 @@ def test_total_duration(audio_handler: AudioHandler) -> None:
 
     audio_handler.add_chapter_marker("Chapter 2", 10.0, 20.0)
     assert audio_handler.total_duration == 20.0
+
+
+def test_stream_audio_file(audio_handler: AudioHandler, tmp_path: Path) -> None:
+    """Test streaming segments into the final file one at a time."""
+    segments = []
+    for i in range(3):
+        path = str(tmp_path / f"segment{i}.flac")
+        with SoundFile(
+            path, mode="w", samplerate=SAMPLE_RATE, channels=1, format="FLAC"
+        ) as segment:
+            segment.write(np.full(SAMPLE_RATE // 10, 0.1 * i))
+        segments.append(SoundFile(path))
+
+    audio_handler.start_audio_file()
+    frames = sum(audio_handler.append_audio(segment) for segment in segments)
+    audio_handler.add_chapter_marker("Chapter 1", 0.0, 0.3)
+    audio_handler.finish_audio_file()
+
+    assert frames == 3 * (SAMPLE_RATE // 10)
+    assert not audio_handler.partial_path.exists()
+    with SoundFile(audio_handler.output_path) as output:
+        assert output.samplerate == SAMPLE_RATE
+        assert output.frames > 0
+    assert OggOpus(audio_handler.output_path)["CHAPTER000NAME"] == ["Chapter 1"]
+
+
+def test_append_audio_before_start(audio_handler: AudioHandler) -> None:
+    """Test segments cannot be appended before the final file is started."""
+    with pytest.raises(ValueError):
+        audio_handler.append_audio(Mock(spec=SoundFile))
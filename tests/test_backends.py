@@ -0,0 +1,395 @@
+"""Unit tests for text-to-speech backends."""
+
+import stat
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Optional
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+import torch
+
+from epub2audio.backends import (
+    KokoroBackend,
+    OnnxBackend,
+    StubBackend,
+    _ignored_in_thread,
+    _load_model,
+    _parameters_on_meta,
+    export_onnx,
+    folded_model_path,
+    load_backend,
+    load_compiled_model,
+    load_quantized_model,
+)
+from epub2audio.config import KOKORO_PATHS, SAMPLE_RATE, STUB_PHONEME_SECONDS
+from epub2audio.registry import Registry
+from epub2audio.voices import Voice
+
+
+class FakePipeline:
+    """Pipeline whose model speaks a sample per phoneme."""
+
+    def __init__(self) -> None:
+        """Initialize the pipeline."""
+        self.model: Optional[Mock] = Mock()
+        self.voices: dict[str, torch.Tensor] = {}
+        self.inference_mode = False
+
+    def __call__(self, text: str, **kwargs: Any) -> list[Mock]:
+        """Run G2P, and the model unless it was taken away."""
+        return [
+            Mock(
+                phonemes=word.upper(),
+                audio=None if self.model is None else torch.ones(2),
+            )
+            for word in text.split()
+        ]
+
+    def generate_from_tokens(self, phonemes: str, voice: str, speed: float) -> Any:
+        """Run the model, in bf16 if autocast is on."""
+        self.inference_mode = torch.is_inference_mode_enabled()
+        dtype = torch.bfloat16 if torch.is_autocast_enabled("cpu") else torch.float32
+        yield Mock(audio=torch.full((len(phonemes),), speed, dtype=dtype))
+        yield Mock(audio=None)
+
+
+def test_kokoro_backend() -> None:
+    """Test G2P runs without the model, which speaks the phonemes."""
+    tts = FakePipeline()
+    backend = KokoroBackend(tts, "a")
+    assert backend.phonemize("hello world") == ["HELLO", "WORLD"]
+    assert tts.model is not None
+    assert [
+        (phonemes, len(audio))
+        for phonemes, audio in backend.generate("hi there", "af_heart", 1.0)
+    ] == [("HI", 2), ("THERE", 2)]
+    assert backend.synthesize("HELLO", "af_heart", 0.5).tolist() == [0.5] * 5
+    assert backend.phoneme_set == "a"
+
+
+def test_kokoro_backend_maps_voices(tmp_path: Path) -> None:
+    """Test voice packs are mapped from their files, and unknown ones left."""
+    pack = torch.randn(510, 1, 256)
+    path = tmp_path / "af_test.pt"
+    torch.save(pack, path)
+    registry = Registry(voices={"af_heart": path})
+    tts = FakePipeline()
+    backend = KokoroBackend(tts, "a")
+    with patch("epub2audio.backends.get_registry", return_value=registry):
+        backend.synthesize("HELLO", str(path), 1.0)
+        list(backend.generate("hi", "af_heart", 1.0))
+        list(backend.generate("hi", "am_adam", 1.0))
+    assert list(tts.voices) == [str(path), "af_heart"]
+    assert torch.equal(tts.voices[str(path)], pack)
+    assert torch.equal(tts.voices["af_heart"], pack)
+
+
+def test_stub_backend() -> None:
+    """Test the stub speaks for as long as the text, the same every time."""
+    backend = load_backend("stub", Voice.AF_HEART)
+    assert isinstance(backend, StubBackend)
+    text = "word " * 200
+    passes = backend.phonemize(text)
+    assert len(passes) == 2
+    assert " ".join(passes) == text.strip()
+
+    audio = backend.synthesize("a" * 100, "af_heart", 1.0)
+    assert len(audio) == int(100 * STUB_PHONEME_SECONDS * SAMPLE_RATE)
+    assert np.abs(audio).max() <= 0.1
+    assert np.array_equal(audio, backend.synthesize("b" * 100, "af_heart", 1.0))
+    assert len(backend.synthesize("a" * 100, "af_heart", 2.0)) == len(audio) // 2
+    assert not np.array_equal(audio, backend.synthesize("a" * 100, "am_adam", 1.0))
+
+    generated = list(backend.generate(text, "af_heart", 1.0))
+    assert [phonemes for phonemes, _ in generated] == passes
+
+
+def test_load_unknown_backend() -> None:
+    """Test unknown backends are refused."""
+    with pytest.raises(ValueError, match="Unknown backend 'espeak'"):
+        load_backend("espeak", Voice.AF_HEART)
+
+
+def test_onnx_backend() -> None:
+    """Test phonemes are tokenized and spoken with the style of their length."""
+    g2p = FakePipeline()
+    g2p.model = None
+    g2p.lang_code = "a"  # type: ignore[attr-defined]
+    g2p.load_voice = Mock(  # type: ignore[attr-defined]
+        return_value=torch.arange(510, dtype=torch.float32).reshape(510, 1, 1)
+    )
+    session = Mock()
+    session.get_inputs.return_value = [Mock(), Mock(), Mock()]
+    for graph_input, name in zip(session.get_inputs.return_value, ["ids", "s", "v"]):
+        graph_input.name = name
+    session.run.return_value = [np.ones((1, 24), dtype=np.float32)]
+    backend = OnnxBackend(session, g2p, {"h": 50, "i": 51})
+
+    assert backend.phoneme_set == "a"
+    assert backend.phonemize("hi there") == ["HI", "THERE"]
+    with patch("epub2audio.backends.get_registry", return_value=Registry()):
+        assert backend.synthesize("hi?", "af_heart", 1.5).shape == (24,)
+    inputs = session.run.call_args.args[1]
+    assert inputs["ids"].tolist() == [[0, 50, 51, 0]]
+    assert inputs["s"].tolist() == [[2.0]]
+    assert inputs["v"].tolist() == [1.5]
+
+    assert [phonemes for phonemes, _ in backend.generate("a b", "af_heart", 1.0)] == [
+        "A",
+        "B",
+    ]
+    # Voices are loaded once
+    g2p.load_voice.assert_called_once_with("af_heart")
+    assert len(backend.synthesize("", "af_heart", 1.0)) == 0
+
+
+def test_onnx_backend_not_exported(tmp_path: Path) -> None:
+    """Test the onnx backend asks for the model to be exported."""
+    pytest.importorskip("onnxruntime")
+    with (
+        patch.dict(KOKORO_PATHS, {"onnx_model": str(tmp_path / "missing.onnx")}),
+        pytest.raises(FileNotFoundError, match="epub2audio export-onnx"),
+    ):
+        load_backend("onnx", Voice.AF_HEART)
+
+
+class TinySTFTKModel(torch.nn.Module):
+    """Model speaking through the STFT of the Kokoro decoder."""
+
+    def __init__(self, disable_complex: bool = False, **kwargs: Any) -> None:
+        """Initialize the layers, with the STFT Kokoro builds."""
+        super().__init__()
+        from kokoro.custom_stft import CustomSTFT
+        from kokoro.istftnet import TorchSTFT
+
+        stft = CustomSTFT if disable_complex else TorchSTFT
+        self.stft = stft(filter_length=20, hop_length=5, win_length=20)
+        self.embedding = torch.nn.Embedding(100, 5)
+
+    def forward_with_tokens(
+        self, input_ids: torch.Tensor, ref_s: torch.Tensor, speed: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Run the model."""
+        frames = self.embedding(input_ids).reshape(1, -1) * ref_s.mean() / speed
+        magnitude, phase = self.stft.transform(frames)
+        audio = self.stft.inverse(magnitude, phase).squeeze()
+        return audio, torch.ones_like(input_ids).squeeze()
+
+
+def test_export_onnx(tmp_path: Path) -> None:
+    """Test the model is exported with an STFT ONNX can run."""
+    pytest.importorskip("onnx")
+    path = tmp_path / "kokoro.onnx"
+    with (
+        patch("epub2audio.backends._model_weight_path", return_value=tmp_path),
+        patch("epub2audio.backends._load_config", return_value={}),
+        patch("epub2audio.backends.KModel", TinySTFTKModel),
+    ):
+        export_onnx(path)
+    assert path.stat().st_size > 0
+
+
+class TinyModel(torch.nn.Module):
+    """Model with the kinds of layers Kokoro has."""
+
+    def __init__(self) -> None:
+        """Initialize the layers."""
+        super().__init__()
+        self.linear = torch.nn.utils.weight_norm(torch.nn.Linear(16, 16))
+        self.lstm = torch.nn.LSTM(16, 8, batch_first=True)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """Run the layers."""
+        self.lstm.flatten_parameters()
+        return self.lstm(self.linear(x))[0]
+
+
+class TinyKokoro(TinyModel):
+    """Model loading its weights like `KModel`."""
+
+    def __init__(self, repo_id: str, config: dict[str, Any], model: str) -> None:
+        """Initialize the layers, and load the weights of each."""
+        super().__init__()
+        for key, state in torch.load(model, weights_only=True).items():
+            getattr(self, key).load_state_dict(state)
+
+
+def test_mapped_model(tmp_path: Path) -> None:
+    """Test the weights are folded once, then mapped into the model."""
+    model = TinyModel()
+    weights = tmp_path / "kokoro.pth"
+    torch.save(
+        {"linear": model.linear.state_dict(), "lstm": model.lstm.state_dict()},
+        weights,
+    )
+    x = torch.randn(1, 4, 16)
+    with (
+        patch.dict(KOKORO_PATHS, {"model_weight": str(weights)}),
+        patch("epub2audio.backends.MODEL_CACHE_DIR", tmp_path / "models"),
+        patch("epub2audio.helpers.HASH_INDEX_PATH", tmp_path / "hashes"),
+        patch("epub2audio.backends._load_config", return_value={}),
+        patch("epub2audio.backends.KModel", TinyKokoro),
+    ):
+        mapped = _load_model()
+        path = folded_model_path()
+        assert path.parent == tmp_path / "models"
+        assert path.name.endswith(".folded.pt")
+        assert "linear.weight_g" not in mapped.state_dict()
+        assert not mapped.training
+        assert not any(param.is_meta for param in mapped.parameters())
+        with torch.no_grad():
+            assert torch.allclose(mapped(x), model(x))
+
+        folded = path.stat().st_mtime_ns
+        _load_model()
+        assert path.stat().st_mtime_ns == folded
+
+
+def test_parameters_on_meta_in_this_thread() -> None:
+    """Test only the modules built by the thread building a model are on meta."""
+    with _parameters_on_meta(), ThreadPoolExecutor(max_workers=1) as executor:
+        assert torch.nn.Linear(2, 2).weight.is_meta
+        other = executor.submit(torch.nn.Linear, 2, 2).result()
+        assert not other.weight.is_meta
+    assert not torch.nn.Linear(2, 2).weight.is_meta
+
+
+def test_logger_calls_ignored_in_this_thread() -> None:
+    """Test the logger set up by other threads while kokoro is imported."""
+    add = Mock(return_value=1)
+    ignoring = _ignored_in_thread(add)
+    assert ignoring(sys.stderr) is None
+    add.assert_not_called()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(ignoring, sys.stderr).result() == 1
+    add.assert_called_once_with(sys.stderr)
+
+
+def test_quantized_model(tmp_path: Path) -> None:
+    """Test the model is quantized once, then loaded from its cache."""
+    weights = tmp_path / "kokoro.pth"
+    weights.touch()
+    model = TinyModel()
+    x = torch.randn(1, 4, 16)
+    expected = model(x)
+    with (
+        patch.dict(KOKORO_PATHS, {"model_weight": str(weights)}),
+        patch("epub2audio.backends.PRIVATE_MODEL_DIR", tmp_path / "models"),
+        patch("epub2audio.helpers.HASH_INDEX_PATH", tmp_path / "hashes"),
+        patch("epub2audio.backends._load_model", return_value=model) as load,
+    ):
+        quantized = load_quantized_model("int8")
+        [path] = (tmp_path / "models").iterdir()
+        assert f".int8-torch-{torch.__version__}-kokoro-" in path.name
+        assert stat.S_IMODE(path.parent.stat().st_mode) == 0o700
+        assert type(quantized.linear) is not torch.nn.Linear  # from torch.ao
+        assert "linear.weight_g" not in quantized.state_dict()
+        assert torch.allclose(quantized(x), expected, atol=0.05)
+
+        cached = load_quantized_model("int8")
+        load.assert_called_once()
+        assert torch.equal(cached(x), quantized(x))
+
+        with pytest.raises(ValueError, match="Unknown quantization 'int4'"):
+            load_quantized_model("int4")
+
+        # A cache others can write to is neither trusted nor written
+        path.parent.chmod(0o777)
+        assert type(load_quantized_model("int8").linear) is not torch.nn.Linear
+        assert load.call_count == 2
+        assert list(path.parent.iterdir()) == [path]
+
+
+def test_quantized_backend() -> None:
+    """Test quantized audio is told apart, and only Kokoro is quantized."""
+    backend = KokoroBackend(Mock(), "a", quantize="int8")
+    assert backend.version == f"{KokoroBackend.version} int8"
+    assert KokoroBackend(Mock(), "a").version == KokoroBackend.version
+    with pytest.raises(ValueError, match="stub backend cannot be quantized"):
+        load_backend("stub", Voice.AF_HEART, quantize="int8")
+
+
+def test_bf16_backend() -> None:
+    """Test the model runs in bf16 where supported, returning fp32 audio."""
+    tts = FakePipeline()
+    with patch("epub2audio.backends.bf16_supported", return_value=True):
+        backend = KokoroBackend(tts, "a", precision="bf16")
+    assert backend.version == f"{KokoroBackend.version} bf16"
+    audio = backend.synthesize("HELLO", "af_heart", 0.5)
+    assert audio.dtype == np.float32
+    assert audio.tolist() == [0.5] * 5
+    assert tts.inference_mode
+    # Nothing but the model runs in inference mode
+    assert not torch.is_inference_mode_enabled()
+    assert not torch.is_autocast_enabled("cpu")
+
+    with patch("epub2audio.backends.bf16_supported", return_value=False):
+        fallback = KokoroBackend(tts, "a", precision="bf16")
+    assert (fallback.precision, fallback.version) == ("fp32", KokoroBackend.version)
+
+    with pytest.raises(ValueError, match="int8 model cannot run in bf16"):
+        KokoroBackend.load(Voice.AF_HEART, quantize="int8", precision="bf16")
+    with pytest.raises(ValueError, match="onnx backend cannot run in bf16"):
+        load_backend("onnx", Voice.AF_HEART, precision="bf16")
+    with pytest.raises(ValueError, match="compiled model cannot run in bf16"):
+        KokoroBackend.load(Voice.AF_HEART, compiled=True, precision="bf16")
+
+
+class TinyKModel(torch.nn.Module):
+    """Model speaking a sample per token, scaled by the style and speed."""
+
+    def __init__(self) -> None:
+        """Initialize the layers."""
+        super().__init__()
+        self.embedding = torch.nn.Embedding(100, 1)
+
+    def forward_with_tokens(
+        self, input_ids: torch.Tensor, ref_s: torch.Tensor, speed: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Run the model."""
+        audio = self.embedding(input_ids).squeeze() * ref_s.sum() / speed
+        return audio, torch.ones_like(input_ids).squeeze()
+
+
+def test_compiled_model(tmp_path: Path) -> None:
+    """Test the model is traced once, then loaded from its cache."""
+    weights = tmp_path / "kokoro.pth"
+    weights.write_bytes(b"weights")
+    model = TinyKModel()
+    config = {"vocab": {"a": 1, "b": 2}, "plbert": {"max_position_embeddings": 6}}
+    style = torch.ones(1, 256)
+    with (
+        patch.dict(KOKORO_PATHS, {"model_weight": str(weights)}),
+        patch("epub2audio.backends.COMPILED_MODEL_DIR", tmp_path / "compiled"),
+        patch("epub2audio.helpers.HASH_INDEX_PATH", tmp_path / "hashes"),
+        patch("epub2audio.backends._load_config", return_value=config),
+        patch("epub2audio.backends._load_model", return_value=model) as load,
+    ):
+        traced = load_compiled_model()
+        [path] = (tmp_path / "compiled").iterdir()
+        assert f"-fp32-torch-{torch.__version__}.pt" in path.name
+
+        # Tokens unknown to the model are dropped, like Kokoro does
+        expected, _ = model.forward_with_tokens(
+            torch.tensor([[0, 1, 2, 1, 0]]), style, torch.tensor([2.0])
+        )
+        assert torch.equal(traced("ab?a", style, 2.0), expected)
+        output = traced("ab", style, return_output=True)
+        assert output.audio.shape == (4,)
+        assert output.pred_dur.tolist() == [1, 1, 1, 1]
+        with pytest.raises(ValueError, match="5 tokens do not fit"):
+            traced("aaaaa", style)
+
+        cached = load_compiled_model()
+        load.assert_called_once()
+        assert torch.equal(cached("ab?a", style, 2.0), expected)
+        assert cached.device == torch.device("cpu")
+
+        # Other weights are traced again
+        weights.write_bytes(b"other weights")
+        load_compiled_model()
+        assert load.call_count == 2
+        assert len(list((tmp_path / "compiled").iterdir())) == 2
@@ -0,0 +1,281 @@
+"""Unit tests for the persistent caches."""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from soundfile import SoundFile
+
+from epub2audio.cache import (
+    CacheStats,
+    PackSegmentStore,
+    PhonemeCache,
+    SegmentStore,
+    _filesystem_type,
+    normalize_text,
+    segment_key,
+    sqlite_journal_mode,
+)
+from epub2audio.config import SAMPLE_RATE
+
+
+def test_normalize_text() -> None:
+    """Test whitespace is collapsed."""
+    assert normalize_text("  Hello,\n\tworld.  ") == "Hello, world."
+
+
+def test_phoneme_cache_round_trip(tmp_path: Path) -> None:
+    """Test phonemes are cached per language and normalized text."""
+    path = tmp_path / "cache" / "phonemes.sqlite3"
+    cache = PhonemeCache(path)
+    assert cache.get("a", "Hello world.") is None
+
+    cache.put("a", "Hello world.", ["həlˈO", "wˈɜɹld."])
+    assert cache.get("a", "Hello   world.\n") == ["həlˈO", "wˈɜɹld."]
+    assert cache.get("b", "Hello world.") is None
+    cache.close()
+
+    # The cache persists across instances
+    assert PhonemeCache(path).get("a", "Hello world.") == ["həlˈO", "wˈɜɹld."]
+
+
+def test_phoneme_cache_empty_chunk(tmp_path: Path) -> None:
+    """Test a chunk without phonemes is cached too."""
+    cache = PhonemeCache(tmp_path / "phonemes.sqlite3")
+    cache.put("a", "...", [])
+    assert cache.get("a", "...") == []
+
+
+def test_phoneme_cache_unusable(tmp_path: Path) -> None:
+    """Test a cache that cannot be opened behaves as if empty."""
+    path = tmp_path / "phonemes.sqlite3"
+    path.write_text("not a database")
+    cache = PhonemeCache(path)
+    cache.put("a", "Hello.", ["həlˈO."])
+    assert cache.get("a", "Hello.") is None
+
+
+def test_segment_key() -> None:
+    """Test segments are addressed by model, voice, rate and normalized text."""
+    key = segment_key("kokoro 0.9.4", "af_heart", 1.0, "Chapter 1")
+    assert key == segment_key("kokoro 0.9.4", "af_heart", 1, " Chapter\n1 ")
+    assert key != segment_key("kokoro 1.0", "af_heart", 1.0, "Chapter 1")
+    assert key != segment_key("kokoro 0.9.4", "am_adam", 1.0, "Chapter 1")
+    assert key != segment_key("kokoro 0.9.4", "af_heart", 1.5, "Chapter 1")
+    assert key != segment_key("kokoro 0.9.4", "af_heart", 1.0, "Chapter 2")
+
+
+def test_segment_store_path(tmp_path: Path) -> None:
+    """Test segments are spread over subdirectories of the store."""
+    key = segment_key("kokoro", "af_heart", 1.0, "Chapter 1")
+    path = SegmentStore(tmp_path).path(key)
+    assert path == tmp_path / key[:2] / f"{key}.flac"
+    assert path.parent.is_dir()
+
+
+def test_cache_stats() -> None:
+    """Test hit rates are computed over every lookup."""
+    stats = CacheStats()
+    assert stats.hit_rate == 0.0
+    stats.record(True)
+    stats.update(CacheStats(hits=2, misses=1))
+    assert stats == CacheStats(hits=3, misses=1)
+    assert stats.hit_rate == 0.75
+    assert str(stats) == "3/4 hits (75.0%)"
+
+
+def _write_segment(path: Path, frames: int) -> str:
+    """Write a segment of silence to synthesize into a store."""
+    with SoundFile(path, "w", SAMPLE_RATE, 1, format="FLAC", subtype="PCM_16") as f:
+        f.write(np.zeros(frames, dtype=np.int16))
+    return str(path)
+
+
+def test_segment_store_put(tmp_path: Path) -> None:
+    """Test segments are moved into the store and found by key."""
+    store = SegmentStore(tmp_path)
+    assert store.find("abc") is None
+    name = store.put("abc", _write_segment(tmp_path / "scratch.flac", 100))
+    assert store.find("abc") == name
+    assert store.open(name).frames == 100
+    assert not (tmp_path / "scratch.flac").exists()
+
+
+def test_pack_segment_store(tmp_path: Path) -> None:
+    """Test segments are appended to packs and read back through the index."""
+    store = PackSegmentStore(tmp_path, max_pack_bytes=1)
+    assert store.find("abc") is None
+    for key, frames in (("abc", 100), ("def", 200)):
+        assert store.put(key, _write_segment(Path(store.scratch_path(key)), frames))
+    assert store.find("abc") == "abc"
+    assert store.open("abc").frames == 100
+    assert store.open("def").frames == 200
+    # Every segment went to a new pack, as the packs were full
+    assert len(list(tmp_path.glob("*.pack"))) == 2
+    assert not list((tmp_path / "scratch").iterdir())
+    store.close()
+
+    # Another process finds the segments through the index
+    other = PackSegmentStore(tmp_path)
+    other.put("ghi", _write_segment(Path(other.scratch_path("ghi")), 300))
+    assert other.open("def").frames == 200
+    assert store.open("ghi").frames == 300
+    with pytest.raises(KeyError):
+        other.open("xyz")
+    other.close()
+
+
+def test_sqlite_journal_mode(tmp_path: Path) -> None:
+    """Test databases on network filesystems are journaled without WAL."""
+    mounts = tmp_path / "mounts"
+    mounts.write_text(
+        "/dev/sda1 / ext4 rw 0 0\n"
+        f"server:/cache {tmp_path / 'shared'} nfs4 rw 0 0\n"
+        f"tmpfs {tmp_path / 'shared'}/my\\040local tmpfs rw 0 0\n"
+    )
+    shared = tmp_path / "shared" / "index.sqlite3"
+    assert _filesystem_type(shared, mounts) == "nfs4"
+    assert _filesystem_type(tmp_path / "shared" / "my local" / "db", mounts) == "tmpfs"
+    assert _filesystem_type(tmp_path / "index.sqlite3", mounts) == "ext4"
+    assert _filesystem_type(shared, tmp_path / "missing") == ""
+
+    with patch("epub2audio.cache._filesystem_type", return_value="nfs4"):
+        assert sqlite_journal_mode(shared) == "DELETE"
+        with patch("epub2audio.cache.SQLITE_JOURNAL_MODE", "TRUNCATE"):
+            assert sqlite_journal_mode(shared) == "TRUNCATE"
+
+        store = PackSegmentStore(tmp_path / "packs")
+        store.put("abc", _write_segment(Path(store.scratch_path("abc")), 100))
+        [[mode]] = store._connect().execute("PRAGMA journal_mode").fetchall()
+        assert mode == "delete"
+        store.close()
+
+        cache = PhonemeCache(tmp_path / "phonemes.sqlite3")
+        cache.put("a", "Hello world.", ["həlˈO", "wˈɜɹld."])
+        [[mode]] = cache._connect().execute("PRAGMA journal_mode").fetchall()
+        assert mode == "delete"
+        cache.close()
+
+
+def test_pack_segment_store_remaps_grown_pack(tmp_path: Path) -> None:
+    """Test segments appended after a pack was mapped are read."""
+    writer = PackSegmentStore(tmp_path)
+    reader = PackSegmentStore(tmp_path)
+    writer.put("abc", _write_segment(Path(writer.scratch_path("abc")), 100))
+    first = reader.open("abc")
+    assert first.frames == 100
+    writer.put("def", _write_segment(Path(writer.scratch_path("def")), 200))
+    assert reader.open("def").frames == 200
+    # A segment opened before the pack was mapped again is still read
+    assert len(first.read()) == 100
+    writer.close()
+    reader.close()
+
+
+def test_segment_store_prune_least_recently_used(tmp_path: Path) -> None:
+    """Test the least recently used segments are evicted first."""
+    store = SegmentStore(tmp_path)
+    for i, key in enumerate(["aa1", "bb2", "cc3"]):
+        path = store.put(key, _write_segment(tmp_path / f"{key}.flac", 1000))
+        os.utime(path, (1000 + i, 1000 + i))
+    size = store.usage().size
+    assert store.usage().segments == 3
+
+    # Using the oldest segment makes it the most recently used
+    assert store.find("aa1") is not None
+    evicted = store.prune(size * 2 // 3)
+    assert evicted.segments == 1
+    assert store.find("bb2") is None
+    assert store.find("aa1") is not None
+    assert store.find("cc3") is not None
+    assert store.usage().segments == 2
+
+
+def test_segment_store_verify(tmp_path: Path) -> None:
+    """Test unreadable segments and stale scratch files are found and removed."""
+    store = SegmentStore(tmp_path)
+    store.put("aa1", _write_segment(tmp_path / "aa1.flac", 100))
+    store.path("bb2").write_bytes(b"not audio")
+    stale = Path(store.scratch_path("cc3"))
+    stale.write_bytes(b"")
+    os.utime(stale, (0, 0))
+    Path(store.scratch_path("dd4")).write_bytes(b"")
+
+    assert store.verify() == [str(store.path("bb2")), str(stale)]
+    assert store.verify(fix=True)
+    assert store.verify() == []
+    assert store.find("aa1") is not None
+
+
+def test_pack_segment_store_prune(tmp_path: Path) -> None:
+    """Test pruning drops segments from the index and compacts idle packs."""
+    store = PackSegmentStore(tmp_path)
+    for key in ["aa1", "bb2", "cc3"]:
+        store.put(key, _write_segment(Path(store.scratch_path(key)), 1000))
+    store.close()
+    (pack,) = tmp_path.glob("*.pack")
+    size = store.usage().size
+    assert store.usage().disk_size == size
+
+    store.find("aa1")
+    # A recently written pack may still be appended to, so it is kept whole
+    evicted = store.prune(size * 2 // 3)
+    assert evicted.segments == 1
+    assert store.find("bb2") is None
+    assert store.usage().disk_size == size
+
+    os.utime(pack, (0, 0))
+    store.prune(size)
+    assert not pack.exists()
+    assert store.usage().disk_size == store.usage().size < size
+    assert store.open("aa1").frames == 1000
+    assert store.open("cc3").frames == 1000
+
+    store.prune(0)
+    assert store.usage().segments == 0
+    store.close()
+
+
+def test_pack_segment_store_compaction_waits_for_readers(tmp_path: Path) -> None:
+    """Test a pack is not rewritten while a segment is being looked up."""
+    store = PackSegmentStore(tmp_path)
+    for key in ["aa1", "bb2"]:
+        store.put(key, _write_segment(Path(store.scratch_path(key)), 1000))
+    store.close()
+    (pack,) = tmp_path.glob("*.pack")
+    os.utime(pack, (0, 0))
+
+    other = PackSegmentStore(tmp_path)
+    store.find("bb2")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with store._store_lock():
+            pruned = executor.submit(other.prune, store.usage().size // 2)
+            time.sleep(0.2)
+            assert pack.exists()
+        assert pruned.result().segments == 1
+    assert not pack.exists()
+    assert store.open("bb2").frames == 1000
+    store.close()
+    other.close()
+
+
+def test_pack_segment_store_verify(tmp_path: Path) -> None:
+    """Test segments that cannot be read from their pack are found."""
+    store = PackSegmentStore(tmp_path)
+    for key in ["aa1", "bb2"]:
+        store.put(key, _write_segment(Path(store.scratch_path(key)), 100))
+    store.close()
+    (pack,) = tmp_path.glob("*.pack")
+    with open(pack, "r+b") as f:
+        f.truncate(pack.stat().st_size - 10)
+
+    assert store.verify() == ["bb2"]
+    store.verify(fix=True)
+    assert store.verify() == []
+    assert store.find("bb2") is None
+    assert store.open("aa1").frames == 100
+    store.close()
@@ -1,16 +1,24 @@
 """Unit tests for command-line interface."""
 
+import json
 import os
+import subprocess
+import sys
 from collections.abc import Generator
 from pathlib import Path
 from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest
 from click.testing import CliRunner
+from soundfile import SoundFile
 
-from epub2audio.config import ErrorCodes
+from epub2audio.audio_converter import AudioConverter
+from epub2audio.backends import StubBackend
+from epub2audio.cache import SegmentStore, open_segment_store
+from epub2audio.config import CACHE_MAX_SIZE, SAMPLE_RATE, ErrorCodes
 from epub2audio.epub2audio import main, process_epub
-from epub2audio.helpers import ConversionError
+from epub2audio.helpers import ConversionError, parse_size
 from epub2audio.voices import Voice
 
 
@@ -40,7 +48,26 @@ def test_cli_basic(
 
     assert result.exit_code == 0
     mock_process_epub.assert_called_once_with(
-        input_file, None, 1.0, Voice.AF_HEART, False, True, True, -1, "ogg"
+        input_file,
+        None,
+        1.0,
+        Voice.AF_HEART,
+        False,
+        True,
+        True,
+        -1,
+        "ogg",
+        1,
+        False,
+        1,
+        "files",
+        False,
+        None,
+        backend="kokoro",
+        cache_max_size=parse_size(CACHE_MAX_SIZE),
+        quantize=None,
+        precision="fp32",
+        compiled=False,
     )
 
 
@@ -71,6 +98,22 @@ def test_cli_with_options(
     assert mock_process_epub.called
 
 
+def test_cli_imports_lazily() -> None:
+    """Test the CLI starts without importing what only conversion needs."""
+    heavy = ["torch", "kokoro", "numpy", "soundfile", "bs4", "ebooklib", "PIL"]
+    imported = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, epub2audio.epub2audio; print(*sys.modules)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    assert [name for name in heavy if name in imported] == []
+
+
 def test_cli_missing_input(cli_runner: CliRunner) -> None:
     """Test CLI fails gracefully when input file is not provided."""
     result = cli_runner.invoke(main, [])
@@ -166,3 +209,237 @@ def test_process_epub_integration(tmp_path: Path) -> None:
         mock_handler.assert_called_once()
         assert mock_handler.return_value.add_chapter_marker.called
         assert mock_handler.return_value.finalize_audio_file.called
+
+
+@pytest.fixture
+def cache_dirs(tmp_path: Path) -> Generator[Path, None, None]:
+    """Point the segment stores at a temporary directory."""
+    with (
+        patch("epub2audio.cache.SEGMENT_CACHE_DIR", tmp_path / "segments"),
+        patch("epub2audio.cache.PACK_CACHE_DIR", tmp_path / "packs"),
+        patch("epub2audio.epub2audio.PHONEME_CACHE_PATH", tmp_path / "phonemes"),
+        patch("epub2audio.audio_converter.PHONEME_CACHE_PATH", tmp_path / "phonemes"),
+        patch("epub2audio.helpers.HASH_INDEX_PATH", tmp_path / "hashes"),
+        patch("epub2audio.helpers.CACHE_DIR", tmp_path / "books"),
+    ):
+        yield tmp_path
+
+
+def _fill_store(store: SegmentStore, segments: int) -> None:
+    """Store segments of one second of silence."""
+    for i in range(segments):
+        path = Path(store.scratch_path(f"{i:02x}"))
+        with SoundFile(path, "w", SAMPLE_RATE, 1, format="FLAC") as f:
+            f.write(np.zeros(SAMPLE_RATE, dtype=np.int16))
+        store.put(f"{i:02x}", str(path))
+    store.close()
+
+
+def test_cli_cache_stats(cli_runner: CliRunner, cache_dirs: Path) -> None:
+    """Test the cache stats command reports every backend."""
+    _fill_store(open_segment_store("pack"), 2)
+
+    result = cli_runner.invoke(main, ["cache", "stats"])
+
+    assert result.exit_code == 0
+    assert "files: empty" in result.output
+    assert "pack: 2 segments" in result.output
+
+
+def test_cli_cache_prune(cli_runner: CliRunner, cache_dirs: Path) -> None:
+    """Test the cache prune command evicts segments beyond the budget."""
+    _fill_store(open_segment_store("files"), 3)
+
+    result = cli_runner.invoke(main, ["cache", "prune", "--max-size", "0"])
+
+    assert result.exit_code == 0
+    assert "files: evicted 3 segments" in result.output
+    assert open_segment_store("files").usage().segments == 0
+
+    result = cli_runner.invoke(main, ["cache", "prune", "--max-size", "lots"])
+    assert result.exit_code != 0
+    assert "Invalid size" in result.output
+
+
+def test_cli_cache_verify(cli_runner: CliRunner, cache_dirs: Path) -> None:
+    """Test the cache verify command fails on unreadable segments."""
+    store = open_segment_store("files")
+    _fill_store(store, 1)
+    store.path("ff").write_bytes(b"not audio")
+
+    result = cli_runner.invoke(main, ["cache", "verify"])
+    assert result.exit_code == ErrorCodes.FILESYSTEM_ERROR
+    assert "files: 1 bad segments" in result.output
+
+    result = cli_runner.invoke(main, ["cache", "verify", "--fix"])
+    assert result.exit_code == 0
+    assert cli_runner.invoke(main, ["cache", "verify"]).exit_code == 0
+
+
+def test_cli_shard_option(
+    cli_runner: CliRunner, mock_process_epub: Mock, tmp_path: Path
+) -> None:
+    """Test shards are given as an index starting at 1 and a count."""
+    input_file = tmp_path / "test.epub"
+    input_file.touch()
+
+    result = cli_runner.invoke(main, [str(input_file), "--shard", "2/3"])
+    assert result.exit_code == 0
+    assert mock_process_epub.call_args.args[-1] == (2, 3)
+
+    for shard in ["0/3", "4/3", "2"]:
+        result = cli_runner.invoke(main, [str(input_file), "--shard", shard])
+        assert result.exit_code != 0
+        assert "Expected a shard such as 1/3" in result.output
+
+
+def test_cli_cache_max_size(
+    cli_runner: CliRunner, mock_process_epub: Mock, tmp_path: Path
+) -> None:
+    """Test the cache budget is checked before converting anything."""
+    input_file = tmp_path / "test.epub"
+    input_file.touch()
+
+    result = cli_runner.invoke(main, [str(input_file), "--cache-max-size", "500M"])
+    assert result.exit_code == 0
+    assert mock_process_epub.call_args.kwargs["cache_max_size"] == 500 * 1024**2
+
+    mock_process_epub.reset_mock()
+    result = cli_runner.invoke(main, [str(input_file), "--cache-max-size", "lots"])
+    assert result.exit_code != 0
+    assert "Invalid size" in result.output
+    mock_process_epub.assert_not_called()
+
+
+def test_cli_shard_and_merge(cli_runner: CliRunner, cache_dirs: Path) -> None:
+    """Test shards synthesized separately are merged into one audiobook."""
+    epub = Path(__file__).parent / "data" / "sample.epub"
+    output = cache_dirs / "book.flac"
+    options = ["-o", str(output), "-f", "flac", "--backend", "stub"]
+    with patch(
+        "epub2audio.backends.StubBackend.synthesize",
+        side_effect=StubBackend.synthesize,
+        autospec=True,
+    ) as synthesize:
+        result = cli_runner.invoke(
+            main, ["convert", str(epub), "--shard", "1/2", "--backend", "stub"]
+        )
+        assert result.exit_code == 0, result.output
+        first_shard = synthesize.call_count
+        assert first_shard > 0
+        assert not output.exists()
+        assert not list(Path.cwd().glob("*.manifest.jsonl"))
+
+        # The other shard is missing
+        result = cli_runner.invoke(main, ["merge", str(epub), *options])
+        assert result.exit_code == ErrorCodes.MISSING_SEGMENTS
+        assert not output.exists()
+
+        result = cli_runner.invoke(
+            main, ["convert", str(epub), "--shard", "2/2", "--backend", "stub"]
+        )
+        assert result.exit_code == 0, result.output
+        assert synthesize.call_count > first_shard
+        synthesized = synthesize.call_count
+
+        result = cli_runner.invoke(main, ["merge", str(epub), *options])
+        assert result.exit_code == 0, result.output
+        # Merging synthesizes nothing itself
+        assert synthesize.call_count == synthesized
+        assert SoundFile(output).frames > 0
+
+
+@pytest.mark.parametrize("cache_backend", ["files", "pack"])
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_cli_stub_backend(
+    cli_runner: CliRunner, cache_dirs: Path, cache_backend: str, pipeline: bool
+) -> None:
+    """Test a book is converted end to end without a model by the stub."""
+    epub = Path(__file__).parent / "data" / "sample.epub"
+    output = cache_dirs / "book.flac"
+    options = ["-o", str(output), "-f", "flac", "-m", "2", "--backend", "stub"]
+    options += ["--cache-backend", cache_backend]
+    if pipeline:
+        options.append("--pipeline")
+    result = cli_runner.invoke(main, ["convert", str(epub), *options, "--cache"])
+    assert result.exit_code == 0, result.output
+    frames = SoundFile(output).frames
+    assert frames > 0
+
+    # The same audio again, from the cache
+    output.unlink()
+    with patch("epub2audio.backends.StubBackend.synthesize") as synthesize:
+        result = cli_runner.invoke(main, ["convert", str(epub), *options, "--cache"])
+    assert result.exit_code == 0, result.output
+    synthesize.assert_not_called()
+    assert SoundFile(output).frames == frames
+
+
+@pytest.mark.parametrize("evicted", [False, True])
+def test_cli_resume(cli_runner: CliRunner, cache_dirs: Path, evicted: bool) -> None:
+    """Test a resumed conversion reuses the segments without opening them twice."""
+    epub = Path(__file__).parent / "data" / "sample.epub"
+    output = cache_dirs / "book.flac"
+    options = ["-o", str(output), "-f", "flac", "--backend", "stub", "--resume"]
+    options += ["--cache"]
+    with patch(
+        "epub2audio.audio_handler.AudioHandler.finish_audio_file",
+        side_effect=OSError("disk full"),
+    ):
+        result = cli_runner.invoke(main, ["convert", str(epub), *options])
+    assert result.exit_code != 0
+    manifest = output.with_suffix(".manifest.jsonl")
+    entries = [json.loads(line) for line in manifest.read_text().splitlines()[1:]]
+    segments = len(entries)
+    # Long chapters are recorded chunk by chunk
+    chapters = len({entry["chapter"] for entry in entries})
+    assert segments > 2 * chapters
+    if evicted:
+        next((cache_dirs / "segments").glob("*/*.flac")).unlink()
+
+    with (
+        patch(
+            "epub2audio.backends.StubBackend.synthesize",
+            side_effect=StubBackend.synthesize,
+            autospec=True,
+        ) as synthesize,
+        patch(
+            "epub2audio.audio_converter.AudioConverter.open_segment",
+            side_effect=AudioConverter.open_segment,
+            autospec=True,
+        ) as open_segment,
+        patch("epub2audio.audio_handler.AudioHandler.add_chapter_marker") as marker,
+    ):
+        result = cli_runner.invoke(main, ["convert", str(epub), *options])
+    assert result.exit_code == 0, result.output
+    # An evicted segment is synthesized again, the others are reused
+    assert synthesize.called == evicted
+    # Segments are only opened to copy their audio, the markers come from the
+    # frames recorded in the manifest
+    assert open_segment.call_count == segments + evicted
+    assert marker.call_count == chapters
+    assert marker.call_args.args[2] == pytest.approx(
+        SoundFile(output).frames / SAMPLE_RATE
+    )
+    assert not manifest.exists()
+
+
+def test_cli_library(cli_runner: CliRunner, tmp_path: Path) -> None:
+    """Test the library command converts every book and reports failures."""
+    books = [
+        {"epub": "a.epub", "status": "done", "output": "a.ogg"},
+        {"epub": "b.epub", "status": "skipped", "output": "b.ogg"},
+    ]
+    with patch("epub2audio.library.convert_library", return_value=books) as convert:
+        result = cli_runner.invoke(
+            main, ["library", str(tmp_path), "-o", str(tmp_path / "out"), "-j", "2"]
+        )
+        assert result.exit_code == 0
+        assert "skipped: b.epub -> b.ogg" in result.output
+        assert convert.call_args.args == ((tmp_path,), tmp_path / "out")
+        assert convert.call_args.kwargs["jobs"] == 2
+
+        convert.return_value = [{"epub": "c.epub", "status": "failed", "error": "bad"}]
+        result = cli_runner.invoke(main, ["library", str(tmp_path)])
+        assert result.exit_code == ErrorCodes.UNKNOWN_ERROR
+        assert "failed: c.epub: bad" in result.output
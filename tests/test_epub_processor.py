@@ -7,7 +7,12 @@ import pytest
 from ebooklib import epub  # type: ignore
 
 from epub2audio.config import ErrorCodes
-from epub2audio.epub_processor import BookMetadata, Chapter, EpubProcessor
+from epub2audio.epub_processor import (
+    BookMetadata,
+    Chapter,
+    EpubProcessor,
+    split_text_chunks,
+)
 from epub2audio.helpers import ConversionError
 
 test_image_content = """
@@ -236,6 +241,18 @@ def test_single_page_epub_extraction(single_page_epub: str) -> None:
     _test_extract_chapters(chapters, "Single Page Test Book")
 
 
+def test_lazy_chapter_extraction(sample_epub: str) -> None:
+    """Test lazily streamed chapters match the eagerly extracted ones."""
+    processor = EpubProcessor(sample_epub, lazy=True)
+    assert processor.metadata.title == "Test Book"
+    assert processor.chapters == []
+
+    chapters = list(processor.iter_chapters())
+    assert chapters == sorted(chapters)
+    assert chapters == EpubProcessor(sample_epub).chapters
+    _test_extract_chapters(chapters, "Test Book")
+
+
 def test_clean_text() -> None:
     """Test HTML cleaning."""
     html = """
@@ -281,6 +298,43 @@ def test_clean_text() -> None:
                 assert "Text with formatting and ." in cleaned
                 assert len(processor.warnings) == 1  # Warning for img tag
 
+                # Paragraphs are kept on their own lines
+                html = (
+                    "<div><h1>Title</h1><p>One\n  two.</p><p>Three<br/>four</p></div>"
+                )
+                assert processor._clean_text(html) == "Title\nOne two.\nThree\nfour"
+
+
+def test_split_text_chunks() -> None:
+    """Test text is split on paragraphs, then sentences, then words."""
+    # Short paragraphs are kept whole
+    assert list(split_text_chunks("First paragraph.\n\nSecond one.\n")) == [
+        "First paragraph.",
+        "Second one.",
+    ]
+
+    # Long paragraphs are split between sentences
+    paragraph = "One sentence here. Another one here! A third? \u201cQuoted.\u201d Last"
+    chunks = list(split_text_chunks(paragraph, max_chars=30))
+    assert chunks == [
+        "One sentence here.",
+        "Another one here! A third?",
+        "\u201cQuoted.\u201d Last",
+    ]
+    assert " ".join(chunks) == paragraph
+
+    # Long sentences are split between words
+    sentence = " ".join(["word"] * 20)
+    chunks = list(split_text_chunks(sentence, max_chars=24))
+    assert all(len(chunk) <= 24 for chunk in chunks)
+    assert " ".join(chunks) == sentence
+
+
+def test_chapter_iter_chunks() -> None:
+    """Test chapters are chunked by paragraph."""
+    chapter = Chapter(title="Test", content="Para one.\nPara two.", order=0, id="t")
+    assert list(chapter.iter_chunks()) == ["Para one.", "Para two."]
+
 
 def test_is_chapter() -> None:
     """Test chapter identification."""
@@ -1,5 +1,8 @@
 """Unit tests for helper functions."""
 
+import os
+from collections.abc import Generator
+from hashlib import sha256
 from pathlib import Path
 from typing import Any
 from unittest.mock import patch
@@ -8,13 +11,17 @@ import pytest
 
 from epub2audio.config import ErrorCodes
 from epub2audio.helpers import (
+    CacheDirManager,
     ConversionError,
     ConversionWarning,
     check_disk_space,
     clean_filename,
     ensure_dir_exists,
+    file_sha256,
+    format_size,
     format_time,
     logger,
+    parse_size,
 )
 
 
@@ -120,6 +127,73 @@ def test_format_time() -> None:
     assert format_time(12.3456789) == "00:00:12.346"
 
 
+def test_parse_size() -> None:
+    """Test size parsing."""
+    assert parse_size("1024") == 1024
+    assert parse_size("500M") == 500 * 1024**2
+    assert parse_size("1.5GiB") == int(1.5 * 1024**3)
+    assert parse_size(" 10g ") == 10 * 1024**3
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_format_size() -> None:
+    """Test size formatting."""
+    assert format_size(0) == "0 B"
+    assert format_size(1536) == "1.5 KiB"
+    assert format_size(10 * 1024**3) == "10.0 GiB"
+    assert format_size(3 * 1024**4) == "3.0 TiB"
+
+
+@pytest.fixture
+def hash_index(tmp_path: Path) -> Generator[Path, None, None]:
+    """Use a fresh file hash index, and forget digests of this process."""
+    index_path = tmp_path / "file_hashes.sqlite3"
+    with (
+        patch("epub2audio.helpers.HASH_INDEX_PATH", index_path),
+        patch("epub2audio.helpers.HASH_BLOCK_BYTES", 4),
+        patch.dict("epub2audio.helpers._file_hashes", clear=True),
+    ):
+        yield index_path
+
+
+def test_file_sha256(hash_index: Path, tmp_path: Path) -> None:
+    """Test files are hashed in blocks and hashed again once changed."""
+    path = tmp_path / "test.epub"
+    path.write_bytes(b"0123456789")
+    assert file_sha256(path) == sha256(b"0123456789").hexdigest()
+
+    path.write_bytes(b"9876543210")
+    os.utime(path, ns=(0, 0))
+    assert file_sha256(path) == sha256(b"9876543210").hexdigest()
+
+
+def test_file_sha256_memoized(hash_index: Path, tmp_path: Path) -> None:
+    """Test a file is only read once across processes."""
+    path = tmp_path / "test.epub"
+    path.write_bytes(b"0123456789")
+    digest = file_sha256(path)
+    assert hash_index.exists()
+
+    with patch("builtins.open", side_effect=AssertionError("file read again")):
+        assert file_sha256(path) == digest
+        # A new process finds the digest in the persistent index
+        with patch.dict("epub2audio.helpers._file_hashes", clear=True):
+            assert file_sha256(path) == digest
+
+
+def test_cache_dir_cleanup_all(hash_index: Path, tmp_path: Path) -> None:
+    """Test cleaning up removes cache directories along with their files."""
+    epub_path = tmp_path / "test.epub"
+    epub_path.write_text("book")
+    with patch("epub2audio.helpers.CACHE_DIR", tmp_path / "cache"):
+        manager = CacheDirManager(epub_path)
+        Path(manager.get_file("Chapter 1")).touch()
+        cache_dir = Path(manager.cache_dir)
+        CacheDirManager.cleanup_all()
+    assert not cache_dir.exists()
+
+
 def test_logger(caplog: Any) -> None:
     """Test logger functionality."""
     test_message = "Test log message"
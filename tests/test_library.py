@@ -0,0 +1,177 @@
+"""Unit tests for library conversion."""
+
+import shutil
+import zipfile
+from collections.abc import Generator
+from pathlib import Path
+from typing import Any
+from unittest.mock import Mock, patch
+
+import pytest
+
+from epub2audio.config import ErrorCodes
+from epub2audio.helpers import ConversionError
+from epub2audio.library import (
+    audiobook_names,
+    book_cost,
+    convert_library,
+    find_books,
+)
+
+
+@pytest.fixture(autouse=True)
+def hash_index(tmp_path: Path) -> Generator[None, None, None]:
+    """Keep the digests of the test files out of the real cache."""
+    with patch("epub2audio.helpers.HASH_INDEX_PATH", tmp_path / "hashes"):
+        yield
+
+
+@pytest.fixture
+def mock_book() -> Generator[Mock, None, None]:
+    """Replace the backend loading and the conversion with fakes."""
+
+    def convert(epub: str, output_path: str, **kwargs: Any) -> Mock:
+        path = Path(output_path)
+        path.write_bytes(Path(epub).read_bytes())
+        return Mock(output_path=path)
+
+    with (
+        patch("epub2audio.server.load_backend") as load_backend,
+        patch("epub2audio.server.Epub2Audio") as book,
+    ):
+        load_backend.side_effect = lambda name, voice, **kwargs: Mock(
+            **{"generate.return_value": []}
+        )
+        book.side_effect = convert
+        yield book
+
+
+def _epub(path: Path, text_bytes: int) -> Path:
+    """Write an EPUB archive with a document of the given size."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("mimetype", "application/epub+zip")
+        archive.writestr("OEBPS/chapter.xhtml", "a" * text_bytes)
+        archive.writestr("OEBPS/cover.jpg", b"\0" * 5000)
+    return path
+
+
+@pytest.fixture
+def books(tmp_path: Path) -> Path:
+    """Create a library of books of different lengths."""
+    library = tmp_path / "library"
+    _epub(library / "short.epub", 100)
+    _epub(library / "series" / "long.epub", 3000)
+    _epub(library / "medium.epub", 1000)
+    return library
+
+
+def test_find_books(books: Path) -> None:
+    """Test directories are searched and every book is listed once."""
+    found = find_books([books / "medium.epub", books])
+    assert found == [
+        (books / "medium.epub").resolve(),
+        (books / "series" / "long.epub").resolve(),
+        (books / "short.epub").resolve(),
+    ]
+
+
+def test_audiobook_names(tmp_path: Path) -> None:
+    """Test books sharing a stem get audiobooks of their own."""
+    books = [
+        tmp_path / "a" / "book.epub",
+        tmp_path / "b" / "c" / "book.epub",
+        tmp_path / "My Book.epub",
+        tmp_path / "My_Book.epub",
+    ]
+    assert list(audiobook_names(books).values()) == [
+        "a-book",
+        "b-c-book",
+        "My_Book",
+        "My_Book-2",
+    ]
+
+
+def test_book_cost(books: Path, tmp_path: Path) -> None:
+    """Test books are measured by the size of their documents."""
+    assert book_cost(books / "medium.epub") == 1000
+    broken = tmp_path / "broken.epub"
+    broken.write_bytes(b"not a zip")
+    assert book_cost(broken) == 9
+
+
+def test_convert_library(mock_book: Mock, books: Path, tmp_path: Path) -> None:
+    """Test books are converted longest first and only once."""
+    output = tmp_path / "audiobooks"
+    converted = convert_library([books], output, format="flac")
+
+    assert [Path(book["epub"]).stem for book in converted] == [
+        "long",
+        "medium",
+        "short",
+    ]
+    assert {book["status"] for book in converted} == {"done"}
+    assert [Path(call.args[0]).stem for call in mock_book.call_args_list] == [
+        "long",
+        "medium",
+        "short",
+    ]
+    assert mock_book.call_args.kwargs["output_path"] == str(output / "short.flac")
+
+    # Nothing changed, so nothing is converted again
+    mock_book.reset_mock()
+    skipped = convert_library([books], output, format="flac")
+    assert {book["status"] for book in skipped} == {"skipped"}
+    mock_book.assert_not_called()
+
+    # A changed audiobook, different options, or forcing converts again
+    (output / "short.flac").write_bytes(b"truncated")
+    again = convert_library([books], output, format="flac")
+    assert [book["status"] for book in again] == ["skipped", "skipped", "done"]
+    assert len(convert_library([books], output, speech_rate=1.5)) == 3
+    assert mock_book.call_count == 4
+    convert_library([books / "short.epub"], output, speech_rate=1.5, force=True)
+    assert mock_book.call_count == 5
+
+
+def test_convert_library_failed(mock_book: Mock, books: Path, tmp_path: Path) -> None:
+    """Test a failing book is reported and converted again on the next run."""
+    convert = mock_book.side_effect
+
+    def fail_long(epub: str, output_path: str, **kwargs: Any) -> Mock:
+        if Path(epub).stem == "long":
+            raise ConversionError("Invalid EPUB", ErrorCodes.INVALID_EPUB)
+        return convert(epub, output_path, **kwargs)
+
+    mock_book.side_effect = fail_long
+    output = tmp_path / "audiobooks"
+    converted = convert_library([books], output, jobs=2)
+    assert [book["status"] for book in converted] == ["failed", "done", "done"]
+    assert converted[0]["error"] == "Invalid EPUB"
+
+    mock_book.side_effect = convert
+    again = convert_library([books], output, jobs=2)
+    assert [book["status"] for book in again] == ["skipped", "skipped", "done"]
+
+
+def test_convert_library_stub(tmp_path: Path) -> None:
+    """Test books are converted by the stub, each to its own audiobook."""
+    data = Path(__file__).parent / "data"
+    library = tmp_path / "library"
+    for name, epub in [("a", "sample.epub"), ("b", "sample-single-page.epub")]:
+        (library / name).mkdir(parents=True)
+        shutil.copy(data / epub, library / name / "book.epub")
+    output = tmp_path / "audiobooks"
+    with (
+        patch("epub2audio.cache.SEGMENT_CACHE_DIR", tmp_path / "segments"),
+        patch("epub2audio.epub2audio.PHONEME_CACHE_PATH", tmp_path / "phonemes"),
+        patch("epub2audio.audio_converter.PHONEME_CACHE_PATH", tmp_path / "phonemes"),
+    ):
+        converted = convert_library(
+            [library], output, format="flac", max_chapters=1, backend="stub"
+        )
+    assert [(book["status"], book["error"]) for book in converted] == [("done", "")] * 2
+    assert sorted(path.name for path in output.glob("*.flac")) == [
+        "a-book.flac",
+        "b-book.flac",
+    ]
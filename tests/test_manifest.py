@@ -0,0 +1,61 @@
+"""Unit tests for the checkpoint manifest."""
+
+from pathlib import Path
+
+from epub2audio.manifest import Manifest, ManifestEntry, text_sha256
+
+JOB = {"epub_sha256": "abc", "voice": "af_heart", "speech_rate": 1.0}
+
+
+def test_manifest_resume(tmp_path: Path) -> None:
+    """Test segments recorded by an interrupted run are resumed."""
+    path = tmp_path / "book.manifest.jsonl"
+    manifest = Manifest(path, JOB)
+    assert manifest.resume() == 0
+    manifest.start()
+    manifest.record(0, "announcement", 0, "seg1", 100, "Chapter 1")
+    manifest.record(0, "content", 0, "seg2", 2000, "Once upon a time")
+    manifest.record(0, "content", 1, "seg3", 1500, "there was a king")
+
+    resumed = Manifest(path, JOB)
+    assert resumed.resume() == 3
+    assert resumed.get(0, "content", 1, "there was a king") == ManifestEntry(
+        0, "content", 1, "seg3", 1500, text_sha256("there was a king")
+    )
+    # A chunk whose text changed is synthesized again
+    assert resumed.get(0, "announcement", 0, "Chapter One") is None
+    assert resumed.get(0, "content", 1, "Once upon a time") is None
+    assert resumed.get(1, "announcement", 0, "Chapter 1") is None
+
+    # Starting over keeps the resumed segments
+    resumed.start()
+    assert Manifest(path, JOB).resume() == 3
+    resumed.remove()
+    assert not path.exists()
+
+
+def test_manifest_other_job(tmp_path: Path) -> None:
+    """Test a manifest written for other settings is ignored."""
+    path = tmp_path / "book.manifest.jsonl"
+    manifest = Manifest(path, JOB)
+    manifest.start()
+    manifest.record(0, "announcement", 0, "seg1", 100, "Chapter 1")
+
+    other = Manifest(path, {**JOB, "voice": "am_adam"})
+    assert other.resume() == 0
+    other.start()
+    assert Manifest(path, JOB).resume() == 0
+
+
+def test_manifest_interrupted_write(tmp_path: Path) -> None:
+    """Test a line cut short by an interruption is skipped."""
+    path = tmp_path / "book.manifest.jsonl"
+    manifest = Manifest(path, JOB)
+    manifest.start()
+    manifest.record(0, "announcement", 0, "seg1", 100, "Chapter 1")
+    with open(path, "a") as f:
+        f.write('{"chapter": 0, "part": "con')
+
+    resumed = Manifest(path, JOB)
+    assert resumed.resume() == 1
+    assert resumed.get(0, "announcement", 0, "Chapter 1") is not None
@@ -0,0 +1,79 @@
+"""Unit tests for request multiplexing."""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from epub2audio.multiplexer import InferenceMultiplexer
+
+
+class FakeBackend:
+    """Backend whose model speaks a sample per phoneme."""
+
+    def __init__(self) -> None:
+        """Initialize the backend."""
+        self.calls: list[tuple[str, str]] = []
+
+    def synthesize(self, phonemes: str, voice: str, speed: float) -> np.ndarray:
+        """Run the model."""
+        if phonemes == "FAIL":
+            raise RuntimeError("model error")
+        self.calls.append((voice, phonemes))
+        return np.full(len(phonemes), speed)
+
+
+def test_requests_run_in_order() -> None:
+    """Test requests run one at a time, in the order they were queued."""
+    backend = FakeBackend()
+    multiplexer = InferenceMultiplexer(backend)
+    requests = [("aaa", "b"), ("a", "a"), ("aaaa", "a"), ("aa", "b")]
+    futures = [multiplexer.submit(phonemes, voice, 1.0) for phonemes, voice in requests]
+    assert [len(future.result()) for future in futures] == [3, 1, 4, 2]
+    multiplexer.close()
+
+    assert backend.calls == [(voice, phonemes) for phonemes, voice in requests]
+    assert multiplexer.requests == 4
+
+
+def test_requests_across_threads() -> None:
+    """Test every thread gets its own audio back, in the order it asked."""
+    multiplexer = InferenceMultiplexer(FakeBackend())
+    results: dict[int, list[float]] = {}
+
+    def convert(speed: int) -> None:
+        futures = [multiplexer.submit("a" * i, "a", speed) for i in range(1, 6)]
+        results[speed] = [float(future.result().sum()) for future in futures]
+
+    threads = [threading.Thread(target=convert, args=(i,)) for i in range(1, 4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    multiplexer.close()
+
+    for speed in range(1, 4):
+        assert results[speed] == [speed * i for i in range(1, 6)]
+    assert multiplexer.requests == 15
+
+
+def test_request_error() -> None:
+    """Test a failing request fails alone."""
+    multiplexer = InferenceMultiplexer(FakeBackend())
+    failed = multiplexer.submit("FAIL", "a", 1.0)
+    done = multiplexer.submit("ok", "a", 1.0)
+    with pytest.raises(RuntimeError, match="model error"):
+        failed.result()
+    assert len(done.result()) == 2
+    multiplexer.close()
+
+
+def test_close_runs_queued_requests() -> None:
+    """Test requests queued before closing still run."""
+    multiplexer = InferenceMultiplexer(FakeBackend())
+    futures = [multiplexer.submit("a", "a", 1.0) for _ in range(10)]
+    start = time.monotonic()
+    multiplexer.close()
+    assert all(future.done() for future in futures)
+    assert time.monotonic() - start < 5
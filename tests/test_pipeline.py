@@ -0,0 +1,102 @@
+"""Unit tests for the staged pipeline."""
+
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from epub2audio.pipeline import Pipeline, StageStats
+
+
+def _double(items: Iterator[int]) -> Iterator[int]:
+    """Double every item."""
+    for item in items:
+        yield item * 2
+
+
+def test_pipeline_runs_stages_in_order() -> None:
+    """Test items flow through every stage in order."""
+    results: list[int] = []
+
+    def collect(items: Iterator[int]) -> Iterator[int]:
+        for item in items:
+            results.append(item)
+            yield item
+
+    stats = (
+        Pipeline(queue_size=1)
+        .add_stage("double", _double)
+        .add_stage("increment", lambda items: (item + 1 for item in items))
+        .add_stage("collect", collect)
+        .run(range(10))
+    )
+
+    assert results == [i * 2 + 1 for i in range(10)]
+    assert [s.name for s in stats] == ["double", "increment", "collect"]
+    assert all(s.items == 10 for s in stats)
+
+
+def test_pipeline_single_stage() -> None:
+    """Test a pipeline of a single stage runs in the calling thread."""
+    stats = Pipeline().add_stage("double", _double).run(range(3))
+    assert stats[0].items == 3
+
+
+def test_pipeline_without_stages() -> None:
+    """Test running an empty pipeline fails."""
+    with pytest.raises(ValueError):
+        Pipeline().run(range(3))
+
+
+def test_pipeline_reports_bottleneck() -> None:
+    """Test the slowest stage is busy the most and reported as bottleneck."""
+
+    def slow(items: Iterator[int]) -> Iterator[int]:
+        for item in items:
+            time.sleep(0.02)
+            yield item
+
+    pipeline = (
+        Pipeline(queue_size=1)
+        .add_stage("fast", _double)
+        .add_stage("slow", slow)
+        .add_stage("sink", _double)
+    )
+    stats = pipeline.run(range(10))
+
+    fast, slow_stats, sink = stats
+    assert pipeline.bottleneck is slow_stats
+    assert slow_stats.utilization > 0.8
+    assert sink.utilization < slow_stats.utilization
+    # The fast stage spends most of its time waiting for room downstream
+    assert fast.output_wait > fast.busy_time
+    assert sink.input_wait > sink.busy_time
+
+
+@pytest.mark.parametrize("failing_stage", [0, 1, 2])
+def test_pipeline_propagates_errors(failing_stage: int) -> None:
+    """Test an error in any stage stops the pipeline and is raised."""
+
+    def stage(index: int):  # type: ignore[no-untyped-def]
+        def func(items: Iterator[int]) -> Iterator[int]:
+            for item in items:
+                if index == failing_stage and item == 5:
+                    raise RuntimeError(f"stage {index} failed")
+                yield item
+
+        return func
+
+    pipeline = Pipeline(queue_size=1)
+    for i in range(3):
+        pipeline.add_stage(f"stage{i}", stage(i))
+
+    with pytest.raises(RuntimeError, match=f"stage {failing_stage} failed"):
+        pipeline.run(range(100))
+
+
+def test_stage_stats_utilization() -> None:
+    """Test utilization is the busy fraction of the wall time."""
+    assert StageStats("empty").utilization == 0.0
+    stats = StageStats("stage", busy_time=1.0, wall_time=4.0)
+    assert stats.utilization == 0.25
+    assert "25.0% busy" in str(stats)
@@ -0,0 +1,94 @@
+"""Unit tests for the registry of the model and voices."""
+
+from collections.abc import Generator
+from hashlib import sha256
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from epub2audio.config import KOKORO_PATHS, KOKORO_REPO_ID
+from epub2audio.registry import get_registry, scan_registry
+from epub2audio.voices import Voice
+
+
+@pytest.fixture(autouse=True)
+def paths(tmp_path: Path) -> Generator[Path, None, None]:
+    """Point the model, the voices and the hub at empty directories."""
+    local = tmp_path / "local"
+    (local / "voices").mkdir(parents=True)
+    with (
+        patch.dict(
+            KOKORO_PATHS,
+            {
+                "config": str(local / "config.json"),
+                "model_weight": str(local / "kokoro-v1_0.pth"),
+                "voice_weights": str(local / "voices"),
+            },
+        ),
+        patch("huggingface_hub.constants.HF_HUB_CACHE", str(tmp_path / "hub")),
+        patch("epub2audio.helpers.HASH_INDEX_PATH", tmp_path / "hashes"),
+        patch("epub2audio.registry._registry", None),
+    ):
+        yield local
+
+
+def _pack(path: Path, voice: Voice, content: bytes) -> Path:
+    """Write a voice pack, and make it the one of the voice."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    voice.info.sha256 = sha256(content).hexdigest()[:8]
+    return path
+
+
+@pytest.fixture
+def dora() -> Generator[Voice, None, None]:
+    """Restore the voice the tests register packs for."""
+    info = Voice.EF_DORA.info
+    sha = info.sha256
+    yield Voice.EF_DORA
+    info.sha256 = sha
+
+
+def test_scan_registry(paths: Path, tmp_path: Path, dora: Voice) -> None:
+    """Test packs are registered only if they match their voice."""
+    assert str(scan_registry()).startswith("no model and 0 voices")
+
+    snapshot = tmp_path / "hub" / f"models--{KOKORO_REPO_ID.replace('/', '--')}"
+    (snapshot / "refs").mkdir(parents=True)
+    (snapshot / "refs" / "main").write_text("abc\n")
+    snapshot /= "snapshots/abc"
+    (snapshot / "voices").mkdir(parents=True)
+    (snapshot / "kokoro-v1_0.pth").write_bytes(b"weights")
+    (snapshot / "voices" / "em_alex.pt").write_bytes(b"not alex")
+    (snapshot / "voices" / "unknown.pt").write_bytes(b"unknown")
+    _pack(snapshot / "voices" / "ef_dora.pt", dora, b"dora")
+
+    registry = scan_registry()
+    assert registry.config is None
+    assert registry.model_weight == snapshot / "kokoro-v1_0.pth"
+    assert registry.voices == {"ef_dora": snapshot / "voices" / "ef_dora.pt"}
+    assert registry.rejected == [snapshot / "voices" / "em_alex.pt"]
+
+    # Files at the configured paths come before those of the hub
+    (paths / "config.json").write_text("{}")
+    (paths / "kokoro-v1_0.pth").write_bytes(b"weights")
+    local = _pack(paths / "voices" / "ef_dora.pt", dora, b"local dora")
+    registry = scan_registry()
+    assert registry.config == paths / "config.json"
+    assert registry.model_weight == paths / "kokoro-v1_0.pth"
+    assert registry.voices == {"ef_dora": local}
+
+
+def test_get_registry(paths: Path, tmp_path: Path, dora: Voice) -> None:
+    """Test the registry is scanned once, for the paths it was scanned at."""
+    pack = _pack(paths / "voices" / "ef_dora.pt", dora, b"dora")
+    with patch("epub2audio.registry.scan_registry", wraps=scan_registry) as scan:
+        assert get_registry().voices == {"ef_dora": pack}
+        assert get_registry() is get_registry()
+        assert scan.call_count == 1
+
+        other = _pack(tmp_path / "other" / "ef_dora.pt", dora, b"other dora")
+        with patch.dict(KOKORO_PATHS, {"voice_weights": str(other.parent)}):
+            assert get_registry().voices == {"ef_dora": other}
+        assert scan.call_count == 2
@@ -0,0 +1,57 @@
+"""Unit tests for scheduling uneven work."""
+
+from epub2audio.scheduler import (
+    ScheduleStats,
+    length_buckets,
+    longest_first,
+    lpt_schedule,
+    padding,
+)
+
+
+def test_longest_first() -> None:
+    """Test work is ordered longest first, keeping ties in order."""
+    assert longest_first([3, 10, 3, 7]) == [1, 3, 0, 2]
+
+
+def test_lpt_schedule() -> None:
+    """Test long work is spread out and short work fills in around it."""
+    # Chapter titles among chapters of very different lengths
+    costs = [10, 500, 12, 480, 9, 300, 11, 250, 8, 40]
+    assignment, stats = lpt_schedule(costs, 2)
+
+    assert sorted(i for worker in assignment for i in worker) == list(range(10))
+    assert all(worker == sorted(worker) for worker in assignment)
+    loads = [sum(costs[i] for i in worker) for worker in assignment]
+    assert stats.makespan == max(loads) == 810
+    assert stats.busy == sum(costs)
+    # Dealing the work out in turn instead leaves a worker idle for longer
+    round_robin = max(sum(costs[0::2]), sum(costs[1::2]))
+    assert stats.makespan < round_robin
+
+
+def test_lpt_schedule_more_workers_than_work() -> None:
+    """Test workers without work are left empty."""
+    assignment, stats = lpt_schedule([5, 3], 3)
+    assert assignment == [[0], [1], []]
+    assert stats.idle == 3 * 5 - 8
+
+
+def test_schedule_stats() -> None:
+    """Test idle time is the capacity left over by the busiest worker."""
+    stats = ScheduleStats(workers=4, busy=30.0, makespan=10.0)
+    assert stats.idle == 10.0
+    assert stats.idle_ratio == 0.25
+    assert str(stats) == "25.0% idle over 4 workers"
+    assert ScheduleStats(2, 0.0, 0.0).idle_ratio == 0.0
+
+
+def test_length_buckets() -> None:
+    """Test lengths are bucketed so that little padding is needed."""
+    lengths = [3, 500, 480, 5, 250, 260, 4, 510]
+    buckets = length_buckets(lengths, max_size=2)
+    assert buckets == [[7, 1], [2], [5, 4], [3, 6], [0]]
+    assert padding(lengths, buckets) == 10 + 10 + 1
+
+    # A single batch of everything would be mostly padding
+    assert padding(lengths, [list(range(8))]) > 10 * padding(lengths, buckets)
@@ -0,0 +1,168 @@
+"""Unit tests for the job server."""
+
+import json
+import threading
+import time
+from collections.abc import Generator
+from pathlib import Path
+from typing import Any, Optional
+from unittest.mock import Mock, patch
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from epub2audio.config import ErrorCodes
+from epub2audio.helpers import ConversionError
+from epub2audio.server import JobScheduler, JobServer
+from epub2audio.voices import Voice
+
+
+@pytest.fixture
+def mock_book() -> Generator[Mock, None, None]:
+    """Replace the backend loading and the conversion with fakes."""
+    with (
+        patch("epub2audio.server.load_backend") as load_backend,
+        patch("epub2audio.server.Epub2Audio") as book,
+    ):
+        load_backend.side_effect = lambda name, voice, **kwargs: Mock(
+            **{"generate.return_value": []}
+        )
+        book.return_value.output_path = Path("book.ogg")
+        yield book
+
+
+@pytest.fixture
+def epub(tmp_path: Path) -> str:
+    """Create an EPUB file to submit."""
+    path = tmp_path / "book.epub"
+    path.touch()
+    return str(path)
+
+
+def _wait(scheduler: JobScheduler, job_id: str) -> dict[str, Any]:
+    """Wait for a job to finish."""
+    for _ in range(500):
+        job: dict[str, Any] = scheduler.status(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(job_id)
+
+
+def test_scheduler_keeps_backends(mock_book: Mock, epub: str) -> None:
+    """Test backends are loaded once per language and shared by every job."""
+    scheduler = JobScheduler([Voice.AF_HEART], jobs=2)
+    multiplexer = scheduler.multiplexer("af_heart")
+    # The backend resolves the voice to its pack through the registry
+    multiplexer.backend.generate.assert_called_once_with("Ready.", "af_heart", 1.0)
+    assert scheduler.multiplexer("am_adam") is multiplexer
+    assert scheduler.multiplexer("bf_emma") is not multiplexer
+
+    jobs = [scheduler.submit(epub, {"speech_rate": 1.5}) for _ in range(2)]
+    for job in jobs:
+        assert _wait(scheduler, job["id"])["status"] == "done"
+    scheduler.close()
+
+    assert mock_book.call_count == 2
+    assert mock_book.call_args.kwargs["multiplexer"] is multiplexer
+    assert mock_book.call_args.kwargs["speech_rate"] == 1.5
+    assert scheduler.status(jobs[0]["id"])["output"] == str(Path("book.ogg").resolve())
+
+
+def test_scheduler_rejects_invalid_jobs(mock_book: Mock, epub: str) -> None:
+    """Test jobs with unknown options or no book are refused."""
+    scheduler = JobScheduler()
+    with pytest.raises(ValueError, match="Unknown options: workers"):
+        scheduler.submit(epub, {"workers": 4})
+    with pytest.raises(ValueError, match="No EPUB file"):
+        scheduler.submit(epub + ".missing", {})
+    scheduler.close()
+    assert scheduler.status() == []
+
+
+def test_scheduler_failed_job(mock_book: Mock, epub: str) -> None:
+    """Test a failing conversion is reported and later jobs still run."""
+    mock_book.side_effect = [
+        ConversionError("TTS error", ErrorCodes.UNKNOWN_ERROR),
+        Mock(),
+    ]
+    scheduler = JobScheduler()
+    failed = scheduler.submit(epub, {})
+    done = scheduler.submit(epub, {})
+    assert _wait(scheduler, failed["id"])["error"] == "TTS error"
+    assert _wait(scheduler, done["id"])["status"] == "done"
+    scheduler.close()
+
+
+def test_scheduler_stub_job(tmp_path: Path) -> None:
+    """Test a job is converted by the stub, to the output it names."""
+    epub = Path(__file__).parent / "data" / "sample.epub"
+    output = tmp_path / "out" / "book.flac"
+    with (
+        patch("epub2audio.cache.SEGMENT_CACHE_DIR", tmp_path / "segments"),
+        patch("epub2audio.epub2audio.PHONEME_CACHE_PATH", tmp_path / "phonemes"),
+        patch("epub2audio.audio_converter.PHONEME_CACHE_PATH", tmp_path / "phonemes"),
+        patch("epub2audio.helpers.HASH_INDEX_PATH", tmp_path / "hashes"),
+    ):
+        scheduler = JobScheduler(backend="stub")
+        options = {"output": str(output), "format": "flac", "max_chapters": 1}
+        job = _wait(scheduler, scheduler.submit(str(epub), options)["id"])
+        scheduler.close()
+    assert (job["status"], job["error"]) == ("done", "")
+    assert job["output"] == str(output.resolve())
+    assert output.stat().st_size > 0
+
+
+def _request(
+    url: str, body: Any = None, headers: Optional[dict[str, str]] = None
+) -> tuple[int, Any]:
+    """Send a request to the server, returning the status and JSON body."""
+    data = None if body is None else json.dumps(body).encode()
+    headers = {"Content-Type": "application/json", **(headers or {})}
+    try:
+        with urlopen(Request(url, data=data, headers=headers)) as response:
+            return response.status, json.load(response)
+    except HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_server(mock_book: Mock, epub: str) -> None:
+    """Test jobs are submitted and followed over HTTP."""
+    scheduler = JobScheduler()
+    with JobServer(("127.0.0.1", 0), scheduler) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            status, job = _request(f"{url}/jobs", {"epub": epub, "format": "flac"})
+            assert status == 202
+            assert job["status"] == "queued"
+            assert job["options"] == {"format": "flac"}
+            _wait(scheduler, job["id"])
+
+            status, done = _request(f"{url}/jobs/{job['id']}")
+            assert (status, done["status"]) == (200, "done")
+            status, jobs = _request(f"{url}/jobs")
+            assert (status, len(jobs)) == (200, 1)
+
+            assert _request(f"{url}/jobs/nope")[0] == 404
+            assert _request(f"{url}/jobs", {"format": "flac"})[0] == 400
+            assert _request(f"{url}/jobs", {"epub": epub, "workers": 2})[0] == 400
+            assert _request(f"{url}/jobs", [epub])[0] == 400
+            assert _request(f"{url}/jobs", epub)[0] == 400
+            assert _request(f"{url}/jobs", {"epub": 1})[0] == 400
+
+            # Web pages of other sites can neither submit nor list jobs
+            form = {"Content-Type": "text/plain"}
+            assert _request(f"{url}/jobs", {"epub": epub}, form)[0] == 415
+            site = {"Origin": "http://example.com"}
+            assert _request(f"{url}/jobs", {"epub": epub}, site)[0] == 403
+            assert _request(f"{url}/jobs", headers=site)[0] == 403
+            local = {"Origin": f"http://localhost:{server.server_port}"}
+            assert _request(f"{url}/jobs", headers=local)[0] == 200
+            assert len(scheduler.status()) == 1
+        finally:
+            server.shutdown()
+            thread.join()
+            scheduler.close()
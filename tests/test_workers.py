@@ -0,0 +1,115 @@
+"""Unit tests for the chapter worker pool."""
+
+import time
+from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+from unittest.mock import Mock, patch
+
+import pytest
+
+from epub2audio import workers
+from epub2audio.cache import CacheStats
+from epub2audio.epub_processor import Chapter
+from epub2audio.workers import ChapterAudio, ChapterWorkerPool
+
+
+def _thread_pool(**kwargs: Any) -> ThreadPoolExecutor:
+    """Build a thread pool in place of a process pool."""
+    kwargs.pop("mp_context")
+    return ThreadPoolExecutor(**kwargs)
+
+
+@pytest.fixture
+def chapters() -> list[Chapter]:
+    """Create chapters in reading order."""
+    return [
+        Chapter(title=f"Chapter {i}", content="x" * i, order=i, id=f"chap{i}")
+        for i in range(5)
+    ]
+
+
+@pytest.fixture
+def mock_worker() -> Generator[Mock, None, None]:
+    """Replace the worker converter and process pool with in-process fakes."""
+
+    def synthesize(text: str) -> str:
+        # Later chapters finish first, to exercise reordering
+        time.sleep(0.01 * (5 - len(text)) if text.startswith("x") else 0)
+        # Announcements are found in the segment store
+        converter.cache_stats.record(text.startswith("Chapter"))
+        return text
+
+    converter = Mock()
+    converter.cache_stats = CacheStats()
+    converter.synthesize.side_effect = synthesize
+    with (
+        patch("epub2audio.workers.ProcessPoolExecutor", side_effect=_thread_pool),
+        patch("epub2audio.workers._init_worker"),
+        patch.object(workers, "_worker_converter", converter),
+    ):
+        yield converter
+
+
+def test_convert_chapter(mock_worker: Mock) -> None:
+    """Test a worker returns the names of both chapter segments."""
+    chapter = Chapter(title="Chapter 1", content="x", order=1, id="chap1")
+    result = workers._convert_chapter(chapter)
+    assert result == ChapterAudio(1, "Chapter 1", "x", CacheStats(hits=1, misses=1))
+    assert mock_worker.synthesize.call_count == 2
+
+
+def test_convert_in_chapter_order(mock_worker: Mock, chapters: list[Chapter]) -> None:
+    """Test results are yielded in chapter order regardless of completion order."""
+    with ChapterWorkerPool("test.epub", 2, voice="af_heart") as pool:
+        results = list(pool.convert(chapters))
+
+    assert [chapter.order for chapter, _ in results] == list(range(5))
+    for chapter, audio in results:
+        assert audio.order == chapter.order
+        assert audio.announcement == chapter.title
+        assert audio.content == chapter.content
+
+
+def test_convert_cache_stats(mock_worker: Mock, chapters: list[Chapter]) -> None:
+    """Test segment store lookups of the workers are added up by the pool."""
+    # A single worker, as the fake workers share their converter
+    with ChapterWorkerPool("test.epub", 1, voice="af_heart") as pool:
+        list(pool.convert(chapters))
+    assert pool.cache_stats == CacheStats(hits=5, misses=5)
+
+
+def test_convert_longest_first(mock_worker: Mock, chapters: list[Chapter]) -> None:
+    """Test every chapter is submitted longest first, then yielded in order."""
+    with ChapterWorkerPool("test.epub", 1, voice="af_heart") as pool:
+        results = list(pool.convert(chapters, longest_first=True))
+
+    assert [chapter.order for chapter, _ in results] == list(range(5))
+    submitted = [call.args[0] for call in mock_worker.synthesize.call_args_list]
+    assert submitted[1::2] == ["x" * i for i in range(4, -1, -1)]
+    assert pool.schedule_stats.workers == 1
+    assert 0 < pool.schedule_stats.busy <= pool.schedule_stats.makespan
+
+
+def test_convert_error(mock_worker: Mock, chapters: list[Chapter]) -> None:
+    """Test a failing chapter raises in the consumer."""
+    mock_worker.synthesize.side_effect = RuntimeError("TTS error")
+    with ChapterWorkerPool("test.epub", 2, voice="af_heart") as pool:
+        with pytest.raises(RuntimeError, match="TTS error"):
+            list(pool.convert(chapters))
+
+
+def test_convert_resumed(mock_worker: Mock, chapters: list[Chapter]) -> None:
+    """Test chapters synthesized by an earlier run are not submitted again."""
+
+    def resume(chapter: Chapter) -> Optional[ChapterAudio]:
+        if chapter.order % 2:
+            return None
+        return ChapterAudio(chapter.order, "old", "old", CacheStats())
+
+    with ChapterWorkerPool("test.epub", 2, voice="af_heart") as pool:
+        results = list(pool.convert(chapters, resume=resume))
+
+    assert [chapter.order for chapter, _ in results] == list(range(5))
+    assert [audio.content for _, audio in results] == ["old", "x", "old", "xxx", "old"]
+    assert mock_worker.synthesize.call_count == 4